@@ -2,60 +2,235 @@
 Audio Processing Agent
 Handles audio-reactive lighting tasks
 """
+from audio.analysis_worker import SharedAnalyzer, feature_extractor
 from audio.frequency_analyzer import FrequencyAnalyzer
-from agents.task_manager import task_manager
-from govee_api.client import GoveeAPIClient
+from audio.palette import scale_colors
+from audio.sources import WavFileSource
+from agents.task_manager import CancellationToken, task_manager
+from govee_api import metrics
+from govee_api.coalescer import get_shared_coalescer
+import asyncio
+import os
+import threading
 import time
+from typing import Optional
 
 audio_analyzer = None
-client = None
+# Guards handing the shared analyzer over for cleanup, so it is released once
+_analyzer_lock = threading.Lock()
 
-def audio_reactive_handler(task_data: dict):
+# Consecutive failed frames before an audio-reactive loop gives up
+MAX_FRAME_ERRORS = 50
+
+def _start_analysis(task_data: dict):
+    """
+    Start (or reuse) the shared analyzer for a 'start' task
+    
+    Returns:
+        Tuple of (analyzer, function returning {device_id: (r, g, b)} for
+        the latest audio frame)
+    """
+    global audio_analyzer
+    
+    device_ids = task_data.get('device_ids', [])
+    bands = task_data.get('bands') or list(range(len(device_ids)))
+    n_bands = max(bands, default=0) + 1
+    if not audio_analyzer and task_data.get('worker', os.environ.get('GOVEE_AUDIO_WORKER') == '1'):
+        # Capture and FFT in their own process, read back through shared memory
+        audio_analyzer = SharedAnalyzer(hop_size=task_data.get('hop_size'),
+                                        wav_path=task_data.get('wav_path'),
+                                        n_bands=n_bands if task_data.get('mode') == 'bands' else 8,
+                                        palette=task_data.get('palette', 'spectrum'))
+        audio_analyzer.start_stream()
+    elif not audio_analyzer:
+        hop_size = task_data.get('hop_size')
+        source = None
+        sample_rate = 44100
+        if task_data.get('wav_path'):
+            source = WavFileSource(task_data['wav_path'], block_size=hop_size or 1024,
+                                   loop=True)
+            sample_rate = source.sample_rate
+        audio_analyzer = FrequencyAnalyzer(sample_rate, hop_size=hop_size, source=source,
+                                           palette=task_data.get('palette', 'spectrum'))
+        audio_analyzer.start_stream()
+    
+    analyzer = audio_analyzer
+    
+    if task_data.get('mode') == 'bands':
+        extractor = feature_extractor(analyzer, n_bands)
+        # Each band's hue is fixed; its level sets the brightness
+        band_colors = analyzer.frequencies_to_colors(extractor.band_frequencies[bands])
+        
+        def frame_colors():
+            extractor.update()
+            start = metrics.clock()
+            colors = scale_colors(band_colors, extractor.levels[bands])
+            metrics.STAGE_SECONDS.observe_since(start, 'color')
+            return dict(zip(device_ids, map(tuple, colors.tolist())))
+    else:
+        def frame_colors():
+            color = analyzer.get_current_color()
+            return {device_id: color for device_id in device_ids}
+    
+    return analyzer, frame_colors
+
+
+def _stop_analysis():
+    """Cancel running 'start' tasks and release the analyzer"""
+    global audio_analyzer
+    
+    task_manager.cancel_agent_tasks('audio_reactive')
+    with _analyzer_lock:
+        analyzer, audio_analyzer = audio_analyzer, None
+    if analyzer:
+        analyzer.cleanup()
+
+
+def _release_analysis(analyzer):
+    """Release the analyzer a finished 'start' task used, unless it was already stopped or replaced"""
+    global audio_analyzer
+    
+    with _analyzer_lock:
+        if audio_analyzer is not analyzer:
+            return
+        audio_analyzer = None
+    analyzer.cleanup()
+
+
+def audio_reactive_handler(task_data: dict, token: CancellationToken):
     """
     Handle audio-reactive lighting tasks
     
+    'start' runs in the task manager's long-running lane until its token is
+    cancelled (by a 'stop' task, or by cancelling the task's handle).
+    
     Expected task_data:
     {
         'action': str,  # 'start', 'stop'
         'device_ids': list,  # List of device IDs to control
-        'duration': int  # Optional duration in seconds
+        'duration': int,  # Optional duration in seconds
+        'hop_size': int,  # Optional streaming hop in samples (lower latency)
+        'fps': float,  # Light updates per second (default 10)
+        'wav_path': str,  # Optional WAV file to play instead of the microphone
+        'mode': str,  # 'dominant' (default): all devices follow the peak frequency
+                      # 'bands': each device follows its own frequency band
+        'bands': list,  # Optional band index per device in 'bands' mode
+        'palette': str,  # Optional palette name (default 'spectrum')
+        'worker': bool  # Analyse in a separate process (default: GOVEE_AUDIO_WORKER=1)
     }
     """
-    global audio_analyzer, client
-    
     action = task_data.get('action')
-    device_ids = task_data.get('device_ids', [])
     
     if action == 'start':
-        if not audio_analyzer:
-            audio_analyzer = FrequencyAnalyzer()
-            audio_analyzer.start_stream()
-            client = GoveeAPIClient()
+        analyzer, frame_colors = _start_analysis(task_data)
+        coalescer = get_shared_coalescer()
         
         # Process audio and update lights
+        # Capture runs on its own thread; this loop only samples the latest spectrum
         duration = task_data.get('duration', None)
-        start_time = time.time()
+        frame_time = 1.0 / task_data.get('fps', 10)
+        start_time = time.monotonic()
+        next_frame = start_time
+        errors = 0
         
-        while True:
-            if duration and (time.time() - start_time) > duration:
-                break
-            
-            try:
-                color = audio_analyzer.get_current_color()
-                for device_id in device_ids:
-                    client.set_color(device_id, *color)
-            except Exception as e:
-                print(f"Error in audio-reactive mode: {e}")
-                break
-            
-            time.sleep(0.1)  # Update 10 times per second
+        try:
+            # Runs until 'stop' cancels the task or replaces the shared analyzer
+            while audio_analyzer is analyzer and not token.cancelled:
+                if duration and (time.monotonic() - start_time) > duration:
+                    break
+                
+                try:
+                    colors = frame_colors()
+                    start = metrics.clock()
+                    for device_id, (r, g, b) in colors.items():
+                        if device_id in token.released:
+                            # Taken over by a user command
+                            continue
+                        coalescer.set_color(device_id, r, g, b)
+                    metrics.STAGE_SECONDS.observe_since(start, 'submit')
+                    metrics.FRAMES.inc('audio')
+                    errors = 0
+                except Exception as e:
+                    # Skip the frame; only a persistent failure ends the effect
+                    errors += 1
+                    print(f"Error in audio-reactive mode: {e}")
+                    if errors >= MAX_FRAME_ERRORS:
+                        break
+                
+                next_frame += frame_time
+                token.wait(max(0.0, next_frame - time.monotonic()))
+        finally:
+            # Ended by duration, errors or cancellation: free the input or worker
+            _release_analysis(analyzer)
     
     elif action == 'stop':
-        if audio_analyzer:
-            audio_analyzer.stop_stream()
-            audio_analyzer.cleanup()
-            audio_analyzer = None
+        _stop_analysis()
+
+
+def _report_send(sending: Optional[asyncio.Future]):
+    """Print the error a finished frame send raised, so it is not lost when the future is dropped"""
+    if sending is not None and sending.done() and not sending.cancelled() and sending.exception():
+        print(f"Error sending audio-reactive frame: {sending.exception()}")
 
-# Register agent
-task_manager.register_agent('audio_reactive', audio_reactive_handler)
 
+async def async_audio_reactive_handler(task_data: dict, token: CancellationToken):
+    """
+    Handle audio-reactive lighting tasks on the event loop
+    
+    Same task_data as audio_reactive_handler. Each frame's device colors
+    are sent concurrently on the loop instead of through the coalescer's
+    sender thread; while a send is still in flight newer frames are not
+    queued behind it.
+    """
+    action = task_data.get('action')
+    
+    if action == 'start':
+        # Opening the input (or spawning the worker) blocks; keep it off the loop
+        analyzer, frame_colors = await asyncio.to_thread(_start_analysis, task_data)
+        client = get_shared_coalescer().client
+        
+        duration = task_data.get('duration', None)
+        frame_time = 1.0 / task_data.get('fps', 10)
+        start_time = time.monotonic()
+        next_frame = start_time
+        
+        sending = None
+        errors = 0
+        
+        try:
+            while audio_analyzer is analyzer and not token.cancelled:
+                if duration and (time.monotonic() - start_time) > duration:
+                    break
+                
+                try:
+                    colors = frame_colors()
+                    for device_id in token.released & colors.keys():
+                        del colors[device_id]
+                    if sending is None or sending.done():
+                        _report_send(sending)
+                        # A newer frame follows shortly, so failed sends are not retried
+                        sending = asyncio.ensure_future(client.async_set_colors(colors, retry=False))
+                    metrics.FRAMES.inc('audio')
+                    errors = 0
+                except Exception as e:
+                    errors += 1
+                    print(f"Error in audio-reactive mode: {e}")
+                    if errors >= MAX_FRAME_ERRORS:
+                        break
+                
+                next_frame += frame_time
+                await token.wait_async(max(0.0, next_frame - time.monotonic()))
+        finally:
+            if sending:
+                sending.cancel()
+                _report_send(sending)
+            await asyncio.to_thread(_release_analysis, analyzer)
+    
+    elif action == 'stop':
+        # Joining the worker process blocks too. to_thread() carries this
+        # task's context, so cancel_agent_tasks() still skips the caller
+        await asyncio.to_thread(_stop_analysis)
+
+# Register agent
+task_manager.register_agent('audio_reactive', audio_reactive_handler, long_running=True,
+                            async_function=async_audio_reactive_handler)
@@ -0,0 +1,292 @@
+"""
+Effect Registry
+Tracks which effect owns each device and runs effects on a bounded set of shared render loops
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+import itertools
+import os
+import threading
+import time
+
+from agents.task_manager import task_manager
+from audio.light_sync import LightSyncCoordinator
+from audio.render_loop import RenderLoop
+
+
+def effect_key(strips: Sequence[str]) -> str:
+    """Key of the effect driving a set of strips"""
+    return '_'.join(sorted(strips))
+
+
+class EffectRegistry:
+    """
+    Single owner for every device driven by an effect
+    
+    Starting an effect takes its devices from any effect that was driving
+    them; that effect keeps rendering but stops sending to them (and stops
+    altogether once it owns nothing), and gets them back if the newer effect
+    stops first. Effects render on at most `max_threads` shared render
+    loops, with an effect that overlaps a running one placed on that
+    effect's loop. Coordinators are kept for reuse while idle and dropped
+    after `idle_timeout` seconds.
+    """
+    
+    def __init__(self, factory: Callable[[List[str], List[int], Optional[List[int]]], LightSyncCoordinator],
+                 max_threads: Optional[int] = None, idle_timeout: Optional[float] = None):
+        """
+        Initialize effect registry
+        
+        Args:
+            factory: Called as factory(strips, led_counts, segments) to create a coordinator
+            max_threads: Most render loop threads (default: GOVEE_RENDER_THREADS or 1)
+            idle_timeout: Seconds a stopped effect's coordinator is kept
+                (default: GOVEE_EFFECT_IDLE_TIMEOUT or 300)
+        """
+        self.factory = factory
+        self.max_threads = max_threads or int(os.environ.get('GOVEE_RENDER_THREADS', '1'))
+        self.idle_timeout = (idle_timeout if idle_timeout is not None
+                             else float(os.environ.get('GOVEE_EFFECT_IDLE_TIMEOUT', '300')))
+        self.coordinators: Dict[str, LightSyncCoordinator] = {}
+        self.last_used: Dict[str, float] = {}
+        # Device -> key of the effect sending to it
+        self.owners: Dict[str, str] = {}
+        # Key -> start order of running effects, newest highest
+        self.started: Dict[str, int] = {}
+        # Claimed effects whose coordinator has not begun running yet
+        self.starting = set()
+        self.loops: List[RenderLoop] = []
+        self.placement: Dict[str, RenderLoop] = {}
+        self.evicted = 0
+        self._order = itertools.count(1)
+        self._lock = threading.RLock()
+    
+    def coordinator(self, strips: List[str], led_counts: List[int],
+                    segments: Optional[List[int]] = None) -> LightSyncCoordinator:
+        """
+        Get (or create) the coordinator for a set of strips
+        
+        Args:
+            strips: Device IDs in chain order
+            led_counts: LED count of each strip
+            segments: Optional segments per strip for LAN streaming
+        
+        Returns:
+            Coordinator, reused while its strips and LED counts match
+        """
+        key = effect_key(strips)
+        with self._lock:
+            self.sweep()
+            coordinator = self.coordinators.get(key)
+            if coordinator is None or coordinator.light_strips != list(strips) \
+                    or coordinator.total_leds != list(led_counts):
+                if coordinator is not None:
+                    self.release(strips)
+                coordinator = self.factory(list(strips), list(led_counts), segments)
+                self.coordinators[key] = coordinator
+            self.last_used[key] = time.monotonic()
+            return coordinator
+    
+    def claim(self, strips: List[str]) -> int:
+        """
+        Make an effect the owner of all its devices
+        
+        The effect counts as running from here on, even before its
+        coordinator starts, so sweep() does not halt it in between.
+        
+        Args:
+            strips: Device IDs of the effect
+        
+        Returns:
+            Start number, to pass to release()
+        """
+        key = effect_key(strips)
+        with self._lock:
+            coordinator = self.coordinators[key]
+            loop = self.placement.pop(key, None)
+            if loop:
+                loop.remove(key)
+            coordinator.detached.clear()
+            for device_id in coordinator.light_strips:
+                previous = self.owners.get(device_id)
+                if previous and previous != key:
+                    self._detach(previous, device_id)
+                self.owners[device_id] = key
+            order = self.started[key] = next(self._order)
+            self.starting.add(key)
+            self.last_used[key] = time.monotonic()
+            return order
+    
+    def start(self, strips: List[str], draw, fps: float):
+        """
+        Run an effect on a shared render loop
+        
+        The strips' coordinator must come from coordinator() first.
+        
+        Args:
+            strips: Device IDs of the effect
+            draw: Effect function, called as draw(frame, step)
+            fps: Frames per second
+        
+        Returns:
+            Start number, to pass to release()
+        """
+        key = effect_key(strips)
+        with self._lock:
+            previous_owners = {self.owners.get(device_id) for device_id in strips} - {None, key}
+            order = self.claim(strips)
+            loop = self.placement[key] = self._place(previous_owners)
+            loop.add(key, self.coordinators[key], draw, fps)
+            return order
+    
+    def is_current(self, strips: List[str], order: int) -> bool:
+        """
+        Check whether a start of an effect is still running
+        
+        Args:
+            strips: Device IDs of the effect
+            order: Start number from claim() or start()
+        
+        Returns:
+            False once the effect was released, restarted, or lost all its
+            devices to other effects
+        """
+        return self.started.get(effect_key(strips)) == order
+    
+    def _place(self, neighbours: set) -> RenderLoop:
+        """Pick a render loop: an overlapping effect's, else the least loaded (within the cap)"""
+        for key in neighbours:
+            if key in self.placement:
+                return self.placement[key]
+        idle = [loop for loop in self.loops if not loop.effects]
+        if idle:
+            return idle[0]
+        if len(self.loops) < self.max_threads:
+            self.loops.append(RenderLoop(f'render-{len(self.loops)}'))
+            return self.loops[-1]
+        return min(self.loops, key=lambda loop: len(loop.effects))
+    
+    def detach(self, device_ids) -> int:
+        """
+        Stop effects sending to devices a user command has taken over
+        
+        The devices stay out of the effect until it is started again; an
+        effect left with none stops.
+        
+        Args:
+            device_ids: Devices to take from their effects
+        
+        Returns:
+            Number of devices that had been driven by an effect
+        """
+        detached = 0
+        with self._lock:
+            for device_id in device_ids:
+                key = self.owners.pop(device_id, None)
+                if key is not None:
+                    self._detach(key, device_id)
+                    detached += 1
+        return detached
+    
+    def _detach(self, key: str, device_id: str):
+        """Stop an effect sending to a device another effect has taken"""
+        coordinator = self.coordinators.get(key)
+        if coordinator is None:
+            return
+        coordinator.detached.add(coordinator.light_strips.index(device_id))
+        if len(coordinator.detached) == len(coordinator.light_strips):
+            self._halt(key)
+    
+    def _halt(self, key: str):
+        """Stop an effect's rendering without giving up its coordinator"""
+        self.started.pop(key, None)
+        self.starting.discard(key)
+        loop = self.placement.pop(key, None)
+        if loop:
+            loop.remove(key)
+        coordinator = self.coordinators.get(key)
+        if coordinator:
+            coordinator.stop()
+        self.last_used[key] = time.monotonic()
+    
+    def release(self, strips: List[str], order: Optional[int] = None):
+        """
+        Stop an effect and hand its devices back to the newest running effect covering them
+        
+        Args:
+            strips: Device IDs of the effect
+            order: Start number from claim(); a release for an older start
+                of the same effect is ignored
+        """
+        key = effect_key(strips)
+        with self._lock:
+            if order is not None and self.started.get(key) != order:
+                return
+            self._halt(key)
+            self._return_devices(key)
+    
+    def _return_devices(self, key: str):
+        """Give the devices a stopped effect owned back to effects that still cover them"""
+        for device_id in [d for d, owner in self.owners.items() if owner == key]:
+            del self.owners[device_id]
+            candidates = [other for other in self.started
+                          if device_id in self.coordinators[other].light_strips]
+            if candidates:
+                newest = max(candidates, key=self.started.get)
+                coordinator = self.coordinators[newest]
+                coordinator.detached.discard(coordinator.light_strips.index(device_id))
+                self.owners[device_id] = newest
+    
+    def sweep(self):
+        """Release devices of effects that ended on their own and drop long-idle coordinators"""
+        now = time.monotonic()
+        with self._lock:
+            for key in list(self.started):
+                if self.coordinators[key].is_running:
+                    self.starting.discard(key)
+                elif key not in self.starting:
+                    self._halt(key)
+                    self._return_devices(key)
+            for key in list(self.coordinators):
+                if key not in self.started and now - self.last_used[key] > self.idle_timeout:
+                    del self.coordinators[key]
+                    del self.last_used[key]
+                    self.evicted += 1
+    
+    def stats(self) -> Dict:
+        """
+        Get registry statistics
+        
+        Returns:
+            Dictionary with running and idle effect counts, owned devices,
+            evictions and each render loop's state
+        """
+        with self._lock:
+            self.sweep()
+            return {
+                'running': len(self.started),
+                'idle': len(self.coordinators) - len(self.started),
+                'devices': len(self.owners),
+                'evicted': self.evicted,
+                'loops': [loop.stats() for loop in self.loops]
+            }
+
+
+_registry: Optional[EffectRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_shared_effect_registry() -> EffectRegistry:
+    """Get the process-wide effect registry (coordinators send through the shared coalescer)"""
+    global _registry
+    
+    with _registry_lock:
+        if _registry is None:
+            from govee_api.coalescer import get_shared_coalescer
+            
+            def factory(strips, led_counts, segments):
+                return LightSyncCoordinator(strips, led_counts, get_shared_coalescer(), segments)
+            
+            _registry = EffectRegistry(factory)
+            # Interactive commands take single devices from running effects
+            task_manager.register_device_releaser(_registry.detach)
+        return _registry
@@ -2,38 +2,240 @@
 Light Control Agent
 Handles light control tasks
 """
-from govee_api.client import GoveeAPIClient
+import time
+from typing import Dict, List, Optional, Tuple
+
+from govee_api.coalescer import FRESH_SECONDS, get_shared_coalescer
+from govee_api.registry import get_shared_registry
+from govee_api.scenes import get_shared_scene_store
 from agents.task_manager import task_manager
 
-def light_control_handler(task_data: dict):
+def _int_param(params: dict, key: str, default: int, low: int, high: int) -> int:
+    """
+    Read an integer parameter and check its range
+    
+    Raises:
+        ValueError: If the value is not an integer in [low, high]
+    """
+    value = params.get(key, default)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be an integer, got {value!r}")
+    if not low <= number <= high:
+        raise ValueError(f"'{key}' must be between {low} and {high}, got {number}")
+    return number
+
+
+def _command(device_id: str, action: str, params: Optional[dict]) -> Optional[Dict]:
+    """
+    Build the device command for a light control action
+    
+    Returns:
+        Command dictionary, or None if the action is unknown or the device
+        does not advertise it
+    
+    Raises:
+        ValueError: If params is not a dictionary or a value is out of range
+    """
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise ValueError(f"'params' must be an object, got {type(params).__name__}")
+    
+    # Skip commands the device does not advertise (unknown devices are tried anyway)
+    registry = get_shared_registry()
+    if registry.get(device_id) and action in ('color', 'brightness'):
+        if not registry.supports(device_id, action):
+            print(f"Device '{device_id}' does not support '{action}'")
+            return None
+    
+    if action == 'color':
+        return {'name': 'color', 'value': {
+            channel: _int_param(params, channel, 255, 0, 255) for channel in ('r', 'g', 'b')
+        }}
+    elif action == 'brightness':
+        return {'name': 'brightness', 'value': _int_param(params, 'brightness', 50, 0, 100)}
+    elif action == 'on':
+        return {'name': 'turn', 'value': 'on'}
+    elif action == 'off':
+        return {'name': 'turn', 'value': 'off'}
+    elif action == 'toggle':
+        # Flip the last power state written to the device (on when unknown)
+        last = get_shared_coalescer().last_command(device_id, 'power')
+        on = not (last and last['value'] == 'on')
+        return {'name': 'turn', 'value': 'on' if on else 'off'}
+    return None
+
+
+def light_control_handler(task_data: dict) -> bool:
     """
     Handle light control tasks
     
     Expected task_data:
     {
         'device_id': str,
-        'action': str,  # 'on', 'off', 'color', 'brightness', etc.
+        'action': str,  # 'on', 'off', 'toggle', 'color', 'brightness'
         'params': dict  # Additional parameters
     }
+    
+    Returns:
+        True if the command was queued for the device (False for unknown
+        actions and for devices that have stopped responding)
+    
+    Raises:
+        ValueError: For invalid params (see _command)
     """
-    client = GoveeAPIClient()
     device_id = task_data.get('device_id')
-    action = task_data.get('action')
-    params = task_data.get('params', {})
+    command = _command(device_id, task_data.get('action'), task_data.get('params', {}))
+    if not command:
+        return False
     
-    if action == 'color':
-        r = params.get('r', 255)
-        g = params.get('g', 255)
-        b = params.get('b', 255)
-        client.set_color(device_id, r, g, b)
-    elif action == 'brightness':
-        brightness = params.get('brightness', 50)
-        client.set_brightness(device_id, brightness)
-    elif action == 'on':
-        client.control_device(device_id, {'name': 'turn', 'value': 'on'})
-    elif action == 'off':
-        client.control_device(device_id, {'name': 'turn', 'value': 'off'})
+    coalescer = get_shared_coalescer()
+    if not coalescer.client.is_reachable(device_id):
+        print(f"Device '{device_id}' is not responding; command not sent")
+        return False
+    # Only skip the command if the device is known to show it right now
+    coalescer.submit(device_id, command, max_age=FRESH_SECONDS)
+    return True
+
+
+async def async_light_control_handler(task_data: dict) -> bool:
+    """
+    Handle light control tasks on the event loop
+    
+    Same task_data as light_control_handler. The command is sent directly
+    and awaited, so many can be in flight at once.
+    
+    Returns:
+        True if the device accepted the command
+    """
+    device_id = task_data.get('device_id')
+    command = _command(device_id, task_data.get('action'), task_data.get('params', {}))
+    if not command:
+        return False
+    
+    coalescer = get_shared_coalescer()
+    if coalescer.is_redundant(device_id, command, max_age=FRESH_SECONDS):
+        return True
+    ok = await coalescer.client.async_control_device(device_id, command)
+    if ok:
+        # Sent around the coalescer; tell it (and the shadow) what the device shows
+        coalescer.acknowledge(device_id, command)
+    return ok
+
+
+def parse_commands(items: List[Dict], allow_toggle: bool = True
+                   ) -> Tuple[List[Tuple[str, Dict]], List[str]]:
+    """
+    Validate a list of light control actions in one pass
+    
+    Args:
+        items: List of {'device_id', 'action', 'params'}
+        allow_toggle: Whether 'toggle' is accepted (scenes store absolute
+            states, so they leave it out)
+    
+    Returns:
+        Tuple of (device commands in order, error messages)
+    """
+    commands = []
+    errors = []
+    for index, item in enumerate(items):
+        device_id = item.get('device_id') if isinstance(item, dict) else None
+        action = item.get('action') if device_id else None
+        if not device_id:
+            errors.append(f"commands[{index}]: missing device_id")
+            continue
+        if action == 'toggle' and not allow_toggle:
+            errors.append(f"commands[{index}]: 'toggle' cannot be stored in a scene")
+            continue
+        try:
+            command = _command(device_id, action, item.get('params'))
+        except ValueError as e:
+            errors.append(f"commands[{index}]: {e}")
+            continue
+        if command is None:
+            errors.append(f"commands[{index}]: unsupported action '{action}' for '{device_id}'")
+            continue
+        commands.append((device_id, command))
+    return commands, errors
+
+
+def _batch(task_data: dict) -> Optional[list]:
+    """Get the (device_id, command, payload) list for a batch task"""
+    if task_data.get('scene'):
+        return get_shared_scene_store().compiled(task_data['scene'])
+    return [(device_id, command, None) for device_id, command in task_data.get('commands', [])]
+
+
+def _redundant(batch: list) -> List[bool]:
+    """Flag the commands whose device already shows that state"""
+    coalescer = get_shared_coalescer()
+    return [coalescer.is_redundant(device_id, command, max_age=FRESH_SECONDS)
+            for device_id, command, _ in batch]
+
+
+def _batch_result(batch: list, redundant: List[bool], sent: List[Dict], start_ns: int) -> Dict:
+    """Record accepted commands with the coalescer and summarize the batch in order"""
+    coalescer = get_shared_coalescer()
+    sent = iter(sent)
+    results = []
+    for (device_id, command, _), skip in zip(batch, redundant):
+        if skip:
+            result = {'device_id': device_id, 'command': command['name'],
+                      'ok': True, 'skipped': True, 'ms': 0.0}
+        else:
+            result = next(sent)
+            if result['ok']:
+                coalescer.acknowledge(device_id, command)
+        results.append(result)
+    return {
+        'results': results,
+        'ok': sum(1 for result in results if result['ok']),
+        'skipped': sum(redundant),
+        'ms': (time.monotonic_ns() - start_ns) / 1e6
+    }
+
+
+def light_batch_handler(task_data: dict) -> Optional[Dict]:
+    """
+    Send many light commands at once, devices in parallel
+    
+    Commands the device shadow says are already in effect are not sent.
+    
+    Expected task_data (one of):
+    {
+        'commands': list,  # Validated (device_id, command) pairs from parse_commands
+        'scene': str  # Name of a stored scene (already compiled)
+    }
+    
+    Returns:
+        {'results': per-command results with timings, 'ok': count,
+        'skipped': count, 'ms': total}, or None if the scene does not exist
+    """
+    start = time.monotonic_ns()
+    batch = _batch(task_data)
+    if batch is None:
+        return None
+    redundant = _redundant(batch)
+    send = [entry for entry, skip in zip(batch, redundant) if not skip]
+    sent = get_shared_coalescer().client.send_batch(send) if send else []
+    return _batch_result(batch, redundant, sent, start)
+
 
-# Register agent
-task_manager.register_agent('light_control', light_control_handler)
+async def async_light_batch_handler(task_data: dict) -> Optional[Dict]:
+    """Coroutine version of light_batch_handler for the async runtime"""
+    start = time.monotonic_ns()
+    batch = _batch(task_data)
+    if batch is None:
+        return None
+    redundant = _redundant(batch)
+    send = [entry for entry, skip in zip(batch, redundant) if not skip]
+    sent = await get_shared_coalescer().client.async_send_batch(send)
+    return _batch_result(batch, redundant, sent, start)
 
+# Register agents
+task_manager.register_agent('light_control', light_control_handler,
+                            async_function=async_light_control_handler)
+task_manager.register_agent('light_batch', light_batch_handler,
+                            async_function=async_light_batch_handler)
@@ -0,0 +1,293 @@
+"""
+Light Show Agent
+Compiles effects and audio into show files and plays them on the shared render loops
+"""
+import os
+import re
+import threading
+from typing import Dict, List, Tuple
+
+from audio.framebuffer import rolling_effect, trail_effect
+from audio.show import ShowFile, compile_audio, compile_effect, show_effect
+from agents.effect_registry import get_shared_effect_registry
+from agents.task_manager import task_manager
+from govee_api.registry import get_shared_registry
+
+DEFAULT_SHOWS_DIR = os.path.join(os.path.expanduser('~'), '.govee_lights', 'shows')
+DEFAULT_AUDIO_DIR = os.path.join(os.path.expanduser('~'), '.govee_lights', 'audio')
+SHOW_EXTENSION = '.show'
+SHOW_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Limits on what a compile request may ask the worker to render
+MAX_SHOW_STRIPS = 64
+MAX_SHOW_LEDS = 20000
+MAX_SHOW_SECONDS = 600.0
+MAX_SHOW_FPS = 120.0
+
+# Show name -> (strips, start number, open show) for shows on a render loop
+playing: Dict[str, Tuple[List[str], int, ShowFile]] = {}
+_playing_lock = threading.Lock()
+
+
+def shows_dir() -> str:
+    """Directory show files are kept in (GOVEE_SHOWS)"""
+    return os.environ.get('GOVEE_SHOWS', DEFAULT_SHOWS_DIR)
+
+
+def show_path(name: str) -> str:
+    """
+    Get a show's file path
+    
+    Raises:
+        ValueError: If the name is not letters, digits, '_' or '-'
+    """
+    if not SHOW_NAME.match(name or ''):
+        raise ValueError(f"Invalid show name '{name}'")
+    return os.path.join(shows_dir(), name + SHOW_EXTENSION)
+
+
+def audio_dir() -> str:
+    """Directory audio shows may be compiled from (GOVEE_AUDIO_DIR)"""
+    return os.environ.get('GOVEE_AUDIO_DIR', DEFAULT_AUDIO_DIR)
+
+
+def audio_path(wav_path: str) -> str:
+    """
+    Resolve a WAV file under the audio directory
+    
+    Raises:
+        ValueError: If the path points outside the audio directory
+    """
+    root = os.path.realpath(audio_dir())
+    path = os.path.realpath(os.path.join(root, str(wav_path)))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f"No audio file '{wav_path}' in the audio directory")
+    return path
+
+
+def _number(task_data: dict, key: str, default: float, low: float, high: float,
+            cast=float):
+    """
+    Read a numeric task field and check its range
+    
+    Raises:
+        ValueError: If the value is not a number in [low, high]
+    """
+    value = task_data.get(key, default)
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be a number, got {value!r}")
+    if not low <= number <= high:
+        raise ValueError(f"'{key}' must be between {low:g} and {high:g}, got {value!r}")
+    return number
+
+
+def _led_counts(task_data: dict) -> List[int]:
+    """
+    LED counts from the task, else as reported by the registry (100 where unknown)
+    
+    Raises:
+        ValueError: For more than MAX_SHOW_STRIPS strips or MAX_SHOW_LEDS LEDs
+    """
+    led_counts = task_data.get('led_counts')
+    if not led_counts:
+        registry = get_shared_registry()
+        led_counts = [registry.led_count(strip) or 100 for strip in task_data.get('strips') or []]
+    if not isinstance(led_counts, list) or not 0 < len(led_counts) <= MAX_SHOW_STRIPS:
+        raise ValueError(f"A show needs 1-{MAX_SHOW_STRIPS} strips")
+    led_counts = [_number({'led_counts': count}, 'led_counts', 0, 1, MAX_SHOW_LEDS, int)
+                  for count in led_counts]
+    if sum(led_counts) > MAX_SHOW_LEDS:
+        raise ValueError(f"A show may have at most {MAX_SHOW_LEDS} LEDs, got {sum(led_counts)}")
+    return led_counts
+
+
+def _color(task_data: dict) -> tuple:
+    """
+    RGB color from the task
+    
+    Raises:
+        ValueError: Unless the color is three values in 0-255
+    """
+    color = task_data.get('color', (255, 255, 255))
+    if not isinstance(color, (list, tuple)) or len(color) != 3:
+        raise ValueError(f"'color' must be [r, g, b], got {color!r}")
+    return tuple(_number({'color': channel}, 'color', 0, 0, 255, int) for channel in color)
+
+
+def _prune():
+    """Forget and unmap shows that another effect has replaced or taken every strip from"""
+    if not playing:
+        return
+    effects = get_shared_effect_registry()
+    with _playing_lock:
+        stale = [name for name, (strips, order, _) in playing.items()
+                 if not effects.is_current(strips, order)]
+        entries = [playing.pop(name) for name in stale]
+    for _, _, show in entries:
+        show.close()
+
+
+def show_info(name: str, show: ShowFile) -> Dict:
+    """Describe an open show"""
+    return {
+        'name': name,
+        'fps': show.fps,
+        'frames': show.frames,
+        'seconds': round(show.seconds, 3),
+        'led_counts': show.led_counts,
+        'bytes': os.path.getsize(show.path),
+        'playing': name in playing
+    }
+
+
+def list_shows() -> List[Dict]:
+    """Describe every stored show"""
+    try:
+        files = sorted(os.listdir(shows_dir()))
+    except OSError:
+        return []
+    shows = []
+    for filename in files:
+        name, extension = os.path.splitext(filename)
+        if extension != SHOW_EXTENSION:
+            continue
+        try:
+            show = ShowFile(os.path.join(shows_dir(), filename))
+        except (OSError, ValueError) as e:
+            print(f"Error reading show '{name}': {e}")
+            continue
+        shows.append(show_info(name, show))
+        show.close()
+    return shows
+
+
+def _compile(name: str, task_data: dict) -> Dict:
+    """Render a show file from an effect or a WAV file"""
+    path = show_path(name)
+    led_counts = _led_counts(task_data)
+    fps = _number(task_data, 'fps', 30.0, 1.0, MAX_SHOW_FPS)
+    
+    if task_data.get('wav_path'):
+        # Audio shows run to the end of the file unless cut shorter
+        seconds = _number(task_data, 'seconds', MAX_SHOW_SECONDS, 1.0 / fps, MAX_SHOW_SECONDS)
+        wav_path = audio_path(task_data['wav_path'])
+        bands = task_data.get('bands')
+        if bands is not None:
+            if not isinstance(bands, list) or len(bands) != len(led_counts):
+                raise ValueError("'bands' must give one band per strip")
+            bands = [_number({'bands': band}, 'bands', 0, 0, MAX_SHOW_STRIPS - 1, int)
+                     for band in bands]
+        mode = task_data.get('mode', 'dominant')
+        if mode not in ('dominant', 'bands'):
+            raise ValueError(f"Unknown mode '{mode}'")
+        # The file is about to be replaced; unmap it first
+        _stop(name)
+        stats = compile_audio(path, wav_path, led_counts, fps, mode=mode, bands=bands,
+                              palette=task_data.get('palette', 'spectrum'),
+                              seconds=seconds)
+    else:
+        seconds = _number(task_data, 'seconds', 10.0, 1.0 / fps, MAX_SHOW_SECONDS)
+        size = sum(led_counts)
+        color = _color(task_data)
+        effect = task_data.get('effect', 'rolling')
+        if effect == 'rolling':
+            draw = rolling_effect(size, color,
+                                  trail_length=_number(task_data, 'trail_length', 5, 1, size, int))
+        elif effect == 'trail':
+            draw = trail_effect(size, color, factor=_number(task_data, 'factor', 0.8, 0.0, 1.0))
+        else:
+            raise ValueError(f"Unknown effect '{effect}'")
+        _stop(name)
+        stats = compile_effect(path, led_counts, draw, fps, seconds)
+    return dict(stats, name=name)
+
+
+def _stop(name: str) -> bool:
+    """Stop a playing show and unmap it; returns False if it was not playing"""
+    with _playing_lock:
+        entry = playing.pop(name, None)
+    if entry is None:
+        return False
+    strips, order, show = entry
+    # Ignored if another start on the same strips has replaced this one
+    get_shared_effect_registry().release(strips, order)
+    show.close()
+    return True
+
+
+def light_show_handler(task_data: dict):
+    """
+    Handle light show tasks
+    
+    Expected task_data:
+    {
+        'action': str,  # 'list', 'compile', 'play', 'stop', 'delete'
+        'name': str,  # Show name
+        'strips': list,  # Device IDs (compile: for LED counts; play: in chain order)
+        'led_counts': list,  # Optional LED counts for each strip when compiling
+        'segments': list,  # Optional segments per strip for LAN streaming
+        'fps': float,  # Frames per second when compiling
+        'effect': str,  # 'rolling' or 'trail' when compiling an effect
+        'color': tuple,  # RGB color of the effect
+        'seconds': float,  # Length of a compiled effect, or cut-off for audio shows
+        'wav_path': str,  # Compile an audio-reactive show from this WAV file in GOVEE_AUDIO_DIR instead
+        'mode': str,  # 'dominant' or 'bands' for audio shows
+        'bands': list,  # Optional band index per strip in 'bands' mode
+        'palette': str,  # Palette name for audio shows
+        'loop': bool  # Restart at the end when playing (default True)
+    }
+    
+    Returns:
+        Show descriptions for 'list', the show's description for 'compile'
+        and 'play', whether a show was stopped for 'stop'
+    
+    Raises:
+        FileNotFoundError: If the named show does not exist
+        ValueError: For an invalid name, effect or strip count, a value
+            over the MAX_SHOW_* limits or audio outside the audio directory
+    """
+    action = task_data.get('action')
+    name = task_data.get('name')
+    _prune()
+    
+    if action == 'list':
+        return list_shows()
+    
+    elif action == 'compile':
+        return _compile(name, task_data)
+    
+    elif action == 'play':
+        show = ShowFile(show_path(name))
+        try:
+            strips = task_data.get('strips') or []
+            if len(strips) != len(show.led_counts):
+                raise ValueError(f"Show '{name}' has {len(show.led_counts)} strips, "
+                                 f"got {len(strips)} devices")
+            _stop(name)
+            effects = get_shared_effect_registry()
+            effects.coordinator(strips, show.led_counts, task_data.get('segments'))
+            # Frames come from the page cache on the render loop's clock
+            order = effects.start(strips, show_effect(show, task_data.get('loop', True)),
+                                  fps=show.fps)
+        except BaseException:
+            show.close()
+            raise
+        with _playing_lock:
+            playing[name] = (strips, order, show)
+        return show_info(name, show)
+    
+    elif action == 'stop':
+        return _stop(name)
+    
+    elif action == 'delete':
+        path = show_path(name)
+        _stop(name)
+        os.remove(path)
+        return True
+    
+    raise ValueError(f"Unknown action '{action}'")
+
+# Register agent
+task_manager.register_agent('light_show', light_show_handler)
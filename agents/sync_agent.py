@@ -2,11 +2,19 @@
 Synchronization Agent
 Handles synchronized effects across multiple light strips
 """
-from audio.light_sync import LightSyncCoordinator
-from agents.task_manager import task_manager
-from govee_api.client import GoveeAPIClient
+from audio.framebuffer import rolling_effect
+from agents.effect_registry import get_shared_effect_registry
+from agents.task_manager import CancellationToken, task_manager
+from govee_api.registry import get_shared_registry
+
+def _led_counts(task_data: dict, strips: list) -> list:
+    """LED counts from the task, else as reported by the registry (100 where unknown)"""
+    led_counts = task_data.get('led_counts')
+    if not led_counts:
+        registry = get_shared_registry()
+        led_counts = [registry.led_count(strip) or 100 for strip in strips]
+    return led_counts
 
-sync_coordinators = {}
 
 def sync_effect_handler(task_data: dict):
     """
@@ -17,36 +25,57 @@ def sync_effect_handler(task_data: dict):
         'action': str,  # 'start_rolling', 'stop_rolling'
         'strips': list,  # List of device IDs
         'led_counts': list,  # LED counts for each strip
+        'segments': list,  # Optional segments per strip for LAN streaming
         'speed': float,  # Speed of effect
         'color': tuple  # RGB color tuple
     }
     """
-    global sync_coordinators
-    
     action = task_data.get('action')
     strips = task_data.get('strips', [])
-    led_counts = task_data.get('led_counts', [100, 100])  # Default LED counts
+    
+    effects = get_shared_effect_registry()
     
     if action == 'start_rolling':
-        # Create unique key for this set of strips
-        strip_key = '_'.join(sorted(strips))
-        
-        if strip_key not in sync_coordinators:
-            coordinator = LightSyncCoordinator(strips, led_counts)
-            sync_coordinators[strip_key] = coordinator
+        coordinator = effects.coordinator(strips, _led_counts(task_data, strips), task_data.get('segments'))
+        speed = task_data.get('speed', 1.0)
+        color = tuple(task_data.get('color', (255, 255, 255)))
         
-        coordinator = sync_coordinators[strip_key]
+        # Rendered on a shared render loop; takes the strips from any effect driving them
+        effect = rolling_effect(coordinator.framebuffer.size, color, trail_length=5)
+        effects.start(strips, effect, fps=speed)
+    
+    elif action == 'stop_rolling':
+        effects.release(strips)
+
+
+async def async_sync_effect_handler(task_data: dict, token: CancellationToken):
+    """
+    Handle synchronization effect tasks on the event loop
+    
+    Same task_data as sync_effect_handler. 'start_rolling' renders on the
+    event loop and keeps running (without holding a thread) until
+    'stop_rolling' or cancellation.
+    """
+    action = task_data.get('action')
+    strips = task_data.get('strips', [])
+    
+    effects = get_shared_effect_registry()
+    
+    if action == 'start_rolling':
+        coordinator = effects.coordinator(strips, _led_counts(task_data, strips), task_data.get('segments'))
         speed = task_data.get('speed', 1.0)
         color = tuple(task_data.get('color', (255, 255, 255)))
         
-        coordinator.create_rolling_effect(speed, color)
+        effect = rolling_effect(coordinator.framebuffer.size, color, trail_length=5)
+        order = effects.claim(strips)
+        try:
+            await coordinator.async_sync_timing(effect, fps=speed, token=token)
+        finally:
+            effects.release(strips, order)
     
     elif action == 'stop_rolling':
-        strip_key = '_'.join(sorted(strips))
-        if strip_key in sync_coordinators:
-            sync_coordinators[strip_key].stop()
-            del sync_coordinators[strip_key]
+        effects.release(strips)
 
 # Register agent
-task_manager.register_agent('sync_effect', sync_effect_handler)
-
+task_manager.register_agent('sync_effect', sync_effect_handler,
+                            async_function=async_sync_effect_handler)
@@ -2,82 +2,593 @@
 Task Manager for Agent Delegation
 Manages and delegates tasks to specialized agents
 """
-from typing import Dict, List, Callable
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Callable, Optional, Set, Tuple
+import asyncio
+import collections
+import contextvars
+import importlib
+import inspect
+import itertools
+import os
 import threading
 import queue
+import time
+
+from govee_api.transport import get_loop_thread
+
+# Lanes keep short commands from queueing behind long-running effects
+SHORT_LANE = 'short'
+LONG_LANE = 'long'
+# Coroutine handlers run on the shared transport event loop instead of a thread
+ASYNC_LANE = 'async'
+
+# Lower runs first; interactive commands overtake queued effect work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20
+
+# task_data keys that name the devices a task drives (used for pre-emption)
+DEVICE_KEYS = ('device_id', 'device_ids', 'strips')
+
+_current_handle = contextvars.ContextVar('current_task', default=None)
+
+
+class TaskExpired(Exception):
+    """Raised from a task's future when its deadline passed before it ran"""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag checked by long-running handlers
+    
+    Handlers that drive several devices also skip the devices in
+    `released`, which higher-priority commands have taken over.
+    """
+    
+    def __init__(self):
+        """Initialize token"""
+        self._event = threading.Event()
+        self._callbacks: List[Callable] = []
+        self.released: Set[str] = set()
+    
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() has been called"""
+        return self._event.is_set()
+    
+    def cancel(self):
+        """Ask the task to stop"""
+        self._event.set()
+        for callback in list(self._callbacks):
+            callback()
+    
+    def release(self, device_ids: Iterable[str]):
+        """
+        Ask the task to stop driving some devices and carry on with the rest
+        
+        Args:
+            device_ids: Devices to leave alone from now on
+        """
+        self.released.update(device_ids)
+    
+    def wait(self, timeout: float) -> bool:
+        """
+        Sleep for up to timeout seconds, waking early on cancellation
+        
+        Args:
+            timeout: Seconds to sleep
+        
+        Returns:
+            True if the token was cancelled
+        """
+        return self._event.wait(timeout)
+    
+    async def wait_async(self, timeout: float) -> bool:
+        """
+        Coroutine version of wait() for handlers running on an event loop
+        
+        Args:
+            timeout: Seconds to sleep
+        
+        Returns:
+            True if the token was cancelled
+        """
+        if self.cancelled:
+            return True
+        
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+        
+        def wake():
+            loop.call_soon_threadsafe(lambda: woken.done() or woken.set_result(None))
+        
+        self._callbacks.append(wake)
+        try:
+            await asyncio.wait_for(woken, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._callbacks.remove(wake)
+        return self.cancelled
+
+
+class TaskHandle(Future):
+    """Future for a submitted task, with its agent, data and cancellation token"""
+    
+    _ids = itertools.count(1)
+    
+    def __init__(self, agent_name: str, task_data: Dict, lane: str,
+                 priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None):
+        """
+        Initialize task handle
+        
+        Args:
+            agent_name: Agent that handles the task
+            task_data: Data dictionary for the task
+            lane: Lane the task runs in
+            priority: Queue priority (lower runs first)
+            deadline: time.monotonic() after which the task is dropped unrun
+        """
+        super().__init__()
+        self.id = next(self._ids)
+        self.agent = agent_name
+        self.data = task_data
+        self.lane = lane
+        self.priority = priority
+        self.deadline = deadline
+        self.preempted = False
+        self.token = CancellationToken()
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    def cancel(self) -> bool:
+        """
+        Cancel the task
+        
+        A queued task will not run. A running task has its token cancelled
+        and stops at its next check.
+        
+        Returns:
+            True if the task was stopped before it started
+        """
+        self.token.cancel()
+        return super().cancel()
+    
+    def devices(self) -> set:
+        """Device IDs named in the task data"""
+        devices = set()
+        for key in DEVICE_KEYS:
+            value = self.data.get(key)
+            if isinstance(value, str):
+                devices.add(value)
+            elif value:
+                devices.update(value)
+        return devices
+    
+    @property
+    def status(self) -> str:
+        """One of 'queued', 'running', 'preempted', 'cancelled', 'expired', 'failed' or 'done'"""
+        if self.preempted and (self.cancelled() or self.token.cancelled):
+            return 'preempted'
+        if self.cancelled():
+            return 'cancelled'
+        if self.running():
+            return 'running'
+        if not self.done():
+            return 'queued'
+        if isinstance(self.exception(), TaskExpired):
+            return 'expired'
+        return 'failed' if self.exception() else 'done'
+
 
 class TaskManager:
     """Manages task delegation to specialized agents"""
     
-    def __init__(self):
-        """Initialize task manager"""
+    def __init__(self, workers: int = 4, long_running_workers: int = 4,
+                 mode: Optional[str] = None):
+        """
+        Initialize task manager
+        
+        Args:
+            workers: Threads serving short commands
+            long_running_workers: Threads serving long-running (streaming) tasks
+            mode: 'thread' to run agents on the worker threads, or 'async' to
+                run agents' coroutine variants on the shared event loop where
+                they have one (or set GOVEE_TASK_MODE; default 'thread')
+        """
+        self.mode = mode or os.environ.get('GOVEE_TASK_MODE', 'thread')
+        if self.mode not in ('thread', 'async'):
+            raise ValueError(f"Unknown task manager mode '{self.mode}'")
+        
         self.agents: Dict[str, Callable] = {}
-        self.task_queue = queue.Queue()
+        self.async_agents: Dict[str, Callable] = {}
+        self.lazy_agents: Dict[str, str] = {}
+        self.lanes = {SHORT_LANE: queue.PriorityQueue(), LONG_LANE: queue.PriorityQueue()}
+        self.lane_workers = {SHORT_LANE: workers, LONG_LANE: long_running_workers}
         self.is_running = False
-        self.worker_thread = None
+        self.worker_threads: List[threading.Thread] = []
+        
+        self._long_running = set()
+        self._limits: Dict[str, int] = {}
+        self._takes_token = set()
+        self._lock = threading.Lock()
+        self._active: Dict[int, TaskHandle] = {}
+        # Coroutine tasks scheduled on the event loop but not started yet
+        self._scheduled: Dict[int, TaskHandle] = {}
+        # Called with the devices a pre-empting task takes (see register_device_releaser)
+        self._releasers: List[Callable[[set], None]] = []
+        self._running = collections.Counter()
+        self._deferred: Dict[str, collections.deque] = collections.defaultdict(collections.deque)
+        self._metrics: Dict[str, Dict[str, float]] = collections.defaultdict(lambda: {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+            'expired': 0, 'preempted': 0, 'ran': 0,
+            'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0, 'run_max': 0.0
+        })
+    
+    @property
+    def task_queue(self) -> queue.PriorityQueue:
+        """Queue of short commands"""
+        return self.lanes[SHORT_LANE]
     
-    def register_agent(self, agent_name: str, agent_function: Callable):
+    def register_agent(self, agent_name: str, agent_function: Callable,
+                       long_running: bool = False, max_concurrency: Optional[int] = None,
+                       async_function: Optional[Callable] = None):
         """
         Register an agent function
         
         Args:
             agent_name: Name identifier for the agent
-            agent_function: Function to execute for this agent
+            agent_function: Function to execute for this agent. It is called
+                as agent_function(task_data), or agent_function(task_data, token)
+                if it takes a second parameter for a CancellationToken. A
+                coroutine function always runs on the event loop
+            long_running: Run this agent's tasks in the long-running lane
+            max_concurrency: Most tasks of this agent running at once (None for no limit)
+            async_function: Coroutine variant used instead in 'async' mode
         """
         self.agents[agent_name] = agent_function
+        if inspect.iscoroutinefunction(agent_function):
+            async_function = agent_function
+        if async_function:
+            self.async_agents[agent_name] = async_function
+        if long_running:
+            self._long_running.add(agent_name)
+        if max_concurrency:
+            self._limits[agent_name] = max_concurrency
+        for function in (agent_function, async_function):
+            if function and len(inspect.signature(function).parameters) > 1:
+                self._takes_token.add(function)
+    
+    def register_lazy_agent(self, agent_name: str, module: str):
+        """
+        Name the module that registers an agent, to import on first use
+        
+        Keeps heavy agents (audio, effects) and their numpy/audio imports
+        out of startup until a task for them is submitted.
+        
+        Args:
+            agent_name: Name the module registers its agent under
+            module: Dotted module path, e.g. 'agents.audio_agent'
+        """
+        if agent_name not in self.agents:
+            self.lazy_agents[agent_name] = module
+    
+    def register_device_releaser(self, releaser: Callable[[set], None]):
+        """
+        Register a callback that gives up devices outside any task
+        
+        Effects keep running on render loops after the task that started
+        them has returned; their owner registers here so pre-empting tasks
+        can take single devices from them too.
+        
+        Args:
+            releaser: Called as releaser(device_ids) when a pre-empting task
+                is submitted
+        """
+        self._releasers.append(releaser)
+    
+    def _handler(self, agent_name: str) -> Tuple[Callable, bool]:
+        """Get the function that runs an agent's tasks and whether it is a coroutine"""
+        function = self.agents[agent_name]
+        if agent_name in self.async_agents and (
+                self.mode == 'async' or inspect.iscoroutinefunction(function)):
+            return self.async_agents[agent_name], True
+        return function, False
     
-    def submit_task(self, agent_name: str, task_data: Dict):
+    def submit_task(self, agent_name: str, task_data: Dict,
+                    long_running: Optional[bool] = None, priority: int = PRIORITY_NORMAL,
+                    ttl: Optional[float] = None, deadline: Optional[float] = None,
+                    preempt: bool = False) -> TaskHandle:
         """
         Submit a task to an agent
         
         Args:
             agent_name: Name of the agent to handle the task
             task_data: Data dictionary for the task
+            long_running: Override the agent's lane
+            priority: Queue priority, e.g. PRIORITY_INTERACTIVE (lower runs first)
+            ttl: Seconds the task stays worth running; later it is dropped
+                and its future raises TaskExpired
+            deadline: Absolute time.monotonic() alternative to ttl
+            preempt: Take this task's devices from lower-priority queued and
+                running tasks (and from running effects); a task left with
+                none of its devices is cancelled
+        
+        Returns:
+            Handle (a Future) to wait on or cancel the task
         """
+        if agent_name not in self.agents and agent_name in self.lazy_agents:
+            # Importing the module registers the agent
+            importlib.import_module(self.lazy_agents[agent_name])
         if agent_name not in self.agents:
             raise ValueError(f"Agent '{agent_name}' not registered")
         
-        self.task_queue.put({
-            'agent': agent_name,
-            'data': task_data
-        })
+        if long_running is None:
+            long_running = agent_name in self._long_running
+        if self._handler(agent_name)[1]:
+            lane = ASYNC_LANE
+        else:
+            lane = LONG_LANE if long_running else SHORT_LANE
+        
+        if ttl is not None:
+            deadline = time.monotonic() + ttl
+        handle = TaskHandle(agent_name, task_data, lane, priority, deadline)
+        with self._lock:
+            self._metrics[agent_name]['submitted'] += 1
+        if preempt:
+            self._preempt(handle)
+        self._enqueue(handle)
+        return handle
+    
+    def _tasks(self) -> List[TaskHandle]:
+        """All running, parked and queued tasks"""
+        with self._lock:
+            handles = list(self._active.values()) + list(self._scheduled.values())
+            for deferred in self._deferred.values():
+                handles += deferred
+        for lane_queue in self.lanes.values():
+            with lane_queue.mutex:
+                handles += [entry[2] for entry in lane_queue.queue]
+        return handles
+    
+    def _preempt(self, handle: TaskHandle):
+        """
+        Take handle's devices from lower-priority tasks and running effects
+        
+        A task that drives other devices too keeps running without the
+        taken ones (see CancellationToken.released); one left with no
+        devices is cancelled.
+        """
+        devices = handle.devices()
+        if not devices:
+            return
+        for releaser in self._releasers:
+            try:
+                releaser(devices)
+            except Exception as e:
+                print(f"Error releasing devices {sorted(devices)}: {e}")
+        for other in self._tasks():
+            overlap = devices & other.devices()
+            if other.priority <= handle.priority or other.done() or not overlap:
+                continue
+            if other.running() and self._handler(other.agent)[0] not in self._takes_token:
+                # Cannot be interrupted; let it finish
+                continue
+            other.token.release(overlap)
+            if other.devices() <= other.token.released:
+                other.preempted = True
+                other.cancel()
+    
+    def _enqueue(self, handle: TaskHandle):
+        """Queue a task on its lane (or schedule it on the event loop)"""
+        if handle.lane == ASYNC_LANE:
+            with self._lock:
+                self._scheduled[handle.id] = handle
+            asyncio.run_coroutine_threadsafe(self._run_async(handle), get_loop_thread().loop)
+        else:
+            self.lanes[handle.lane].put((handle.priority, handle.id, handle))
+    
+    def current_task(self) -> Optional[TaskHandle]:
+        """Get the handle of the task running on the calling thread"""
+        return _current_handle.get()
+    
+    def cancel_agent_tasks(self, agent_name: str) -> int:
+        """
+        Cancel every queued and running task of an agent (except the caller's)
+        
+        Args:
+            agent_name: Agent whose tasks are cancelled
+        
+        Returns:
+            Number of tasks cancelled
+        """
+        current = self.current_task()
+        cancelled = 0
+        for handle in self._tasks():
+            if handle.agent == agent_name and handle is not current and not handle.done():
+                handle.cancel()
+                cancelled += 1
+        return cancelled
     
     def start(self):
-        """Start the task manager worker thread"""
+        """Start the task manager worker threads"""
         if self.is_running:
             return
         
         self.is_running = True
-        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self.worker_thread.start()
+        for lane, count in self.lane_workers.items():
+            for _ in range(count):
+                thread = threading.Thread(target=self._worker_loop, args=(lane,), daemon=True)
+                thread.start()
+                self.worker_threads.append(thread)
     
     def stop(self):
-        """Stop the task manager"""
+        """Stop the task manager, cancelling running tasks"""
         self.is_running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=1.0)
+        with self._lock:
+            for handle in self._active.values():
+                handle.token.cancel()
+        for thread in self.worker_threads:
+            thread.join(timeout=1.0)
+        self.worker_threads = []
     
-    def _worker_loop(self):
-        """Internal worker loop that processes tasks"""
+    def _worker_loop(self, lane: str):
+        """Internal worker loop that processes tasks from one lane"""
+        lane_queue = self.lanes[lane]
         while self.is_running:
             try:
-                task = self.task_queue.get(timeout=1.0)
-                agent_name = task['agent']
-                task_data = task['data']
-                
-                if agent_name in self.agents:
-                    try:
-                        self.agents[agent_name](task_data)
-                    except Exception as e:
-                        print(f"Error executing task for agent '{agent_name}': {e}")
-                
-                self.task_queue.task_done()
+                _, _, handle = lane_queue.get(timeout=1.0)
             except queue.Empty:
                 continue
+            
+            try:
+                self._run(handle)
+            finally:
+                lane_queue.task_done()
+    
+    def _begin(self, handle: TaskHandle) -> bool:
+        """
+        Claim a slot for a task, respecting its agent's concurrency limit
+        
+        Returns:
+            False if the task was parked, cancelled or expired and must not run
+        """
+        agent_name = handle.agent
+        with self._lock:
+            self._scheduled.pop(handle.id, None)
+            metrics = self._metrics[agent_name]
+            expired = handle.deadline is not None and time.monotonic() > handle.deadline
+            limit = self._limits.get(agent_name)
+            if not expired and limit and self._running[agent_name] >= limit:
+                # Parked until a running task of this agent finishes
+                self._deferred[agent_name].append(handle)
+                return False
+            if not handle.set_running_or_notify_cancel():
+                metrics['preempted' if handle.preempted else 'cancelled'] += 1
+            elif expired:
+                # Too late to be useful (e.g. a stale frame): drop it unrun
+                handle.set_exception(TaskExpired(f"Task {handle.id} for '{agent_name}' expired"))
+                metrics['expired'] += 1
+            else:
+                self._running[agent_name] += 1
+                self._active[handle.id] = handle
+                handle.started_at = time.monotonic()
+                _current_handle.set(handle)
+                return True
+            
+            # Hand the slot it would have used to the next parked task
+            deferred = self._deferred.get(agent_name)
+            released = deferred.popleft() if deferred else None
+            if released:
+                self._enqueue(released)
+            return False
+    
+    def _complete(self, handle: TaskHandle, result=None, error: Optional[Exception] = None):
+        """Resolve a task's future and record it"""
+        _current_handle.set(None)
+        if error is not None:
+            print(f"Error executing task for agent '{handle.agent}': {error}")
+            handle.set_exception(error)
+        else:
+            handle.set_result(result)
+        handle.finished_at = time.monotonic()
+        self._finish(handle)
+    
+    def _run(self, handle: TaskHandle):
+        """Run one task on the calling worker thread"""
+        if not self._begin(handle):
+            return
+        function, _ = self._handler(handle.agent)
+        try:
+            if function in self._takes_token:
+                result = function(handle.data, handle.token)
+            else:
+                result = function(handle.data)
+        except Exception as e:
+            self._complete(handle, error=e)
+        else:
+            self._complete(handle, result)
+    
+    async def _run_async(self, handle: TaskHandle):
+        """Run one coroutine task on the event loop"""
+        if not self._begin(handle):
+            return
+        function, _ = self._handler(handle.agent)
+        try:
+            if function in self._takes_token:
+                result = await function(handle.data, handle.token)
+            else:
+                result = await function(handle.data)
+        except Exception as e:
+            self._complete(handle, error=e)
+        else:
+            self._complete(handle, result)
+    
+    def _finish(self, handle: TaskHandle):
+        """Record metrics for a finished task and release a deferred one"""
+        agent_name = handle.agent
+        wait = handle.started_at - handle.submitted_at
+        run = handle.finished_at - handle.started_at
+        
+        with self._lock:
+            self._running[agent_name] -= 1
+            del self._active[handle.id]
+            metrics = self._metrics[agent_name]
+            if handle.token.cancelled:
+                metrics['preempted' if handle.preempted else 'cancelled'] += 1
+            elif handle.exception():
+                metrics['failed'] += 1
+            else:
+                metrics['completed'] += 1
+            metrics['ran'] += 1
+            metrics['wait_total'] += wait
+            metrics['wait_max'] = max(metrics['wait_max'], wait)
+            metrics['run_total'] += run
+            metrics['run_max'] = max(metrics['run_max'], run)
+            
+            deferred = self._deferred.get(agent_name)
+            released = deferred.popleft() if deferred else None
+        if released:
+            self._enqueue(released)
+    
+    def metrics(self) -> Dict:
+        """
+        Get queue and per-agent metrics
+        
+        Returns:
+            Dictionary with queue depth and worker count per lane, per agent
+            task counts plus queue wait and run times in milliseconds, and
+            task counts totalled over all agents (the async lane reports how
+            many coroutine tasks are running)
+        """
+        counts = ('submitted', 'completed', 'failed', 'cancelled', 'expired', 'preempted')
+        with self._lock:
+            agents = {}
+            for agent_name, m in self._metrics.items():
+                ran = m['ran']
+                agents[agent_name] = {
+                    **{key: m[key] for key in counts},
+                    'running': self._running[agent_name],
+                    'deferred': len(self._deferred.get(agent_name, ())),
+                    'wait_mean_ms': 1000 * m['wait_total'] / ran if ran else 0.0,
+                    'wait_max_ms': 1000 * m['wait_max'],
+                    'run_mean_ms': 1000 * m['run_total'] / ran if ran else 0.0,
+                    'run_max_ms': 1000 * m['run_max']
+                }
+            lanes = {
+                lane: {'queued': lane_queue.qsize(), 'workers': self.lane_workers[lane]}
+                for lane, lane_queue in self.lanes.items()
+            }
+            lanes[ASYNC_LANE] = {
+                'running': sum(1 for h in self._active.values() if h.lane == ASYNC_LANE)
+            }
+        totals = {key: sum(agent[key] for agent in agents.values()) for key in counts}
+        return {'lanes': lanes, 'agents': agents, 'totals': totals}
 
 # Global task manager instance
 task_manager = TaskManager()
 
 # Initialize task manager
 task_manager.start()
-
@@ -0,0 +1,449 @@
+"""
+Analysis Worker
+Runs audio capture and analysis in a separate process that publishes frames through shared memory
+"""
+import multiprocessing
+import platform
+import time
+import wave
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from audio.features import FeatureExtractor, band_matrix
+from audio.frequency_analyzer import FrequencyAnalyzer
+
+# Header: int64 [latest slot, frames published, input overflows, worker ready]
+LATEST, FRAMES, OVERFLOWS, READY = range(4)
+HEADER_FIELDS = 4
+# Per slot: int64 [sequence, sample position], then float64 scalar features
+SEQ, POSITION = range(2)
+FEATURES = ('rms', 'flux', 'onset', 'beat', 'bpm', 'beat_phase')
+
+# CPUs that keep stores (and loads) in program order for other cores; elsewhere
+# the seqlock's sequence checks are made under a lock shared with the worker
+ORDERED_STORES = platform.machine().lower() in ('x86_64', 'amd64', 'i386', 'i686', 'x86')
+# Seconds a worker may take to open its input before reads report it as failed
+STARTUP_TIMEOUT = 10.0
+
+
+class SharedSpectrum:
+    """
+    Seqlock double buffer of analysis frames in shared memory
+    
+    One process writes, any number read. The writer fills the slot readers
+    are not being pointed at, bumping its sequence number to odd before and
+    back to even after, then points `latest` at it. Readers therefore get
+    the newest complete frame without waiting for it, and a slot they were handed
+    stays untouched until the writer has published one more frame. A
+    reader copying a frame re-checks the sequence afterwards and retries if
+    it changed.
+    
+    Without a lock this relies on the CPU making each process's stores
+    visible to the other in program order, which x86 guarantees but ARM and
+    other weakly ordered CPUs do not, and Python has no fence of its own.
+    Given a lock, the writer holds it for the whole of publish() and readers
+    take it for each sequence check, so the lock's acquire and release order
+    the accesses. A reader never holds it while copying, so the writer waits
+    at most for one check.
+    """
+    
+    def __init__(self, bins: int, n_bands: int, name: Optional[str] = None, lock=None):
+        """
+        Create (or attach to) the shared block
+        
+        Args:
+            bins: Spectrum bins per frame
+            n_bands: Band levels per frame
+            name: Existing block to attach to (None creates a new one)
+            lock: multiprocessing.Lock shared by the writer and readers, for
+                CPUs without ordered stores (None relies on the CPU)
+        """
+        self.bins = bins
+        self.lock = lock
+        self.n_bands = n_bands
+        self.slot_words = 2 + len(FEATURES) + bins + n_bands
+        size = 8 * (HEADER_FIELDS + 2 * self.slot_words)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        
+        words = 8 * HEADER_FIELDS
+        self.header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=self.shm.buf)
+        self.slots = []
+        for index in range(2):
+            offset = words + index * 8 * self.slot_words
+            counters = np.ndarray(2, dtype=np.int64, buffer=self.shm.buf, offset=offset)
+            values = np.ndarray(self.slot_words - 2, dtype=np.float64,
+                                buffer=self.shm.buf, offset=offset + 16)
+            self.slots.append({
+                'counters': counters,
+                'features': values[:len(FEATURES)],
+                'magnitude': values[len(FEATURES):len(FEATURES) + bins],
+                'levels': values[len(FEATURES) + bins:]
+            })
+        if self.owner:
+            self.header.fill(0)
+    
+    def publish(self, position: int, magnitude: np.ndarray,
+                features: Optional[FeatureExtractor] = None):
+        """
+        Write one frame (writer process only)
+        
+        Args:
+            position: Sample count the frame ends at
+            magnitude: Spectrum magnitudes
+            features: Extractor whose current outputs are published with it
+        """
+        index = 1 - int(self.header[LATEST]) if self.header[FRAMES] else 0
+        slot = self.slots[index]
+        counters = slot['counters']
+        
+        with self.lock or nullcontext():
+            counters[SEQ] += 1
+            counters[POSITION] = position
+            np.copyto(slot['magnitude'], magnitude)
+            if features is not None:
+                np.copyto(slot['levels'], features.levels)
+                slot['features'][:] = (features.rms, features.flux, features.onset,
+                                       features.beat, features.bpm, features.beat_phase)
+            counters[SEQ] += 1
+            
+            self.header[LATEST] = index
+            self.header[FRAMES] += 1
+    
+    def acquire(self) -> Optional[Tuple[Dict[str, np.ndarray], int]]:
+        """
+        Get the newest complete frame without copying it
+        
+        Returns:
+            Tuple of (slot views, sequence number), or None before the first
+            frame; pass the sequence to intact() to check the views were not
+            overwritten while in use
+        """
+        while self.header[FRAMES]:
+            with self.lock or nullcontext():
+                index = int(self.header[LATEST])
+                slot = self.slots[index]
+                seq = int(slot['counters'][SEQ])
+                if seq % 2 == 0 and int(self.header[LATEST]) == index:
+                    return slot, seq
+        return None
+    
+    def intact(self, slot: Dict[str, np.ndarray], seq: int) -> bool:
+        """Check that a slot from acquire() has not been rewritten since"""
+        with self.lock or nullcontext():
+            return int(slot['counters'][SEQ]) == seq
+    
+    def read_features(self, levels: np.ndarray) -> Optional[Tuple[int, Dict[str, float]]]:
+        """
+        Copy the newest frame's features, retrying if the writer got in the way
+        
+        Args:
+            levels: Array the band levels are copied into
+        
+        Returns:
+            Tuple of (sample position, scalar features), or None before the
+            first frame
+        """
+        while True:
+            acquired = self.acquire()
+            if acquired is None:
+                return None
+            slot, seq = acquired
+            np.copyto(levels, slot['levels'])
+            values = slot['features'].tolist()
+            position = int(slot['counters'][POSITION])
+            if self.intact(slot, seq):
+                return position, dict(zip(FEATURES, values))
+    
+    def close(self):
+        """Detach (and remove the block if this side created it)"""
+        # Views must go before the buffer they point into can be released
+        self.header = None
+        self.slots = []
+        try:
+            self.shm.close()
+        except BufferError as e:
+            print(f"Error releasing shared spectrum: {e}")
+            return
+        if self.owner:
+            self.shm.unlink()
+
+
+def _run_worker(name: str, config: Dict, stop, lock=None):
+    """
+    Worker process: capture, analyse and publish until `stop` is set
+    
+    Args:
+        name: Shared block to publish into
+        config: SharedAnalyzer settings
+        stop: multiprocessing.Event
+        lock: Seqlock lock shared with readers (see SharedSpectrum)
+    """
+    source = None
+    if config['wav_path']:
+        from audio.sources import WavFileSource
+        source = WavFileSource(config['wav_path'], block_size=config['hop_size'], loop=True)
+    analyzer = FrequencyAnalyzer(config['sample_rate'], config['chunk_size'], config['window'],
+                                 config['fft_workers'], config['hop_size'], source=source)
+    extractor = FeatureExtractor(analyzer, n_bands=config['n_bands'])
+    channel = SharedSpectrum(len(analyzer.engine.frequencies), config['n_bands'], name, lock)
+    
+    analyzer.start_stream(config['device_index'])
+    channel.header[READY] = 1
+    # New audio arrives once per hop; poll a few times per hop to keep latency low
+    poll = analyzer.update_interval / 4
+    try:
+        while not stop.is_set():
+            if extractor.update():
+                channel.publish(analyzer.frame_position, analyzer.engine.magnitude, extractor)
+                channel.header[OVERFLOWS] = analyzer.overflows
+            else:
+                stop.wait(poll)
+    finally:
+        analyzer.cleanup()
+        channel.close()
+
+
+class SharedAnalyzer(FrequencyAnalyzer):
+    """
+    FrequencyAnalyzer whose capture and analysis run in a worker process
+    
+    Spectra and features are computed on another core, outside this
+    process's GIL, and read back from shared memory without copying: the
+    arrays returned by get_frequency_spectrum() point into the shared block
+    and stay valid until the worker has published one more frame. Color
+    mapping, FeatureExtractor and SpectrumPacker work on it unchanged.
+    
+    Reads raise RuntimeError once the worker has exited, or if it has not
+    opened its input within STARTUP_TIMEOUT seconds.
+    """
+    
+    def __init__(self, sample_rate: Optional[int] = None, chunk_size: int = 4096,
+                 window: str = 'hann', fft_workers: Optional[int] = None,
+                 hop_size: Optional[int] = None, wav_path: Optional[str] = None,
+                 device_index: Optional[int] = None, n_bands: int = 8,
+                 palette='spectrum', log_colors: bool = False):
+        """
+        Initialize shared analyzer (the worker starts with start_stream())
+        
+        Args:
+            sample_rate: Audio sample rate in Hz (default: the WAV file's, else 44100)
+            chunk_size: FFT window length in samples
+            window: FFT analysis window
+            fft_workers: Threads for scipy's FFT in the worker
+            hop_size: Samples per capture block
+            wav_path: WAV file to loop instead of the microphone
+            device_index: Microphone to capture from
+            n_bands: Bands the worker computes features for
+            palette: Palette (or registered palette name) for frequency colors
+            log_colors: Spread colors over octaves instead of linearly in Hz
+        """
+        if sample_rate is None:
+            sample_rate = 44100
+            if wav_path:
+                with wave.open(wav_path, 'rb') as wav:
+                    sample_rate = wav.getframerate()
+        super().__init__(sample_rate, chunk_size, window, hop_size=hop_size,
+                         palette=palette, log_colors=log_colors)
+        self.engine.magnitude.fill(0)
+        self._own_magnitude = self.engine.magnitude
+        self.n_bands = n_bands
+        self.config = {
+            'sample_rate': sample_rate, 'chunk_size': chunk_size, 'window': window,
+            'fft_workers': fft_workers, 'hop_size': self.hop_size, 'wav_path': wav_path,
+            'device_index': device_index, 'n_bands': n_bands
+        }
+        # Spawn rather than fork: this process runs threads and an event loop
+        self._context = multiprocessing.get_context('spawn')
+        lock = None if ORDERED_STORES else self._context.Lock()
+        self.channel = SharedSpectrum(len(self.engine.frequencies), n_bands, lock=lock)
+        self.process = None
+        self._started = 0.0
+        self._stop = None
+        self._slot = None
+        self._seq = 0
+    
+    @property
+    def overflows(self) -> int:
+        """Capture blocks the worker's input delivered late or dropped"""
+        return int(self.channel.header[OVERFLOWS]) if self.channel.header is not None else 0
+    
+    @property
+    def ready(self) -> bool:
+        """True once the worker has started capturing"""
+        return self.channel.header is not None and bool(self.channel.header[READY])
+    
+    def start_stream(self, device_index: Optional[int] = None):
+        """Start the worker process"""
+        if self.process is not None:
+            return
+        if device_index is not None:
+            self.config['device_index'] = device_index
+        self._stop = self._context.Event()
+        self.process = self._context.Process(
+            target=_run_worker,
+            args=(self.channel.name, self.config, self._stop, self.channel.lock),
+            daemon=True
+        )
+        self.process.start()
+        self._started = time.monotonic()
+    
+    def stop_stream(self):
+        """Stop the worker process"""
+        if self.process is None:
+            return
+        self._stop.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1.0)
+        self.process = None
+    
+    def check_worker(self):
+        """
+        Check the worker is running
+        
+        Raises:
+            RuntimeError: If the stream was not started, the worker exited,
+                or it has not become ready within STARTUP_TIMEOUT seconds
+        """
+        if self.process is None or self.channel.header is None:
+            raise RuntimeError("Audio stream not started")
+        if not self.process.is_alive():
+            raise RuntimeError(f"Audio worker exited with code {self.process.exitcode}")
+        if not self.ready and time.monotonic() - self._started > STARTUP_TIMEOUT:
+            raise RuntimeError(f"Audio worker did not start capturing within {STARTUP_TIMEOUT:g}s")
+    
+    def latest_spectrum(self, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Point at the worker's newest frame (None before its first one)
+        
+        Args:
+            out: Array to copy the frame into instead, retrying if the
+                worker rewrites it meanwhile; safe from any thread
+        
+        Raises:
+            RuntimeError: If the worker is not running (see check_worker())
+        """
+        self.check_worker()
+        if out is not None:
+            while True:
+                acquired = self.channel.acquire()
+                if acquired is None:
+                    return None
+                slot, seq = acquired
+                np.copyto(out, slot['magnitude'])
+                if self.channel.intact(slot, seq):
+                    return out
+        acquired = self.channel.acquire()
+        if acquired is None:
+            return None
+        self._slot, self._seq = acquired
+        self.engine.magnitude = self._slot['magnitude']
+        self.frame_position = int(self._slot['counters'][POSITION])
+        return self.engine.magnitude
+    
+    def get_frequency_spectrum(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the worker's most recent spectrum
+        
+        Never blocks; all zeros until the worker's first frame. The
+        magnitudes are a view into shared memory (see frame_intact()).
+        
+        Returns:
+            Tuple of (bin frequencies, magnitudes) from DC to Nyquist
+        
+        Raises:
+            RuntimeError: If the worker is not running (see check_worker())
+        """
+        self.latest_spectrum()
+        return self.engine.frequencies, self.engine.magnitude
+    
+    def frame_intact(self) -> bool:
+        """Check the last spectrum returned has not been overwritten by the worker yet"""
+        return self._slot is None or self.channel.intact(self._slot, self._seq)
+    
+    def cleanup(self):
+        """Stop the worker and release the shared block"""
+        self.stop_stream()
+        self.engine.magnitude = self._own_magnitude
+        self._slot = None
+        self.channel.close()
+
+
+class SharedFeatures:
+    """FeatureExtractor stand-in that reads the features a SharedAnalyzer's worker publishes"""
+    
+    def __init__(self, analyzer: SharedAnalyzer):
+        """
+        Initialize shared features
+        
+        Args:
+            analyzer: Shared analyzer whose worker computes the features
+        """
+        self.analyzer = analyzer
+        self.n_bands = analyzer.n_bands
+        # Same band edges as the worker's FeatureExtractor defaults
+        _, self.band_frequencies = band_matrix(
+            analyzer.engine.frequencies, self.n_bands, 30.0,
+            min(16000.0, analyzer.sample_rate / 2), 'mel'
+        )
+        self.levels = np.zeros(self.n_bands)
+        self.rms = 0.0
+        self.flux = 0.0
+        self.onset = False
+        self.beat = False
+        self.bpm = 0.0
+        self.beat_phase = 0.0
+        self._position = -1
+    
+    def update(self) -> bool:
+        """
+        Copy the worker's newest features
+        
+        Returns:
+            True if they belong to a new audio frame
+        
+        Raises:
+            RuntimeError: If the worker is not running
+        """
+        self.analyzer.check_worker()
+        frame = self.analyzer.channel.read_features(self.levels)
+        if frame is None or frame[0] == self._position:
+            self.onset = self.beat = False
+            return False
+        self._position, values = frame
+        self.rms = values['rms']
+        self.flux = values['flux']
+        self.onset = bool(values['onset'])
+        self.beat = bool(values['beat'])
+        self.bpm = values['bpm']
+        self.beat_phase = values['beat_phase']
+        return True
+    
+    def band_level(self, band: int) -> float:
+        """Get the auto-gained level (0-1) of one band"""
+        return float(self.levels[band])
+
+
+def feature_extractor(analyzer: FrequencyAnalyzer, n_bands: int = 8):
+    """
+    Get a feature source for an analyzer
+    
+    Reuses the features a SharedAnalyzer's worker already computes when the
+    band count matches, and otherwise computes them here.
+    
+    Args:
+        analyzer: Local or shared analyzer
+        n_bands: Number of bands
+    
+    Returns:
+        SharedFeatures or FeatureExtractor
+    """
+    if isinstance(analyzer, SharedAnalyzer) and analyzer.n_bands == n_bands:
+        return SharedFeatures(analyzer)
+    return FeatureExtractor(analyzer, n_bands=n_bands)
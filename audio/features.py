@@ -0,0 +1,285 @@
+"""
+Spectral Features
+Band energies, loudness, onsets and beats computed from FrequencyAnalyzer spectra
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from audio.frequency_analyzer import FrequencyAnalyzer
+
+# Packed spectrum frames carry one byte per bar: 0 at FLOOR_DB, 255 at full scale
+SPECTRUM_BARS = 64
+FLOOR_DB = -80.0
+
+
+def hz_to_mel(frequency):
+    """Convert Hz to mel (HTK formula); works on scalars and arrays"""
+    return 2595.0 * np.log10(1.0 + np.asarray(frequency) / 700.0)
+
+
+def mel_to_hz(mel):
+    """Convert mel to Hz (HTK formula); works on scalars and arrays"""
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+def band_matrix(frequencies: np.ndarray, n_bands: int, min_freq: float, max_freq: float,
+                scale: str = 'mel') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a matrix that sums FFT bins into bands
+    
+    Args:
+        frequencies: Bin frequencies of the spectrum
+        n_bands: Number of bands
+        min_freq: Lower edge of the first band in Hz
+        max_freq: Upper edge of the last band in Hz
+        scale: 'mel' for overlapping triangular filters, 'log' for
+            rectangular log-spaced bands
+    
+    Returns:
+        Tuple of (weights with shape [n_bands, n_bins], band centre frequencies)
+    """
+    if scale == 'mel':
+        edges = mel_to_hz(np.linspace(hz_to_mel(min_freq), hz_to_mel(max_freq), n_bands + 2))
+        lower, centers, upper = edges[:-2], edges[1:-1], edges[2:]
+        f = frequencies[np.newaxis, :]
+        rising = (f - lower[:, np.newaxis]) / (centers - lower)[:, np.newaxis]
+        falling = (upper[:, np.newaxis] - f) / (upper - centers)[:, np.newaxis]
+        weights = np.clip(np.minimum(rising, falling), 0.0, None)
+    elif scale == 'log':
+        edges = np.geomspace(min_freq, max_freq, n_bands + 1)
+        lower, upper = edges[:-1], edges[1:]
+        centers = np.sqrt(lower * upper)
+        f = frequencies[np.newaxis, :]
+        weights = ((f >= lower[:, np.newaxis]) & (f < upper[:, np.newaxis])).astype(np.float64)
+    else:
+        raise ValueError(f"Unknown band scale '{scale}'")
+    
+    # Low bands can be narrower than one FFT bin; give them their nearest bin
+    empty = weights.sum(axis=1) == 0
+    if empty.any():
+        nearest = np.abs(frequencies[np.newaxis, :] - centers[empty, np.newaxis]).argmin(axis=1)
+        weights[np.flatnonzero(empty), nearest] = 1.0
+    
+    return weights, centers
+
+
+class FeatureExtractor:
+    """Computes per-frame audio features from the analyzer's latest spectrum"""
+    
+    def __init__(self, analyzer: FrequencyAnalyzer, n_bands: int = 8, scale: str = 'mel',
+                 min_freq: float = 30.0, max_freq: float = 16000.0,
+                 onset_sensitivity: float = 1.5, history: int = 64,
+                 min_bpm: float = 60.0, max_bpm: float = 200.0):
+        """
+        Initialize feature extractor
+        
+        Args:
+            analyzer: Analyzer whose spectra are used
+            n_bands: Number of bands
+            scale: Band spacing, 'mel' or 'log'
+            min_freq: Lowest band edge in Hz
+            max_freq: Highest band edge in Hz
+            onset_sensitivity: Standard deviations above the mean flux that
+                count as an onset (lower is more sensitive)
+            history: Frames of spectral flux kept for the adaptive threshold
+            min_bpm: Slowest tempo the beat tracker will lock to
+            max_bpm: Fastest tempo the beat tracker will lock to
+        """
+        self.analyzer = analyzer
+        self.matrix, self.band_frequencies = band_matrix(
+            analyzer.engine.frequencies, n_bands, min_freq,
+            min(max_freq, analyzer.sample_rate / 2), scale
+        )
+        self.n_bands = n_bands
+        self.onset_sensitivity = onset_sensitivity
+        self.min_period = 60.0 / max_bpm
+        self.max_period = 60.0 / min_bpm
+        
+        # Parseval scale: windowed one-sided power -> mean square of the signal
+        n = analyzer.chunk_size
+        self._power_weights = np.full(len(analyzer.engine.frequencies), 2.0 / n ** 2)
+        self._power_weights[0] = 1.0 / n ** 2
+        if n % 2 == 0:
+            self._power_weights[-1] = 1.0 / n ** 2
+        self._window_rms = float(np.sqrt(np.mean(analyzer.engine.window ** 2)))
+        
+        # Per-frame work buffers
+        self._power = np.zeros(len(analyzer.engine.frequencies))
+        self._log_bands = np.zeros(n_bands)
+        self._previous = np.zeros(n_bands)
+        self._diff = np.zeros(n_bands)
+        self._peaks = np.full(n_bands, 1e-9)
+        
+        # Outputs
+        self.bands = np.zeros(n_bands)
+        self.levels = np.zeros(n_bands)
+        self.rms = 0.0
+        self.flux = 0.0
+        self.onset = False
+        self.beat = False
+        self.bpm = 0.0
+        self.beat_phase = 0.0
+        self.frames = 0
+        
+        self._flux_history = np.zeros(history)
+        self._last_onset: Optional[float] = None
+        self._period: Optional[float] = None
+        self._last_beat: Optional[float] = None
+        self._position = -1
+    
+    def update(self) -> bool:
+        """
+        Compute features for the analyzer's latest spectrum
+        
+        Returns:
+            True if a new audio frame was processed, False if the analyzer
+            had nothing new (features are left unchanged)
+        """
+        _, magnitude = self.analyzer.get_frequency_spectrum()
+        position = self.analyzer.frame_position
+        if position == self._position:
+            self.onset = self.beat = False
+            return False
+        self._position = position
+        now = position / self.analyzer.sample_rate
+        
+        # One pass over the spectrum: power, then bands and loudness from it
+        np.multiply(magnitude, magnitude, out=self._power)
+        np.dot(self.matrix, self._power, out=self.bands)
+        mean_square = float(np.dot(self._power_weights, self._power))
+        self.rms = np.sqrt(mean_square) / self._window_rms / 32768.0
+        
+        # Auto-gain band levels against a slowly decaying per-band peak
+        np.multiply(self._peaks, 0.995, out=self._peaks)
+        np.maximum(self._peaks, self.bands, out=self._peaks)
+        np.divide(self.bands, self._peaks, out=self.levels)
+        
+        # Spectral flux: summed positive change in log band energy
+        np.log1p(self.bands, out=self._log_bands)
+        np.subtract(self._log_bands, self._previous, out=self._diff)
+        np.maximum(self._diff, 0.0, out=self._diff)
+        self._previous[:] = self._log_bands
+        self.flux = float(self._diff.sum()) if self.frames else 0.0
+        
+        history = self._flux_history
+        threshold = history.mean() + self.onset_sensitivity * history.std()
+        self.onset = self.frames >= len(history) // 4 and self.flux > threshold
+        history[self.frames % len(history)] = self.flux
+        self.frames += 1
+        
+        self._track_beat(now)
+        return True
+    
+    def _track_beat(self, now: float):
+        """Update tempo from onset spacing and flag beats"""
+        self.beat = False
+        
+        if self.onset:
+            if self._last_onset is not None:
+                interval = now - self._last_onset
+                # Fold onsets on off-beats or skipped beats back into range
+                while interval > self.max_period:
+                    interval /= 2
+                if interval >= self.min_period:
+                    if self._period is None:
+                        self._period = interval
+                    else:
+                        self._period = 0.8 * self._period + 0.2 * interval
+            if self._last_onset is None or now - self._last_onset >= self.min_period:
+                self._last_onset = now
+        
+        if self._period is None:
+            if self.onset:
+                self.beat = True
+                self._last_beat = now
+            return
+        
+        self.bpm = 60.0 / self._period
+        since_beat = now - self._last_beat if self._last_beat is not None else self._period
+        if since_beat >= self._period or (self.onset and since_beat >= 0.8 * self._period):
+            # An onset near the predicted time re-phases the beat; otherwise freewheel
+            self.beat = True
+            self._last_beat = now
+            since_beat = 0.0
+        self.beat_phase = min(since_beat / self._period, 1.0)
+    
+    def band_level(self, band: int) -> float:
+        """Get the auto-gained level (0-1) of one band"""
+        return float(self.levels[band])
+    
+    def snapshot(self) -> Dict:
+        """
+        Get the current features as plain Python values
+        
+        Returns:
+            Dictionary suitable for JSON serialization
+        """
+        return {
+            'bands': self.levels.tolist(),
+            'rms': float(self.rms),
+            'flux': self.flux,
+            'onset': bool(self.onset),
+            'beat': self.beat,
+            'bpm': self.bpm,
+            'beat_phase': self.beat_phase
+        }
+
+
+class SpectrumPacker:
+    """Reduces an analyzer's latest spectrum to log-spaced uint8 bars"""
+    
+    def __init__(self, analyzer: FrequencyAnalyzer, bars: int = SPECTRUM_BARS,
+                 floor_db: float = FLOOR_DB):
+        """
+        Initialize packer
+        
+        Args:
+            analyzer: FrequencyAnalyzer whose spectrum is packed
+            bars: Number of bars per frame
+            floor_db: Level (dB below full scale) that maps to 0
+        """
+        self.analyzer = analyzer
+        self.bars = bars
+        self.floor_db = floor_db
+        
+        engine = analyzer.engine
+        bins = analyzer.audible_bins
+        weights, self.centers = band_matrix(engine.frequencies[bins], bars,
+                                            analyzer.min_freq, analyzer.max_freq, 'log')
+        # Average the bins of each bar; bars narrower than a bin stay empty
+        counts = weights.sum(axis=1, keepdims=True)
+        self.weights = np.divide(weights, counts, out=np.zeros_like(weights), where=counts > 0)
+        # Peak magnitude of a full-scale int16 sine under the analysis window
+        self.reference = float(engine.window.sum()) * 32767 / 2
+        
+        self._magnitude = np.empty(len(engine.frequencies), dtype=np.float64)
+        self._levels = np.empty(bars, dtype=np.float64)
+        self._frame = np.empty(bars, dtype=np.uint8)
+    
+    def pack(self) -> Optional[bytes]:
+        """
+        Pack the analyzer's most recent spectrum
+        
+        Copies the magnitudes the analyzer already computed instead of
+        running another FFT, so the cost does not depend on who is
+        listening, and the audio thread can analyse the next frame meanwhile.
+        
+        Returns:
+            `bars` bytes, low to high frequency, or None before the
+            analyzer's first frame
+        """
+        magnitude = self.analyzer.latest_spectrum(out=self._magnitude)
+        if magnitude is None:
+            return None
+        magnitude = magnitude[self.analyzer.audible_bins]
+        np.dot(self.weights, magnitude, out=self._levels)
+        self._levels /= self.reference
+        np.maximum(self._levels, 1e-12, out=self._levels)
+        np.log10(self._levels, out=self._levels)
+        # 20 * log10 scaled from [floor_db, 0] to [0, 255]
+        self._levels *= 20 * 255 / -self.floor_db
+        self._levels += 255
+        np.clip(self._levels, 0, 255, out=self._levels)
+        self._frame[:] = self._levels
+        return self._frame.tobytes()
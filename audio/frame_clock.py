@@ -0,0 +1,170 @@
+"""
+Frame Clock
+Absolute-deadline frame scheduler with frame skipping and timing statistics
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class FrameClock:
+    """
+    Paces a render loop against absolute deadlines on time.monotonic_ns
+    
+    Frame n is due at start + n * period no matter how long earlier frames
+    took, so work and send time never accumulate into drift. When the loop
+    falls more than a frame behind, the missed frames are skipped rather
+    than rendered late.
+    """
+    
+    def __init__(self, fps: float, history: int = 256):
+        """
+        Initialize frame clock
+        
+        Args:
+            fps: Frames per second
+            history: Recent frames kept for jitter statistics
+        """
+        self.period_ns = int(1e9 / fps)
+        self.start_ns: Optional[int] = None
+        self.frame = -1
+        self.frames = 0
+        self.skipped = 0
+        self.overruns = 0
+        self._jitter_ns = np.zeros(history, dtype=np.int64)
+    
+    def start(self):
+        """Make frame 0 due now"""
+        self.start_ns = time.monotonic_ns()
+        self.frame = -1
+        self.frames = self.skipped = self.overruns = 0
+    
+    def deadline(self, frame: int) -> int:
+        """Get the monotonic_ns time a frame is due"""
+        return self.start_ns + frame * self.period_ns
+    
+    def wait(self) -> int:
+        """
+        Sleep until the next frame is due
+        
+        Returns:
+            Number of the frame to render now (frames that were missed
+            while the caller overran are skipped)
+        """
+        frame = self._advance()
+        self.sleep_until(self.deadline(frame))
+        return self._record(frame)
+    
+    def next_frame(self) -> Tuple[int, int]:
+        """
+        Pick the next frame without sleeping, for loops that drive several clocks
+        
+        Returns:
+            Tuple of (frame number, monotonic_ns deadline); call begin(frame)
+            when its work starts
+        """
+        frame = self._advance()
+        return frame, self.deadline(frame)
+    
+    def begin(self, frame: int) -> int:
+        """Record that a frame from next_frame() started now and return its number"""
+        return self._record(frame)
+    
+    async def wait_async(self) -> int:
+        """Coroutine version of wait() for render loops on an event loop"""
+        frame = self._advance()
+        delay = self.deadline(frame) - time.monotonic_ns()
+        if delay > 0:
+            await asyncio.sleep(delay / 1e9)
+        return self._record(frame)
+    
+    def _advance(self) -> int:
+        """Pick the next frame to render, skipping any that are already past"""
+        if self.start_ns is None:
+            self.start()
+        
+        frame = self.frame + 1
+        now = time.monotonic_ns()
+        if frame > 0 and now > self.deadline(frame):
+            # The previous frame's work ran past this frame's deadline
+            self.overruns += 1
+            latest = (now - self.start_ns) // self.period_ns
+            if latest > frame:
+                self.skipped += latest - frame
+                frame = latest
+        return frame
+    
+    def _record(self, frame: int) -> int:
+        """Record how late the frame started"""
+        self._jitter_ns[self.frames % len(self._jitter_ns)] = time.monotonic_ns() - self.deadline(frame)
+        self.frames += 1
+        self.frame = frame
+        return frame
+    
+    @staticmethod
+    def sleep_until(deadline_ns: int):
+        """Sleep until a monotonic_ns time (returns at once if it has passed)"""
+        delay = deadline_ns - time.monotonic_ns()
+        if delay > 0:
+            time.sleep(delay / 1e9)
+    
+    def dispatch_offsets(self, latencies: Dict[str, float]) -> Dict[str, int]:
+        """
+        Stagger sends so devices with different latencies update together
+        
+        The slowest device is sent to at the frame deadline and faster ones
+        are held back by the difference, capped at one frame.
+        
+        Args:
+            latencies: Measured send latency per device in seconds
+        
+        Returns:
+            Nanoseconds after the frame deadline to send to each device
+        """
+        if not latencies:
+            return {}
+        slowest = max(latencies.values())
+        return {
+            device_id: min(int((slowest - latency) * 1e9), self.period_ns)
+            for device_id, latency in latencies.items()
+        }
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Get timing statistics
+        
+        Returns:
+            Frame, skip and overrun counts plus jitter (lateness of wake-up
+            against the deadline) over recent frames in milliseconds
+        """
+        jitter = self._jitter_ns[:min(self.frames, len(self._jitter_ns))] / 1e6
+        return {
+            'fps': 1e9 / self.period_ns,
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'overruns': self.overruns,
+            'jitter_mean_ms': float(jitter.mean()) if len(jitter) else 0.0,
+            'jitter_p99_ms': float(np.percentile(jitter, 99)) if len(jitter) else 0.0,
+            'jitter_max_ms': float(jitter.max()) if len(jitter) else 0.0
+        }
+
+
+def send_staggered(clock: FrameClock, frame: int, sends: Iterable[str],
+                   offsets: Dict[str, int], send: Callable[[str], None]):
+    """
+    Call send(device_id) for each device at its latency-compensated time
+    
+    Args:
+        clock: Clock the frame was scheduled on
+        frame: Frame number
+        sends: Devices to send to
+        offsets: Per-device offsets from FrameClock.dispatch_offsets()
+        send: Function that sends the frame to one device
+    """
+    deadline = clock.deadline(frame)
+    for device_id in sorted(sends, key=lambda d: offsets.get(d, 0)):
+        clock.sleep_until(deadline + offsets.get(device_id, 0))
+        send(device_id)
+
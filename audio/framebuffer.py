@@ -0,0 +1,188 @@
+"""
+LED Framebuffer
+One contiguous RGB frame spanning every strip, with vectorized effects and frame diffing
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# An effect draws frame `step` into the framebuffer's uint8 [N, 3] frame
+Effect = Callable[[np.ndarray, int], None]
+
+
+class FrameBuffer:
+    """RGB pixels for a chain of strips treated as one long strip"""
+    
+    def __init__(self, led_counts: Sequence[int]):
+        """
+        Initialize framebuffer
+        
+        Args:
+            led_counts: LED count of each strip, in chain order
+        """
+        self.led_counts = list(led_counts)
+        self.size = sum(self.led_counts)
+        self.frame = np.zeros((self.size, 3), dtype=np.uint8)
+        self.previous = np.zeros_like(self.frame)
+        
+        # Global LED -> (strip, offset), built once
+        self.strip_starts = np.concatenate(([0], np.cumsum(self.led_counts)[:-1])).astype(np.intp)
+        self.strip_index = np.repeat(np.arange(len(self.led_counts)), self.led_counts)
+        self.strip_offset = np.arange(self.size) - self.strip_starts[self.strip_index]
+        
+        self._changed = np.zeros(self.size, dtype=bool)
+        # (strip, segment count) -> first LED of each segment
+        self._segment_starts: Dict[Tuple[int, int], np.ndarray] = {}
+    
+    def locate(self, led_position: int) -> Tuple[int, int]:
+        """
+        Find the strip an LED belongs to
+        
+        Args:
+            led_position: Global LED position
+        
+        Returns:
+            Tuple of (strip index, offset within the strip)
+        """
+        return int(self.strip_index[led_position]), int(self.strip_offset[led_position])
+    
+    def strip_pixels(self, strip: int) -> np.ndarray:
+        """Get a view of one strip's pixels in the current frame"""
+        start = self.strip_starts[strip]
+        return self.frame[start:start + self.led_counts[strip]]
+    
+    def strip_segments(self, strip: int, count: int,
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Reduce one strip's pixels to a number of equal-length segments
+        
+        Each segment takes the per-channel maximum of its LEDs, so a single
+        lit LED still shows at full brightness.
+        
+        Args:
+            strip: Strip index
+            count: Number of segments (at most the strip's LED count)
+            out: Optional uint8 [count, 3] array to write into
+        
+        Returns:
+            uint8 [count, 3] segment colors
+        """
+        key = (strip, count)
+        starts = self._segment_starts.get(key)
+        if starts is None:
+            leds = self.led_counts[strip]
+            if not 0 < count <= leds:
+                raise ValueError(f"Strip {strip} has {leds} LEDs, cannot split into {count} segments")
+            starts = self._segment_starts[key] = np.arange(count) * leds // count
+        return np.maximum.reduceat(self.strip_pixels(strip), starts, axis=0, out=out)
+    
+    def clear(self):
+        """Set every pixel of the current frame to black"""
+        self.frame.fill(0)
+    
+    def render(self, effect: Effect, step: int):
+        """
+        Draw the next frame
+        
+        The current frame becomes `previous` so diff() can report what changed.
+        
+        Args:
+            effect: Effect function
+            step: Frame number passed to the effect
+        """
+        np.copyto(self.previous, self.frame)
+        effect(self.frame, step)
+    
+    def diff(self) -> List[Tuple[int, int, np.ndarray]]:
+        """
+        Find runs of pixels that changed since the previous frame
+        
+        Runs never cross a strip boundary.
+        
+        Returns:
+            List of (strip index, offset, uint8 [n, 3] pixels) per changed run
+        """
+        np.any(self.frame != self.previous, axis=1, out=self._changed)
+        changed = np.flatnonzero(self._changed)
+        if not len(changed):
+            return []
+        
+        # Split wherever positions stop being consecutive or the strip changes
+        breaks = np.flatnonzero(
+            (np.diff(changed) != 1) | (np.diff(self.strip_index[changed]) != 0)
+        ) + 1
+        starts = changed[np.concatenate(([0], breaks))]
+        ends = changed[np.concatenate((breaks - 1, [len(changed) - 1]))] + 1
+        
+        return [
+            (int(self.strip_index[start]), int(self.strip_offset[start]), self.frame[start:end])
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+
+
+def rolling_effect(size: int, color: Sequence[int], trail_length: int = 5) -> Effect:
+    """
+    Build an effect with a lit head moving one LED per frame and a fading trail
+    
+    Args:
+        size: Total LEDs the effect spans
+        color: RGB color of the head
+        trail_length: Number of LEDs in the trail
+    
+    Returns:
+        Effect function
+    """
+    positions = np.arange(size)
+    # Brightness by distance behind the head: 1 at the head, fading to 0
+    fade = np.clip(1.0 - np.arange(trail_length + 1) / trail_length, 0.0, 1.0)
+    ramp = (np.asarray(color, dtype=np.float32)[np.newaxis, :] * fade[:, np.newaxis]).astype(np.uint8)
+    distance = np.empty(size, dtype=np.intp)
+    
+    def draw(frame: np.ndarray, step: int):
+        head = step % size
+        np.subtract(head, positions, out=distance)
+        lit = (distance >= 0) & (distance <= trail_length)
+        frame.fill(0)
+        frame[lit] = ramp[distance[lit]]
+    
+    return draw
+
+
+def fade_effect(factor: float = 0.8) -> Effect:
+    """
+    Build an effect that dims the existing frame each step
+    
+    Args:
+        factor: Brightness kept per frame (0-1)
+    
+    Returns:
+        Effect function
+    """
+    scale = np.uint16(round(factor * 256))
+    
+    def draw(frame: np.ndarray, step: int):
+        np.right_shift(frame.astype(np.uint16) * scale, 8, out=frame, casting='unsafe')
+    
+    return draw
+
+
+def trail_effect(size: int, color: Sequence[int], factor: float = 0.8) -> Effect:
+    """
+    Build a moving head whose trail decays exponentially across frames
+    
+    Args:
+        size: Total LEDs the effect spans
+        color: RGB color of the head
+        factor: Brightness the trail keeps per frame (0-1)
+    
+    Returns:
+        Effect function
+    """
+    fade = fade_effect(factor)
+    color = np.asarray(color, dtype=np.uint8)
+    
+    def draw(frame: np.ndarray, step: int):
+        fade(frame, step)
+        frame[step % size] = color
+    
+    return draw
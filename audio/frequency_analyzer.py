@@ -2,130 +2,198 @@
 Audio Frequency Analyzer
 Processes microphone input and maps frequencies to colors
 """
+import time
+
 import numpy as np
-import pyaudio
-from scipy import signal
 from typing import Tuple, Optional
 
+from audio.palette import get_palette
+from audio.ring_buffer import RingBuffer
+from audio.sources import AudioSource, MicrophoneSource
+from audio.spectrum import SpectrumEngine
+from govee_api import metrics
+
 class FrequencyAnalyzer:
     """Analyzes audio frequencies and maps them to colors"""
     
-    def __init__(self, sample_rate: int = 44100, chunk_size: int = 4096):
+    def __init__(self, sample_rate: int = 44100, chunk_size: int = 4096,
+                 window: str = 'hann', fft_workers: Optional[int] = None,
+                 hop_size: Optional[int] = None, frame_rate: Optional[float] = None,
+                 source: Optional[AudioSource] = None, palette='spectrum',
+                 log_colors: bool = False):
         """
         Initialize frequency analyzer
         
+        Capture runs on its own thread (PyAudio callback or a file source)
+        and writes into a ring buffer; spectra are computed over the latest
+        chunk_size samples whenever they are requested, so the light loop
+        never blocks on audio input.
+        
+        Samples arrive in blocks of hop_size (default chunk_size). A hop
+        smaller than the chunk makes consecutive windows overlap: chunk_size
+        then sets frequency resolution and hop_size sets update rate and
+        latency, independently.
+        
         Args:
             sample_rate: Audio sample rate in Hz
-            chunk_size: Number of samples per chunk
+            chunk_size: Number of samples per chunk (FFT window length)
+            window: FFT analysis window ('hann', 'hamming', 'blackman', 'rectangular')
+            fft_workers: Threads for scipy's FFT (None uses numpy)
+            hop_size: Samples per capture block
+            frame_rate: Capture blocks per second (sets hop_size)
+            source: Input to analyse (defaults to the microphone on start_stream)
+            palette: Palette (or registered palette name) for frequency colors
+            log_colors: Spread colors over octaves instead of linearly in Hz
         """
+        if hop_size is None and frame_rate:
+            hop_size = max(1, int(sample_rate / frame_rate))
+        
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
-        self.audio = pyaudio.PyAudio()
-        self.stream = None
+        self.hop_size = hop_size or chunk_size
+        self.source = source
         
         # Frequency ranges for color mapping
         # Typical human hearing: 20 Hz to 20,000 Hz
         self.min_freq = 20
         self.max_freq = 20000
+        self.palette = get_palette(palette) if isinstance(palette, str) else palette
+        self.log_colors = log_colors
+        
+        # Window, bin frequencies and output buffers are built once here
+        self.engine = SpectrumEngine(chunk_size, sample_rate, window, fft_workers)
+        self.audible_bins = self.engine.bin_range(self.min_freq, self.max_freq)
+        
+        # Recent samples, written by the capture thread and read by analysis
+        self.ring = RingBuffer(chunk_size + 8 * self.hop_size)
+        self._window_samples = np.zeros(chunk_size, dtype=np.int16)
         
+        # Sample count the current spectrum ends at (-1 before the first)
+        self.frame_position = -1
+        # Odd while engine.magnitude is being rewritten (see latest_spectrum)
+        self._seq = 0
+    
+    @property
+    def frequency_resolution(self) -> float:
+        """Width of one FFT bin in Hz"""
+        return self.sample_rate / self.chunk_size
+    
+    @property
+    def update_interval(self) -> float:
+        """Seconds of new audio per capture block"""
+        return self.hop_size / self.sample_rate
+    
+    @property
+    def overflows(self) -> int:
+        """Capture blocks that arrived late or were dropped by the input"""
+        return self.source.overflows if self.source else 0
+    
     def start_stream(self, device_index: Optional[int] = None):
-        """Start audio input stream"""
-        self.stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.sample_rate,
-            input=True,
-            input_device_index=device_index,
-            frames_per_buffer=self.chunk_size
-        )
+        """Start audio capture (the microphone unless a source was given)"""
+        if self.source is None:
+            self.source = MicrophoneSource(self.sample_rate, self.hop_size, device_index)
+        self.source.start(self.ring)
     
     def stop_stream(self):
-        """Stop audio input stream"""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-            self.stream = None
+        """Stop audio capture"""
+        if self.source:
+            self.source.stop()
     
-    def get_frequency_spectrum(self) -> np.ndarray:
+    def get_frequency_spectrum(self) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Get current frequency spectrum from microphone
+        Get the spectrum of the most recent audio
+        
+        Never blocks on input. If no new samples arrived since the last
+        call the previous spectrum is returned without recomputing it.
+        Both arrays are reused between calls; copy them to keep a frame.
         
         Returns:
-            Array of frequency magnitudes
+            Tuple of (bin frequencies, magnitudes) from DC to Nyquist
         """
-        if not self.stream:
+        if not self.source or not self.source.ring:
             raise RuntimeError("Audio stream not started")
         
-        # Read audio data
-        data = self.stream.read(self.chunk_size, exception_on_overflow=False)
-        audio_data = np.frombuffer(data, dtype=np.int16)
-        
-        # Apply FFT
-        fft_data = np.fft.fft(audio_data)
-        frequencies = np.fft.fftfreq(len(fft_data), 1/self.sample_rate)
+        if self.ring.written != self.frame_position:
+            start = metrics.clock()
+            self.frame_position = self.ring.read_latest(self._window_samples)
+            read = metrics.clock()
+            self._seq += 1
+            try:
+                self.engine.process(self._window_samples)
+            finally:
+                self._seq += 1
+            if start:
+                metrics.STAGE_SECONDS.observe((read - start) / 1e9, 'read')
+                metrics.STAGE_SECONDS.observe_since(read, 'fft')
+        return self.engine.frequencies, self.engine.magnitude
+    
+    def latest_spectrum(self, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Get the magnitudes of the newest analyzed frame without computing one
         
-        # Get magnitude spectrum
-        magnitude = np.abs(fft_data)
+        Args:
+            out: Array to copy the magnitudes into; the copy is consistent
+                even while another thread computes the next frame (None
+                returns the engine's own array, only safe on that thread)
         
-        # Return only positive frequencies
-        positive_freq_idx = frequencies >= 0
-        return frequencies[positive_freq_idx], magnitude[positive_freq_idx]
+        Returns:
+            Magnitudes for the bins in engine.frequencies, or None before
+            the first frame has been analyzed
+        """
+        if self.frame_position < 0:
+            return None
+        if out is None:
+            return self.engine.magnitude
+        while True:
+            seq = self._seq
+            if seq % 2 == 0:
+                np.copyto(out, self.engine.magnitude)
+                if self._seq == seq:
+                    return out
+            # Let the analysing thread finish the frame
+            time.sleep(0)
     
     def get_dominant_frequency(self) -> float:
         """
         Get the dominant frequency from current audio input
         
         Returns:
-            Dominant frequency in Hz
+            Dominant frequency in Hz (within min_freq..max_freq)
         """
-        frequencies, magnitude = self.get_frequency_spectrum()
-        
-        # Find peak frequency
-        peak_idx = np.argmax(magnitude)
-        dominant_freq = frequencies[peak_idx]
-        
-        return dominant_freq
+        self.get_frequency_spectrum()
+        return self.engine.peak_frequency(self.audible_bins)
     
     def frequency_to_color(self, frequency: float) -> Tuple[int, int, int]:
         """
         Map frequency to RGB color
         
-        Uses a gradient from low (red) to high (blue/violet) frequencies
+        Looks the frequency up in the analyzer's palette; the default
+        'spectrum' palette runs from low (red) to high (blue/violet)
         
         Args:
             frequency: Frequency in Hz
-            
+        
         Returns:
             RGB tuple (r, g, b) with values 0-255
         """
-        # Clamp frequency to valid range
-        freq_clamped = np.clip(frequency, self.min_freq, self.max_freq)
-        
-        # Normalize to 0-1 range
-        normalized = (freq_clamped - self.min_freq) / (self.max_freq - self.min_freq)
-        
-        # Create color gradient
-        # Low frequencies -> Red
-        # Mid frequencies -> Green
-        # High frequencies -> Blue
-        
-        if normalized < 0.33:
-            # Red to Yellow
-            r = 255
-            g = int(255 * (normalized / 0.33))
-            b = 0
-        elif normalized < 0.66:
-            # Yellow to Cyan
-            r = int(255 * (1 - (normalized - 0.33) / 0.33))
-            g = 255
-            b = int(255 * ((normalized - 0.33) / 0.33))
-        else:
-            # Cyan to Blue/Violet
-            r = 0
-            g = int(255 * (1 - (normalized - 0.66) / 0.34))
-            b = 255
-        
-        return (r, g, b)
+        r, g, b = self.palette.map_frequencies(frequency, self.min_freq, self.max_freq,
+                                               self.log_colors)
+        return (int(r), int(g), int(b))
+    
+    def frequencies_to_colors(self, frequencies: np.ndarray,
+                              out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Map an array of frequencies to colors in one vectorized lookup
+        
+        Args:
+            frequencies: Frequencies in Hz
+            out: Optional uint8 [N, 3] array to write into
+        
+        Returns:
+            uint8 array of shape [N, 3]
+        """
+        return self.palette.map_frequencies(frequencies, self.min_freq, self.max_freq,
+                                            self.log_colors, out)
     
     def get_current_color(self) -> Tuple[int, int, int]:
         """
@@ -135,11 +203,13 @@ class FrequencyAnalyzer:
             RGB tuple (r, g, b)
         """
         freq = self.get_dominant_frequency()
-        return self.frequency_to_color(freq)
+        start = metrics.clock()
+        color = self.frequency_to_color(freq)
+        metrics.STAGE_SECONDS.observe_since(start, 'color')
+        return color
     
     def cleanup(self):
         """Clean up audio resources"""
-        self.stop_stream()
-        if self.audio:
-            self.audio.terminate()
+        if self.source:
+            self.source.close()
 
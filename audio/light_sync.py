@@ -2,27 +2,49 @@
 Light Synchronization
 Coordinates timing between multiple light strips for rolling effects
 """
-from typing import List, Dict
-import time
+from typing import List, Dict, Optional, Set, Tuple
+import asyncio
 import threading
+import time
+
+import numpy as np
+
+from audio.frame_clock import FrameClock, send_staggered
+from audio.framebuffer import FrameBuffer, rolling_effect
+from govee_api import metrics
+from govee_api.coalescer import CommandCoalescer
+from govee_api.lan import MAX_SEGMENTS
 
 class LightSyncCoordinator:
     """Coordinates synchronized effects across multiple light strips"""
     
-    def __init__(self, light_strips: List[str], total_leds: List[int]):
+    def __init__(self, light_strips: List[str], total_leds: List[int],
+                 coalescer: Optional[CommandCoalescer] = None,
+                 segments: Optional[List[int]] = None):
         """
         Initialize light sync coordinator
         
         Args:
             light_strips: List of light strip device IDs
             total_leds: List of LED counts for each strip
+            coalescer: Command queue that device updates are sent through
+            segments: Segments each strip is driven as when it accepts
+                per-segment frames (default: one per LED, up to MAX_SEGMENTS)
         """
         self.light_strips = light_strips
+        self.coalescer = coalescer
         self.total_leds = total_leds
         self.total_leds_all = sum(total_leds)
+        self.framebuffer = FrameBuffer(total_leds)
+        self.segments = segments or [min(leds, MAX_SEGMENTS) for leds in total_leds]
+        # Reused per frame: one packed [segments, 3] buffer per strip
+        self._segment_buffers = [np.empty((count, 3), dtype=np.uint8) for count in self.segments]
+        # Strips whose devices currently belong to another effect; rendered but never sent
+        self.detached: Set[int] = set()
+        self.clock: Optional[FrameClock] = None
         self.is_running = False
         self.thread = None
-        
+    
     def create_rolling_effect(self, speed: float = 1.0, color: tuple = (255, 255, 255)):
         """
         Create a rolling effect that spans across all light strips
@@ -31,80 +53,114 @@ class LightSyncCoordinator:
             speed: Speed of the rolling effect (LEDs per second)
             color: RGB color tuple for the rolling effect
         """
-        if self.is_running:
-            self.stop()
+        effect = rolling_effect(self.framebuffer.size, color, trail_length=5)
+        self.sync_timing(effect, fps=speed)
+    
+    def _effect_loop(self, draw):
+        """
+        Internal loop that renders and sends one frame per clock tick
         
-        self.is_running = True
-        self.thread = threading.Thread(
-            target=self._rolling_effect_loop,
-            args=(speed, color),
-            daemon=True
-        )
-        self.thread.start()
+        Args:
+            draw: Effect function drawing into the framebuffer
+        """
+        self.clock.start()
+        while self.is_running:
+            step = self.clock.wait()
+            if not self.is_running:
+                break
+            self._send_strips(step, self.render_frame(draw, step))
     
-    def _rolling_effect_loop(self, speed: float, color: tuple):
+    def render_frame(self, draw, step: int) -> Dict[str, int]:
         """
-        Internal loop for rolling effect animation
+        Draw frame `step` and find the strips it changed
         
         Args:
-            speed: Speed of the rolling effect
-            color: RGB color tuple
+            draw: Effect function drawing into the framebuffer
+            step: Frame number
+        
+        Returns:
+            Device ID -> strip index for each changed strip this effect
+            still owns
+        """
+        start = metrics.clock()
+        self.framebuffer.render(draw, step)
+        strips = {self.light_strips[segment[0]]: segment[0] for segment in self.framebuffer.diff()
+                  if segment[0] not in self.detached}
+        metrics.STAGE_SECONDS.observe_since(start, 'render')
+        metrics.FRAMES.inc('effect')
+        return strips
+    
+    def _send_strips(self, step: int, strips: Dict[str, int]):
         """
-        frame_time = 1.0 / speed  # Time per LED
+        Hand the strips that changed this frame to the transport
         
-        while self.is_running:
-            for led_position in range(self.total_leds_all):
-                if not self.is_running:
-                    break
-                
-                # Calculate which strip and LED position
-                current_strip = 0
-                remaining_pos = led_position
-                
-                for strip_idx, strip_leds in enumerate(self.total_leds):
-                    if remaining_pos < strip_leds:
-                        current_strip = strip_idx
-                        break
-                    remaining_pos -= strip_leds
-                
-                # Turn on LED at current position
-                # Turn off previous LEDs
-                self._update_led_state(led_position, color, True)
-                
-                # Update previous LEDs in the trail
-                trail_length = 5  # Number of LEDs in the trail
-                for i in range(1, trail_length + 1):
-                    prev_pos = led_position - i
-                    if prev_pos >= 0:
-                        # Fade trail
-                        fade_factor = 1.0 - (i / trail_length)
-                        faded_color = tuple(int(c * fade_factor) for c in color)
-                        self._update_led_state(prev_pos, faded_color, True)
-                
-                time.sleep(frame_time)
+        Strips are sent in latency order so that every strip shows the
+        frame at the same moment: the slowest device goes at the deadline
+        and faster ones are held back by the difference.
+        
+        Args:
+            step: Frame number being sent
+            strips: Device ID -> strip index from render_frame()
+        """
+        if not self.coalescer:
+            return
+        
+        send_staggered(self.clock, step, strips, self.send_offsets(strips),
+                       lambda device_id: self.send_strip(strips[device_id]))
     
-    def _update_led_state(self, led_position: int, color: tuple, state: bool):
+    def send_offsets(self, strips: Dict[str, int]) -> Dict[str, int]:
         """
-        Update state of a specific LED across strips
+        Get each device's latency-compensated send time
         
         Args:
-            led_position: Global LED position across all strips
-            color: RGB color tuple
-            state: True to turn on, False to turn off
+            strips: Device ID -> strip index from render_frame()
+        
+        Returns:
+            Nanoseconds after the frame deadline to send to each device
         """
-        # Calculate which strip this LED belongs to
-        current_strip = 0
-        remaining_pos = led_position
+        latencies = {device_id: self.coalescer.client.send_latency(device_id) for device_id in strips}
+        return self.clock.dispatch_offsets(latencies)
+    
+    def _strip_color(self, strip: int) -> Tuple[int, int, int]:
+        """
+        Get the single color a strip shows when it only takes whole-device colors
         
-        for strip_idx, strip_leds in enumerate(self.total_leds):
-            if remaining_pos < strip_leds:
-                current_strip = strip_idx
-                break
-            remaining_pos -= strip_leds
+        Args:
+            strip: Strip index
+        """
+        # Each changed strip shows its brightest pixel
+        pixels = self.framebuffer.strip_pixels(strip)
+        r, g, b = pixels[pixels.sum(axis=1, dtype=np.uint16).argmax()].tolist()
+        return r, g, b
+    
+    def _strip_segments(self, strip: int) -> np.ndarray:
+        """
+        Get a strip's current frame reduced to its segments
         
-        # TODO: Send command to Govee API to update specific LED
-        # This will require per-LED control which may need custom implementation
-        pass
+        Args:
+            strip: Strip index
+        
+        Returns:
+            uint8 [segments, 3] array, reused for the strip's next frame
+        """
+        return self.framebuffer.strip_segments(strip, self.segments[strip],
+                                               out=self._segment_buffers[strip])
+    
+    def send_strip(self, strip: int):
+        """
+        Send one strip's current pixels
+        
+        Args:
+            strip: Strip index
+        """
+        device_id = self.light_strips[strip]
+        client = self.coalescer.client
+        if client.supports_segments(device_id):
+            # One datagram per strip; nothing waits for a reply, so no coalescing
+            client.set_segments(device_id, self._strip_segments(strip))
+        else:
+            # The coalescer keeps only the newest of these per frame
+            self.coalescer.set_color(device_id, *self._strip_color(strip))
     
     def stop(self):
         """Stop the current effect"""
@@ -112,14 +168,100 @@ class LightSyncCoordinator:
         if self.thread:
             self.thread.join(timeout=1.0)
     
-    def sync_timing(self, effect_function, *args, **kwargs):
+    def sync_timing(self, effect_function, *args, fps: float = 30.0, **kwargs):
         """
         Synchronize timing for a custom effect function
         
+        The effect runs on a frame clock with absolute deadlines: late
+        frames are skipped instead of delaying the ones after them, and
+        sends are staggered by each device's measured latency.
+        
         Args:
-            effect_function: Function to execute with synchronized timing
+            effect_function: Called as effect_function(frame, step, *args, **kwargs)
+                to draw frame `step` into the uint8 [N, 3] framebuffer
+            fps: Frames per second
             *args, **kwargs: Arguments to pass to effect function
         """
-        # TODO: Implement timing synchronization
-        pass
-
+        if self.is_running:
+            self.stop()
+        
+        def draw(frame: np.ndarray, step: int):
+            effect_function(frame, step, *args, **kwargs)
+        
+        self.clock = FrameClock(fps)
+        self.is_running = True
+        self.thread = threading.Thread(target=self._effect_loop, args=(draw,), daemon=True)
+        self.thread.start()
+    
+    async def async_sync_timing(self, effect_function, *args, fps: float = 30.0,
+                                token=None, **kwargs):
+        """
+        Run an effect on the frame clock from a coroutine
+        
+        Like sync_timing(), but the loop runs on the caller's event loop and
+        every strip has its own sender task, so many strips need no extra
+        threads. A strip whose previous send is still in flight only sends
+        its newest frame once that send completes. Returns when stop() is
+        called or the token (a CancellationToken) is cancelled.
+        
+        Args:
+            effect_function: Called as effect_function(frame, step, *args, **kwargs)
+            fps: Frames per second
+            token: Optional cancellation token
+            *args, **kwargs: Arguments to pass to effect function
+        """
+        if self.is_running:
+            self.stop()
+        
+        client = self.coalescer.client
+        self.clock = FrameClock(fps)
+        self.clock.start()
+        self.is_running = True
+        
+        # Device -> strip with a frame waiting; its pixels are read at send time
+        pending: Dict[str, int] = {}
+        senders: Dict[str, asyncio.Task] = {}
+        
+        async def sender(device_id: str, send_at_ns: int):
+            # Latency compensation for the frame that woke this sender
+            delay = send_at_ns - time.monotonic_ns()
+            if delay > 0:
+                await asyncio.sleep(delay / 1e9)
+            while device_id in pending:
+                strip = pending.pop(device_id)
+                if client.supports_segments(device_id):
+                    client.set_segments(device_id, self._strip_segments(strip))
+                else:
+                    await client.async_set_colors({device_id: self._strip_color(strip)}, retry=False)
+        
+        def draw(frame: np.ndarray, step: int):
+            effect_function(frame, step, *args, **kwargs)
+        
+        try:
+            while self.is_running and not (token and token.cancelled):
+                step = await self.clock.wait_async()
+                strips = self.render_frame(draw, step)
+                offsets = self.send_offsets(strips)
+                deadline = self.clock.deadline(step)
+                
+                for device_id, strip in strips.items():
+                    pending[device_id] = strip
+                    task = senders.get(device_id)
+                    if task is None or task.done():
+                        senders[device_id] = asyncio.ensure_future(
+                            sender(device_id, deadline + offsets[device_id])
+                        )
+        finally:
+            self.is_running = False
+            for task in senders.values():
+                task.cancel()
+            await asyncio.gather(*senders.values(), return_exceptions=True)
+    
+    def timing_stats(self) -> Dict[str, float]:
+        """
+        Get frame timing statistics for the running effect
+        
+        Returns:
+            FrameClock statistics (empty before the first effect)
+        """
+        return self.clock.stats() if self.clock else {}
@@ -0,0 +1,245 @@
+"""
+Color Palettes
+Precomputed uint8 color lookup tables with vectorized value and frequency mapping
+"""
+import colorsys
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LUT_SIZE = 1024
+
+
+class Palette:
+    """A color lookup table indexed by a 0-1 position"""
+    
+    def __init__(self, lut: np.ndarray, name: str = 'custom'):
+        """
+        Initialize palette
+        
+        Args:
+            lut: uint8 array of shape [size, 3]
+            name: Palette name
+        """
+        self.lut = np.ascontiguousarray(lut, dtype=np.uint8)
+        self.size = len(self.lut)
+        self.name = name
+    
+    @classmethod
+    def gradient(cls, stops: Sequence[Tuple[float, Sequence[int]]], size: int = LUT_SIZE,
+                 gamma: float = 1.0, name: str = 'gradient') -> 'Palette':
+        """
+        Build a palette by interpolating between color stops
+        
+        Args:
+            stops: (position 0-1, (r, g, b)) pairs in increasing position order
+            size: Number of LUT entries
+            gamma: Interpolate in linear light and re-encode with this gamma
+                (2.2 gives perceptually even blends; 1.0 blends sRGB values directly)
+            name: Palette name
+        
+        Returns:
+            Palette
+        """
+        positions = np.array([p for p, _ in stops], dtype=np.float64)
+        colors = np.array([c for _, c in stops], dtype=np.float64) / 255.0
+        x = np.linspace(0.0, 1.0, size)
+        
+        linear = colors ** gamma
+        channels = [np.interp(x, positions, linear[:, i]) for i in range(3)]
+        rgb = np.stack(channels, axis=1) ** (1.0 / gamma)
+        return cls(np.round(rgb * 255.0), name)
+    
+    @classmethod
+    def hsv(cls, size: int = LUT_SIZE, hue_start: float = 0.0, hue_end: float = 0.83,
+            saturation: float = 1.0, value: float = 1.0, name: str = 'hsv') -> 'Palette':
+        """
+        Build a palette that sweeps hue
+        
+        Args:
+            size: Number of LUT entries
+            hue_start: Hue at position 0 (0-1)
+            hue_end: Hue at position 1 (0-1)
+            saturation: Saturation (0-1)
+            value: Value/brightness (0-1)
+            name: Palette name
+        
+        Returns:
+            Palette
+        """
+        hues = np.linspace(hue_start, hue_end, size)
+        rgb = np.array([colorsys.hsv_to_rgb(h, saturation, value) for h in hues])
+        return cls(np.round(rgb * 255.0), name)
+    
+    def map_values(self, values, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Map positions in 0-1 to colors
+        
+        Args:
+            values: Scalar or array of positions (clamped to 0-1)
+            out: Optional uint8 [N, 3] array to write into
+        
+        Returns:
+            uint8 array of shape values.shape + (3,), packed RGB
+        """
+        values = np.asarray(values, dtype=np.float64)
+        index = np.clip(values * (self.size - 1) + 0.5, 0, self.size - 1).astype(np.intp)
+        return np.take(self.lut, index, axis=0, out=out)
+    
+    def map_frequencies(self, frequencies, min_freq: float = 20.0, max_freq: float = 20000.0,
+                        log_scale: bool = False, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Map frequencies in Hz to colors
+        
+        Args:
+            frequencies: Scalar or array of frequencies
+            min_freq: Frequency at palette position 0
+            max_freq: Frequency at palette position 1
+            log_scale: Space positions logarithmically (musical) instead of linearly
+            out: Optional uint8 [N, 3] array to write into
+        
+        Returns:
+            uint8 array of shape frequencies.shape + (3,)
+        """
+        frequencies = np.clip(np.asarray(frequencies, dtype=np.float64), min_freq, max_freq)
+        if log_scale:
+            values = np.log(frequencies / min_freq) / np.log(max_freq / min_freq)
+        else:
+            values = (frequencies - min_freq) / (max_freq - min_freq)
+        return self.map_values(values, out)
+    
+    def to_dict(self) -> Dict:
+        """Serialize the LUT (e.g. for the web UI)"""
+        return {'name': self.name, 'lut': self.lut.tolist()}
+
+
+def pack_rgb(colors: np.ndarray) -> np.ndarray:
+    """
+    Pack uint8 [..., 3] colors into 0xRRGGBB integers
+    
+    Args:
+        colors: uint8 color array
+    
+    Returns:
+        uint32 array with one integer per color
+    """
+    colors = colors.astype(np.uint32)
+    return (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+
+
+def scale_colors(colors: np.ndarray, levels) -> np.ndarray:
+    """
+    Scale colors by per-color brightness levels
+    
+    Args:
+        colors: uint8 [N, 3] colors
+        levels: Scalar or [N] array of levels (0-1)
+    
+    Returns:
+        uint8 [N, 3] scaled colors
+    """
+    levels = np.clip(np.asarray(levels, dtype=np.float32), 0.0, 1.0)
+    if levels.ndim:
+        levels = levels[:, np.newaxis]
+    return (colors * levels + 0.5).astype(np.uint8)
+
+
+# The original FrequencyAnalyzer gradient: red -> yellow -> cyan -> blue
+SPECTRUM_STOPS = [(0.0, (255, 0, 0)), (0.33, (255, 255, 0)), (0.66, (0, 255, 255)), (1.0, (0, 0, 255))]
+
+BUILTIN_PALETTES: Dict[str, Callable[[], Palette]] = {
+    'spectrum': lambda: Palette.gradient(SPECTRUM_STOPS, name='spectrum'),
+    'spectrum_perceptual': lambda: Palette.gradient(SPECTRUM_STOPS, gamma=2.2,
+                                                    name='spectrum_perceptual'),
+    'rainbow': lambda: Palette.hsv(name='rainbow'),
+    'fire': lambda: Palette.gradient(
+        [(0.0, (0, 0, 0)), (0.4, (200, 0, 0)), (0.75, (255, 140, 0)), (1.0, (255, 255, 180))],
+        gamma=2.2, name='fire'
+    ),
+    'ocean': lambda: Palette.gradient(
+        [(0.0, (0, 10, 40)), (0.5, (0, 120, 200)), (1.0, (160, 255, 240))],
+        gamma=2.2, name='ocean'
+    )
+}
+
+_palettes: Dict[str, Palette] = {}
+_loaded_files: Dict[str, Tuple[float, Palette]] = {}
+_palette_lock = threading.Lock()
+
+
+def get_palette(name: str) -> Palette:
+    """
+    Get a built-in or registered palette, building its LUT on first use
+    
+    Args:
+        name: Palette name
+    
+    Returns:
+        Cached Palette
+    """
+    with _palette_lock:
+        palette = _palettes.get(name)
+        if palette is None:
+            if name not in BUILTIN_PALETTES:
+                raise ValueError(f"Unknown palette '{name}'")
+            palette = BUILTIN_PALETTES[name]()
+            _palettes[name] = palette
+        return palette
+
+
+def register_palette(palette: Palette):
+    """
+    Make a palette available through get_palette()
+    
+    Args:
+        palette: Palette to register under its name
+    """
+    with _palette_lock:
+        _palettes[palette.name] = palette
+
+
+def list_palettes() -> List[str]:
+    """Get the names of all built-in and registered palettes"""
+    with _palette_lock:
+        return sorted(set(BUILTIN_PALETTES) | set(_palettes))
+
+
+def load_palette(path: str) -> Palette:
+    """
+    Load a palette from a JSON file and register it
+    
+    The file looks like:
+        {"name": "sunset", "gamma": 2.2,
+         "stops": [[0.0, [255, 80, 0]], [1.0, [80, 0, 160]]]}
+    
+    Loaded files are cached and only re-read when they change on disk.
+    
+    Args:
+        path: Path to the JSON file
+    
+    Returns:
+        Palette
+    """
+    mtime = os.path.getmtime(path)
+    with _palette_lock:
+        cached = _loaded_files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    
+    with open(path) as f:
+        spec = json.load(f)
+    name = spec.get('name', os.path.splitext(os.path.basename(path))[0])
+    palette = Palette.gradient(
+        [(position, color) for position, color in spec['stops']],
+        size=spec.get('size', LUT_SIZE),
+        gamma=spec.get('gamma', 1.0),
+        name=name
+    )
+    
+    with _palette_lock:
+        _loaded_files[path] = (mtime, palette)
+        _palettes[name] = palette
+    return palette
@@ -0,0 +1,156 @@
+"""
+Render Loop
+One thread that renders and sends every effect assigned to it, each on its own frame clock
+"""
+from typing import Dict, List, Tuple
+import heapq
+import itertools
+import threading
+import time
+
+from audio.frame_clock import FrameClock
+from audio.light_sync import LightSyncCoordinator
+
+# Event kinds, in the order they run when due at the same moment
+SEND = 0
+FRAME = 1
+
+
+class _Effect:
+    """An effect scheduled on a render loop"""
+    
+    def __init__(self, key: str, coordinator: LightSyncCoordinator, draw):
+        self.key = key
+        self.coordinator = coordinator
+        self.draw = draw
+
+
+class RenderLoop:
+    """
+    Drives any number of effects from a single thread
+    
+    Frames and latency-compensated sends are timed events in one queue, so
+    an effect waiting for its next deadline never holds a thread and
+    effects at different frame rates interleave. The thread exits when the
+    last effect is removed and starts again with the next one.
+    """
+    
+    def __init__(self, name: str = 'render'):
+        """
+        Initialize render loop
+        
+        Args:
+            name: Thread name
+        """
+        self.name = name
+        self.effects: Dict[str, _Effect] = {}
+        # (due monotonic_ns, kind, sequence, effect, frame or strip)
+        self._events: List[Tuple[int, int, int, _Effect, int]] = []
+        self._sequence = itertools.count()
+        self._wake = threading.Condition()
+        self.is_running = False
+        self.thread = None
+    
+    def add(self, key: str, coordinator: LightSyncCoordinator, draw, fps: float):
+        """
+        Start rendering an effect (replacing any effect with the same key)
+        
+        Args:
+            key: Effect key
+            coordinator: Coordinator holding the effect's strips and framebuffer
+            draw: Effect function, called as draw(frame, step)
+            fps: Frames per second
+        """
+        coordinator.clock = FrameClock(fps)
+        coordinator.clock.start()
+        coordinator.is_running = True
+        effect = _Effect(key, coordinator, draw)
+        
+        with self._wake:
+            self.effects[key] = effect
+            frame, deadline = coordinator.clock.next_frame()
+            self._push(deadline, FRAME, effect, frame)
+            if not self.is_running:
+                self.is_running = True
+                self.thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self.thread.start()
+            self._wake.notify()
+    
+    def remove(self, key: str):
+        """
+        Stop rendering an effect (its queued events are dropped when they come due)
+        
+        Args:
+            key: Effect key
+        """
+        with self._wake:
+            effect = self.effects.pop(key, None)
+            self._wake.notify()
+        if effect:
+            effect.coordinator.is_running = False
+    
+    def _push(self, due_ns: int, kind: int, effect: _Effect, value: int):
+        """Queue an event (caller holds the lock)"""
+        heapq.heappush(self._events, (due_ns, kind, next(self._sequence), effect, value))
+    
+    def _loop(self):
+        """Run events as they come due until no effects are left"""
+        while True:
+            with self._wake:
+                while True:
+                    if not self.effects:
+                        self._events.clear()
+                        self.is_running = False
+                        self.thread = None
+                        return
+                    delay = self._events[0][0] - time.monotonic_ns()
+                    if delay <= 0:
+                        break
+                    self._wake.wait(delay / 1e9)
+                _, kind, _, effect, value = heapq.heappop(self._events)
+                if self.effects.get(effect.key) is not effect:
+                    continue
+            
+            try:
+                if kind == FRAME:
+                    self._frame(effect, value)
+                else:
+                    effect.coordinator.send_strip(value)
+            except Exception as e:
+                print(f"Error rendering effect {effect.key}: {e}")
+                if kind == FRAME:
+                    with self._wake:
+                        if self.effects.get(effect.key) is effect:
+                            del self.effects[effect.key]
+                    effect.coordinator.is_running = False
+    
+    def _frame(self, effect: _Effect, frame: int):
+        """Render one frame, queue its sends and the effect's next frame"""
+        coordinator = effect.coordinator
+        clock = coordinator.clock
+        clock.begin(frame)
+        strips = coordinator.render_frame(effect.draw, frame)
+        if not coordinator.coalescer:
+            strips = {}
+        offsets = coordinator.send_offsets(strips)
+        deadline = clock.deadline(frame)
+        
+        with self._wake:
+            for device_id, strip in strips.items():
+                self._push(deadline + offsets[device_id], SEND, effect, strip)
+            next_frame, next_deadline = clock.next_frame()
+            self._push(next_deadline, FRAME, effect, next_frame)
+    
+    def stats(self) -> Dict:
+        """
+        Get loop statistics
+        
+        Returns:
+            Dictionary with the effects on this loop and queued events
+        """
+        with self._wake:
+            return {
+                'running': self.is_running,
+                'effects': sorted(self.effects),
+                'queued': len(self._events)
+            }
@@ -0,0 +1,74 @@
+"""
+Sample Ring Buffer
+Fixed-size circular buffer of audio samples for overlapping window analysis
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Circular sample buffer with one writer and any number of readers
+    
+    The writer publishes by advancing `written` after the samples are in
+    place, so readers never need a lock to get the most recent window.
+    """
+    
+    def __init__(self, capacity: int, dtype=np.int16):
+        """
+        Initialize ring buffer
+        
+        Args:
+            capacity: Number of samples kept
+            dtype: Sample type
+        """
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.written = 0
+    
+    def write(self, samples: np.ndarray):
+        """
+        Append samples, overwriting the oldest ones
+        
+        Args:
+            samples: 1-D array of samples
+        """
+        count = len(samples)
+        skipped = 0
+        if count > self.capacity:
+            skipped = count - self.capacity
+            samples = samples[skipped:]
+            count = self.capacity
+        
+        start = (self.written + skipped) % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            self.buffer[start:end] = samples
+        else:
+            split = self.capacity - start
+            self.buffer[start:] = samples[:split]
+            self.buffer[:count - split] = samples[split:]
+        
+        # Publish only after the samples are in place
+        self.written += skipped + count
+    
+    def read_latest(self, out: np.ndarray) -> int:
+        """
+        Copy the most recent len(out) samples into out
+        
+        Args:
+            out: Destination array (at most `capacity` long)
+        
+        Returns:
+            Write position the copy corresponds to
+        """
+        written = self.written
+        count = len(out)
+        end = written % self.capacity
+        start = end - count
+        
+        if start >= 0:
+            np.copyto(out, self.buffer[start:end])
+        else:
+            np.copyto(out[:-start], self.buffer[start:])
+            np.copyto(out[-start:], self.buffer[:end])
+        return written
@@ -0,0 +1,363 @@
+"""
+Light Shows
+Effects and audio rendered offline into delta-compressed frame files, played back from memory maps
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+from audio.features import FeatureExtractor
+from audio.framebuffer import Effect, FrameBuffer
+from audio.frequency_analyzer import FrequencyAnalyzer
+from audio.palette import scale_colors
+from audio.sources import WavFileSource
+
+MAGIC = b'GVSHOW\x00\x01'
+# magic, fps, frame count, strip count, keyframe interval, index offset
+HEADER = struct.Struct('<8sfIIIQ')
+# One changed run of a frame: first global LED and number of LEDs
+RUN = np.dtype([('start', '<u4'), ('length', '<u4')])
+# Per frame record: number of runs, then the run table, then their RGB bytes
+RUN_COUNT = struct.Struct('<I')
+
+
+class ShowWriter:
+    """
+    Writes frames from a FrameBuffer as a show file
+    
+    Each frame stores only the runs of pixels that changed since the one
+    before (FrameBuffer.diff()), except every `keyframe_interval`-th frame,
+    which stores the whole frame so playback can start or seek there. The
+    file is written next to its destination and moved into place on close().
+    """
+    
+    def __init__(self, path: str, led_counts: Sequence[int], fps: float,
+                 keyframe_interval: int = 300):
+        """
+        Initialize writer
+        
+        Args:
+            path: Show file to create
+            led_counts: LED count of each strip, in chain order
+            fps: Frames per second the show plays at
+            keyframe_interval: Frames between full frames
+        """
+        self.path = path
+        self.led_counts = list(led_counts)
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval
+        self.offsets: List[int] = []
+        self.bytes_raw = 0
+        self._tmp_path = path + '.tmp'
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, fps, 0, len(self.led_counts), keyframe_interval, 0))
+        self._file.write(np.asarray(self.led_counts, dtype='<u4').tobytes())
+    
+    @property
+    def frames(self) -> int:
+        """Frames written so far"""
+        return len(self.offsets)
+    
+    def write(self, framebuffer: FrameBuffer):
+        """
+        Append the framebuffer's current frame
+        
+        Args:
+            framebuffer: Framebuffer just rendered (its diff() against the
+                previous frame is what gets stored)
+        """
+        if self.frames % self.keyframe_interval == 0:
+            runs = np.array([(0, framebuffer.size)], dtype=RUN)
+            pixels = [framebuffer.frame]
+        else:
+            segments = framebuffer.diff()
+            runs = np.empty(len(segments), dtype=RUN)
+            for i, (strip, offset, run_pixels) in enumerate(segments):
+                runs[i] = (framebuffer.strip_starts[strip] + offset, len(run_pixels))
+            pixels = [segment[2] for segment in segments]
+        
+        self.offsets.append(self._file.tell())
+        self._file.write(RUN_COUNT.pack(len(runs)))
+        self._file.write(runs.tobytes())
+        for run_pixels in pixels:
+            self._file.write(run_pixels.tobytes())
+        self.bytes_raw += framebuffer.frame.nbytes
+    
+    def discard(self):
+        """Give up on the show, removing the partly written file"""
+        self._file.close()
+        os.remove(self._tmp_path)
+    
+    def close(self) -> Dict:
+        """
+        Write the frame index and move the file into place
+        
+        Returns:
+            Dictionary with frame count, file size and the size the frames
+            would take uncompressed
+        """
+        index_offset = self._file.tell()
+        self._file.write(np.asarray(self.offsets, dtype='<u8').tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, self.fps, self.frames, len(self.led_counts),
+                                     self.keyframe_interval, index_offset))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return {
+            'frames': self.frames,
+            'seconds': self.frames / self.fps,
+            'bytes': os.path.getsize(self.path),
+            'bytes_raw': self.bytes_raw
+        }
+
+
+class ShowFile:
+    """A show file mapped into memory; frames are copied straight from the map"""
+    
+    def __init__(self, path: str):
+        """
+        Open a show file
+        
+        Args:
+            path: Show file written by ShowWriter
+        
+        Raises:
+            ValueError: If the file is not a complete show file
+        """
+        self.path = path
+        self.closed = False
+        # Held while frames are applied, so close() never unmaps under a reader
+        self._lock = threading.Lock()
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._map) if len(self._map) >= HEADER.size else None
+        if header is None or header[0] != MAGIC or not header[2] or not header[5]:
+            self._map.close()
+            raise ValueError(f"'{path}' is not a show file")
+        _, self.fps, self.frames, strips, self.keyframe_interval, index_offset = header
+        
+        self.led_counts = np.frombuffer(self._map, dtype='<u4', count=strips,
+                                        offset=HEADER.size).tolist()
+        self.size = sum(self.led_counts)
+        self.index = np.frombuffer(self._map, dtype='<u8', count=self.frames, offset=index_offset)
+    
+    @property
+    def seconds(self) -> float:
+        """Playing time"""
+        return self.frames / self.fps
+    
+    def apply(self, number: int, frame: np.ndarray):
+        """
+        Write one frame's stored runs into a frame
+        
+        Args:
+            number: Frame number
+            frame: uint8 [size, 3] frame holding the frame before it (or
+                anything, for a keyframe)
+        """
+        offset = int(self.index[number])
+        count, = RUN_COUNT.unpack_from(self._map, offset)
+        if not count:
+            return
+        runs = np.frombuffer(self._map, dtype=RUN, count=count, offset=offset + RUN_COUNT.size)
+        lengths = runs['length']
+        total = int(lengths.sum())
+        pixels = np.frombuffer(self._map, dtype=np.uint8, count=total * 3,
+                               offset=offset + RUN_COUNT.size + runs.nbytes).reshape(total, 3)
+        if count <= 8:
+            position = 0
+            for start, length in runs.tolist():
+                frame[start:start + length] = pixels[position:position + length]
+                position += length
+        else:
+            # Global LED of every stored pixel, then one scatter
+            lengths = lengths.astype(np.intp)
+            first = np.cumsum(lengths) - lengths
+            targets = np.arange(total) + np.repeat(runs['start'].astype(np.intp) - first, lengths)
+            frame[targets] = pixels
+    
+    def keyframe(self, number: int) -> int:
+        """Get the nearest keyframe at or before a frame"""
+        return number - number % self.keyframe_interval
+    
+    def play(self, start: int, end: int, frame: np.ndarray) -> bool:
+        """
+        Apply frames start..end in order
+        
+        Returns:
+            False (leaving the frame alone) once the show has been closed
+        """
+        with self._lock:
+            if self.closed:
+                return False
+            for number in range(start, end + 1):
+                self.apply(number, frame)
+            return True
+    
+    def close(self):
+        """Unmap the file, waiting for a frame being applied to finish"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.index = None
+            self._map.close()
+
+
+def show_effect(show: ShowFile, loop: bool = True) -> Effect:
+    """
+    Build an effect that plays a show file
+    
+    Consecutive steps apply one stored delta each. After skipped frames the
+    effect catches up from whichever is closer, the last frame shown or the
+    nearest keyframe. A show that does not loop holds its last frame.
+    
+    Args:
+        show: Open show file
+        loop: Start again after the last frame
+    
+    Returns:
+        Effect function
+    """
+    position = [-1]
+    
+    def draw(frame: np.ndarray, step: int):
+        target = step % show.frames if loop else min(step, show.frames - 1)
+        current = position[0]
+        if target == current:
+            return
+        keyframe = show.keyframe(target)
+        start = current + 1 if current >= keyframe and target > current else keyframe
+        if show.play(start, target, frame):
+            position[0] = target
+    
+    return draw
+
+
+def compile_effect(path: str, led_counts: Sequence[int], effect: Effect, fps: float,
+                   seconds: float, keyframe_interval: int = 300) -> Dict:
+    """
+    Render an effect offline into a show file
+    
+    Args:
+        path: Show file to create
+        led_counts: LED count of each strip, in chain order
+        effect: Effect function, called as effect(frame, step)
+        fps: Frames per second
+        seconds: Length of the show
+        keyframe_interval: Frames between full frames
+    
+    Returns:
+        ShowWriter.close() statistics
+    """
+    framebuffer = FrameBuffer(led_counts)
+    writer = ShowWriter(path, led_counts, fps, keyframe_interval)
+    try:
+        for step in range(max(1, int(round(seconds * fps)))):
+            framebuffer.render(effect, step)
+            writer.write(framebuffer)
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.close()
+
+
+def audio_strip_colors(wav_path: str, strips: int, fps: float, mode: str = 'dominant',
+                       bands: Optional[List[int]] = None,
+                       palette: str = 'spectrum') -> Callable[[], Optional[np.ndarray]]:
+    """
+    Analyse a WAV file frame by frame, as fast as it can be read
+    
+    Colors are worked out the same way as the audio agent's modes.
+    
+    Args:
+        wav_path: WAV file
+        strips: Number of strips
+        fps: Frames per second
+        mode: 'dominant' (every strip follows the peak frequency) or 'bands'
+        bands: Band index per strip in 'bands' mode
+        palette: Palette name
+    
+    Returns:
+        Function returning the next frame's uint8 [strips, 3] strip colors,
+        or None at the end of the file
+    """
+    source = WavFileSource(wav_path, block_size=512, realtime=False)
+    analyzer = FrequencyAnalyzer(source.sample_rate, hop_size=512, source=source, palette=palette)
+    analyzer.start_stream()
+    samples_per_frame = source.sample_rate / fps
+    colors = np.zeros((strips, 3), dtype=np.uint8)
+    frame = [0]
+    
+    if mode == 'bands':
+        bands = bands or list(range(strips))
+        extractor = FeatureExtractor(analyzer, max(bands) + 1)
+        band_colors = analyzer.frequencies_to_colors(extractor.band_frequencies[bands])
+    
+    def next_colors() -> Optional[np.ndarray]:
+        frame[0] += 1
+        while source.position < frame[0] * samples_per_frame:
+            if not source.push_block():
+                return None
+        if mode == 'bands':
+            extractor.update()
+            colors[:] = scale_colors(band_colors, extractor.levels[bands])
+        else:
+            colors[:] = analyzer.get_current_color()
+        return colors
+    
+    return next_colors
+
+
+def compile_audio(path: str, wav_path: str, led_counts: Sequence[int], fps: float = 30.0,
+                  mode: str = 'dominant', bands: Optional[List[int]] = None,
+                  palette: str = 'spectrum', keyframe_interval: int = 300,
+                  seconds: Optional[float] = None) -> Dict:
+    """
+    Render an audio-reactive show from a WAV file
+    
+    Every LED of a strip shows that strip's color for the frame.
+    
+    Args:
+        path: Show file to create
+        wav_path: WAV file to analyse
+        led_counts: LED count of each strip, in chain order
+        fps: Frames per second
+        mode: 'dominant' or 'bands' (see the audio agent)
+        bands: Band index per strip in 'bands' mode
+        palette: Palette name
+        keyframe_interval: Frames between full frames
+        seconds: Stop after this much audio (default the whole file)
+    
+    Returns:
+        ShowWriter.close() statistics
+    """
+    next_colors = audio_strip_colors(wav_path, len(led_counts), fps, mode, bands, palette)
+    framebuffer = FrameBuffer(led_counts)
+    writer = ShowWriter(path, led_counts, fps, keyframe_interval)
+    frames = int(seconds * fps) if seconds is not None else None
+    strip_index = framebuffer.strip_index
+    
+    def draw(frame: np.ndarray, step: int):
+        np.take(colors, strip_index, axis=0, out=frame)
+    
+    step = 0
+    try:
+        while frames is None or step < frames:
+            colors = next_colors()
+            if colors is None:
+                break
+            framebuffer.render(draw, step)
+            writer.write(framebuffer)
+            step += 1
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.close()
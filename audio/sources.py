@@ -0,0 +1,225 @@
+"""
+Audio Sources
+Capture backends that push samples into a RingBuffer off the analysis thread
+"""
+import threading
+import time
+import wave
+from typing import Optional, Tuple
+
+import numpy as np
+
+from audio.ring_buffer import RingBuffer
+
+
+class AudioSource:
+    """Base class for inputs that feed FrequencyAnalyzer"""
+    
+    def __init__(self, sample_rate: int, block_size: int):
+        """
+        Initialize audio source
+        
+        Args:
+            sample_rate: Samples per second delivered
+            block_size: Samples delivered per write
+        """
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.ring: Optional[RingBuffer] = None
+        self.is_running = False
+        self.overflows = 0
+        self.blocks = 0
+    
+    def start(self, ring: RingBuffer):
+        """
+        Start delivering samples
+        
+        Args:
+            ring: Buffer to write samples into
+        """
+        raise NotImplementedError
+    
+    def stop(self):
+        """Stop delivering samples"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release any resources held by the source"""
+        self.stop()
+
+
+class MicrophoneSource(AudioSource):
+    """PyAudio input stream in callback mode"""
+    
+    def __init__(self, sample_rate: int = 44100, block_size: int = 1024,
+                 device_index: Optional[int] = None):
+        """
+        Initialize microphone source
+        
+        Args:
+            sample_rate: Audio sample rate in Hz
+            block_size: Frames per PyAudio buffer (callback granularity)
+            device_index: Input device (None for the default)
+        """
+        super().__init__(sample_rate, block_size)
+        import pyaudio
+        
+        self._pyaudio = pyaudio
+        self.device_index = device_index
+        self.audio = pyaudio.PyAudio()
+        self.stream = None
+    
+    def _callback(self, in_data, frame_count, time_info, status):
+        """Runs on PortAudio's thread: copy the block into the ring and return"""
+        if status & self._pyaudio.paInputOverflow:
+            self.overflows += 1
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        self.blocks += 1
+        return (None, self._pyaudio.paContinue)
+    
+    def start(self, ring: RingBuffer):
+        """Open the input stream and start capturing"""
+        self.ring = ring
+        self.stream = self.audio.open(
+            format=self._pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.block_size,
+            stream_callback=self._callback
+        )
+        self.stream.start_stream()
+        self.is_running = True
+    
+    def stop(self):
+        """Stop and close the input stream"""
+        self.is_running = False
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+    
+    def close(self):
+        """Stop capturing and release PortAudio"""
+        self.stop()
+        if self.audio:
+            self.audio.terminate()
+            self.audio = None
+
+
+def read_wav(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Load a WAV file as mono int16
+    
+    Args:
+        path: Path to an 8, 16 or 32-bit PCM WAV file
+    
+    Returns:
+        Tuple of (samples, sample rate)
+    """
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype=np.int16)
+    elif width == 4:
+        samples = (np.frombuffer(frames, dtype=np.int32) >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+class WavFileSource(AudioSource):
+    """Plays samples from a WAV file (or array) into the ring on a capture thread"""
+    
+    def __init__(self, path: Optional[str] = None, block_size: int = 1024,
+                 realtime: bool = True, loop: bool = False,
+                 samples: Optional[np.ndarray] = None, sample_rate: int = 44100):
+        """
+        Initialize file source
+        
+        Args:
+            path: WAV file to play (or pass samples directly)
+            block_size: Samples written per block
+            realtime: Pace blocks at the file's sample rate on a capture
+                thread; when False no thread runs and the caller drives
+                playback with push_block() (deterministic benchmarks)
+            loop: Restart from the beginning at end of file
+            samples: Mono int16 samples to use instead of a file
+            sample_rate: Sample rate of `samples`
+        """
+        if path is not None:
+            samples, sample_rate = read_wav(path)
+        if samples is None:
+            raise ValueError("WavFileSource needs a path or samples")
+        
+        super().__init__(sample_rate, block_size)
+        self.samples = samples
+        self.realtime = realtime
+        self.loop = loop
+        self.position = 0
+        self.thread = None
+    
+    @property
+    def finished(self) -> bool:
+        """True once every sample has been delivered (never when looping)"""
+        return not self.loop and self.position >= len(self.samples)
+    
+    def start(self, ring: RingBuffer):
+        """Start the playback thread"""
+        self.ring = ring
+        self.is_running = True
+        if not self.realtime:
+            return
+        self.thread = threading.Thread(target=self._play, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the playback thread"""
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+    
+    def push_block(self) -> bool:
+        """
+        Write the next block into the ring
+        
+        Returns:
+            False when the end of a non-looping file has been reached
+        """
+        if self.position >= len(self.samples):
+            if not self.loop:
+                return False
+            self.position = 0
+        
+        block = self.samples[self.position:self.position + self.block_size]
+        self.position += len(block)
+        self.ring.write(block)
+        self.blocks += 1
+        return True
+    
+    def _play(self):
+        """Deliver blocks at the file's sample rate"""
+        block_time = self.block_size / self.sample_rate
+        next_block = time.monotonic()
+        
+        while self.is_running and self.push_block():
+            next_block += block_time
+            delay = next_block - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind: count it like an input overflow and resync
+                self.overflows += 1
+                next_block = time.monotonic()
+        self.is_running = False
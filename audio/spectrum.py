@@ -0,0 +1,142 @@
+"""
+Spectrum Engine
+Preallocated real-FFT pipeline used by FrequencyAnalyzer
+"""
+import inspect
+from typing import Optional
+
+import numpy as np
+
+# numpy >= 2.0 can write FFT output into a caller-supplied buffer
+NUMPY_FFT_OUT = 'out' in inspect.signature(np.fft.rfft).parameters
+
+
+def load_scipy_fft():
+    """
+    Import scipy.fft on first use
+    
+    scipy is slow to import and only needed for multi-threaded FFTs, so
+    processes that never ask for workers do not pay for it.
+    
+    Returns:
+        The scipy.fft module, or None if scipy is not installed
+    """
+    try:
+        import scipy.fft
+    except ImportError:
+        return None
+    return scipy.fft
+
+
+def make_window(name: str, size: int) -> np.ndarray:
+    """
+    Build an analysis window
+    
+    Args:
+        name: 'hann', 'hamming', 'blackman' or 'rectangular'
+        size: Window length in samples
+    
+    Returns:
+        float64 window of the given length
+    """
+    if name == 'hann':
+        window = np.hanning(size)
+    elif name == 'hamming':
+        window = np.hamming(size)
+    elif name == 'blackman':
+        window = np.blackman(size)
+    elif name == 'rectangular':
+        window = np.ones(size)
+    else:
+        raise ValueError(f"Unknown window '{name}'")
+    return window.astype(np.float64)
+
+
+class SpectrumEngine:
+    """Computes magnitude spectra of fixed-size blocks without per-frame allocation"""
+    
+    def __init__(self, size: int, sample_rate: int, window: str = 'hann',
+                 workers: Optional[int] = None):
+        """
+        Initialize spectrum engine
+        
+        Args:
+            size: FFT size in samples
+            sample_rate: Audio sample rate in Hz
+            window: Analysis window name (see make_window)
+            workers: Threads for scipy's pocketfft; when set (and scipy is
+                installed) scipy.fft is used instead of numpy.fft
+        """
+        self.size = size
+        self.sample_rate = sample_rate
+        self.window = make_window(window, size)
+        self.frequencies = np.fft.rfftfreq(size, 1 / sample_rate)
+        
+        # float64 throughout: numpy's rfft allocates scratch space for float32 input
+        bins = size // 2 + 1
+        self._windowed = np.empty(size, dtype=np.float64)
+        self._spectrum = np.empty(bins, dtype=np.complex128)
+        self.magnitude = np.empty(bins, dtype=np.float64)
+        
+        self.workers = workers
+        self._scipy_fft = load_scipy_fft() if workers else None
+        if self._scipy_fft is not None:
+            self.backend = 'scipy'
+        elif NUMPY_FFT_OUT:
+            self.backend = 'numpy-out'
+        else:
+            self.backend = 'numpy'
+    
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Compute the magnitude spectrum of one block
+        
+        The returned array is owned by the engine and overwritten by the
+        next call; copy it if it has to outlive the frame.
+        
+        Args:
+            samples: Block of exactly `size` samples (any real dtype)
+        
+        Returns:
+            Magnitudes for the bins in self.frequencies
+        """
+        # Convert then window in place; multiplying int16 directly needs a cast buffer
+        np.copyto(self._windowed, samples, casting='unsafe')
+        np.multiply(self._windowed, self.window, out=self._windowed)
+        
+        if self.backend == 'numpy-out':
+            spectrum = np.fft.rfft(self._windowed, out=self._spectrum)
+        elif self.backend == 'scipy':
+            spectrum = self._scipy_fft.rfft(self._windowed, overwrite_x=True, workers=self.workers)
+        else:
+            spectrum = np.fft.rfft(self._windowed)
+        
+        np.abs(spectrum, out=self.magnitude)
+        return self.magnitude
+    
+    def bin_range(self, min_freq: float, max_freq: float) -> slice:
+        """
+        Get the slice of bins covering a frequency range
+        
+        Args:
+            min_freq: Lowest frequency in Hz
+            max_freq: Highest frequency in Hz
+        
+        Returns:
+            Slice into self.frequencies / self.magnitude
+        """
+        lo = int(np.searchsorted(self.frequencies, min_freq, side='left'))
+        hi = int(np.searchsorted(self.frequencies, max_freq, side='right'))
+        return slice(lo, max(hi, lo + 1))
+    
+    def peak_frequency(self, bins: slice) -> float:
+        """
+        Get the frequency of the strongest bin in a range of the last spectrum
+        
+        Args:
+            bins: Slice from bin_range()
+        
+        Returns:
+            Peak frequency in Hz
+        """
+        return float(self.frequencies[bins.start + int(self.magnitude[bins].argmax())])
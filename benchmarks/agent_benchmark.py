@@ -0,0 +1,99 @@
+"""
+Agent Runtime Benchmark
+Compares device updates per second through TaskManager in threaded and async mode
+
+Each frame submits one task per device; a threaded task blocks a worker
+on client.control_device while an async task awaits
+client.async_control_device on the shared event loop. The mock server runs
+in its own process; on small machines it saturates before the client
+does, so raise --connections only as far as it keeps up.
+
+Usage:
+    python -m benchmarks.agent_benchmark --devices 200 --frames 10 --latency 0.02
+"""
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from agents.task_manager import TaskManager
+from benchmarks.transport_benchmark import _serve
+from govee_api.client import GoveeAPIClient
+from govee_api.mock_server import make_devices
+from govee_api.transport import AsyncTransport, RateLimitScheduler
+
+
+def run_mode(mode: str, client: GoveeAPIClient, device_ids: list, frames: int, workers: int):
+    """Push frames of per-device updates through a TaskManager and time them"""
+    manager = TaskManager(workers=workers, long_running_workers=0, mode=mode)
+    
+    def update(task_data: dict) -> bool:
+        return client.control_device(task_data['device_id'], task_data['command'])
+    
+    async def async_update(task_data: dict) -> bool:
+        return await client.async_control_device(task_data['device_id'], task_data['command'])
+    
+    manager.register_agent('update', update, async_function=async_update)
+    manager.start()
+    
+    frame_times = []
+    sent = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        frame_start = time.perf_counter()
+        command = {'name': 'color', 'value': {'r': frame % 256, 'g': 0, 'b': 0}}
+        handles = [
+            manager.submit_task('update', {'device_id': device_id, 'command': command})
+            for device_id in device_ids
+        ]
+        concurrent.futures.wait(handles)
+        sent += sum(1 for handle in handles if handle.result())
+        frame_times.append(time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - start
+    manager.stop()
+    
+    frame_ms = np.array(frame_times) * 1000
+    print(f'{mode:<7} {sent / elapsed:>10.0f} updates/s   '
+          f'frame p50 {np.percentile(frame_ms, 50):>8.1f} ms   '
+          f'p99 {np.percentile(frame_ms, 99):>8.1f} ms   ({sent} sent)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--frames', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=8, help='threads in threaded mode')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02, help='mock server delay (s)')
+    args = parser.parse_args()
+    
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args.devices, args.latency, urls),
+                                     daemon=True)
+    server.start()
+    url = urls.get()
+    
+    # Cloud only, and without Govee's published rate limits
+    os.environ['GOVEE_LAN'] = '0'
+    scheduler = RateLimitScheduler(device_rate=1e9, device_burst=1e9,
+                                   account_rate=1e9, account_burst=1e9)
+    transport = AsyncTransport(url, scheduler=scheduler, max_connections=args.connections)
+    client = GoveeAPIClient(api_key='benchmark', base_url=url, transport=transport)
+    client.get_devices()
+    device_ids = [d['device'] for d in make_devices(args.devices)]
+    
+    print(f'{args.devices} devices x {args.frames} frames, '
+          f'{args.latency * 1000:.0f} ms server latency')
+    try:
+        run_mode('thread', client, device_ids, args.frames, args.workers)
+        run_mode('async', client, device_ids, args.frames, args.workers)
+    finally:
+        transport.close()
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
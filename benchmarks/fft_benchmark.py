@@ -0,0 +1,108 @@
+"""
+FFT Benchmark
+Compares the original FrequencyAnalyzer FFT path with SpectrumEngine, and
+measures the cost of FeatureExtractor and palette lookups on top of it
+
+Reports frames per second and the peak bytes allocated while processing a
+frame (traced with tracemalloc, which numpy reports its buffers to).
+
+Usage:
+    python -m benchmarks.fft_benchmark --size 4096 --frames 2000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio.features import FeatureExtractor
+from audio.frequency_analyzer import FrequencyAnalyzer
+from audio.palette import get_palette
+from audio.sources import WavFileSource, read_wav
+from audio.spectrum import SpectrumEngine, load_scipy_fft
+
+
+def legacy_spectrum(audio_data: np.ndarray, sample_rate: int):
+    """The pre-SpectrumEngine implementation of get_frequency_spectrum"""
+    fft_data = np.fft.fft(audio_data)
+    frequencies = np.fft.fftfreq(len(fft_data), 1 / sample_rate)
+    magnitude = np.abs(fft_data)
+    positive_freq_idx = frequencies >= 0
+    return frequencies[positive_freq_idx], magnitude[positive_freq_idx]
+
+
+def measure(name: str, process, blocks: list, frames: int):
+    """Time a spectrum function and trace its per-frame allocations"""
+    for block in blocks[:10]:
+        process(block)
+    
+    start = time.perf_counter()
+    for i in range(frames):
+        process(blocks[i % len(blocks)])
+    fps = frames / (time.perf_counter() - start)
+    
+    tracemalloc.start()
+    allocated = []
+    for i in range(min(frames, 200)):
+        block = blocks[i % len(blocks)]
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        process(block)
+        allocated.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    
+    print(f'{name:<22} {fps:>10.0f} frames/s {np.median(allocated):>12.0f} bytes/frame')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=4096)
+    parser.add_argument('--rate', type=int, default=44100)
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--wav', help='recorded audio to analyse instead of noise')
+    args = parser.parse_args()
+    
+    if args.wav:
+        samples, args.rate = read_wav(args.wav)
+        blocks = [
+            samples[i:i + args.size]
+            for i in range(0, len(samples) - args.size + 1, args.size)
+        ]
+    else:
+        rng = np.random.default_rng(0)
+        blocks = [
+            (rng.standard_normal(args.size) * 8000).astype(np.int16)
+            for _ in range(16)
+        ]
+    
+    measure('legacy fft', lambda b: legacy_spectrum(b, args.rate), blocks, args.frames)
+    
+    engine = SpectrumEngine(args.size, args.rate)
+    measure(f'engine ({engine.backend})', engine.process, blocks, args.frames)
+    
+    if load_scipy_fft() is not None:
+        engine = SpectrumEngine(args.size, args.rate, workers=2)
+        measure('engine (scipy, 2 workers)', engine.process, blocks, args.frames)
+    
+    # Spectrum plus bands, flux, onset, beat and RMS for each new block
+    source = WavFileSource(samples=blocks[0], sample_rate=args.rate, realtime=False)
+    analyzer = FrequencyAnalyzer(args.rate, args.size, source=source)
+    analyzer.start_stream()
+    extractor = FeatureExtractor(analyzer)
+    
+    def features(block):
+        analyzer.ring.write(block)
+        extractor.update()
+    
+    measure('spectrum + features', features, blocks, args.frames)
+    
+    # Color every spectrum bin, as a full-strip spectrum effect would
+    palette = get_palette('spectrum')
+    colors = np.zeros((len(engine.frequencies), 3), dtype=np.uint8)
+    measure('palette (all bins)',
+            lambda b: palette.map_frequencies(engine.frequencies, out=colors),
+            blocks, args.frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+LAN Benchmark
+Measures batched LAN color frames against local stand-in devices
+
+Usage:
+    python -m benchmarks.lan_benchmark --devices 8 --frames 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from govee_api.client import GoveeAPIClient
+from govee_api.lan import LanTransport
+from govee_api.mock_lan import MockLanDevice
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=8)
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--fps', type=float, default=60.0)
+    args = parser.parse_args()
+    
+    devices = [MockLanDevice(f'LAN:{i:02X}').start() for i in range(args.devices)]
+    lan = LanTransport(bind_host='127.0.0.1', listen_port=0)
+    for device in devices:
+        lan.discover(timeout=0.2, address=device.address)
+    client = GoveeAPIClient(api_key='benchmark', base_url='http://127.0.0.1:9/v1', lan=lan)
+    device_ids = [d.device_id for d in devices]
+    
+    send_times = []
+    sent_at = []
+    frame_time = 1.0 / args.fps
+    try:
+        for frame in range(args.frames):
+            color = (frame % 256, 255 - frame % 256, 0)
+            start = time.perf_counter()
+            client.set_colors({device_id: color for device_id in device_ids})
+            send_times.append(time.perf_counter() - start)
+            sent_at.append(start)
+            time.sleep(frame_time)
+        time.sleep(0.2)
+    finally:
+        for device in devices:
+            device.stop()
+        lan.close()
+    
+    # Delivery latency: from frame start to the datagram arriving at each device
+    delivery = [
+        received - sent_at[i]
+        for device in devices
+        for i, (received, _) in enumerate(device.received)
+        if i < len(sent_at)
+    ]
+    received = sum(len(d.received) for d in devices)
+    send_ms = np.array(send_times) * 1000
+    delivery_ms = np.array(delivery) * 1000
+    print(f'devices:          {args.devices}, frames: {args.frames}')
+    print(f'frame send p50:   {np.percentile(send_ms, 50):.3f} ms')
+    print(f'frame send p99:   {np.percentile(send_ms, 99):.3f} ms')
+    print(f'delivery p50:     {np.percentile(delivery_ms, 50):.3f} ms')
+    print(f'delivery p99:     {np.percentile(delivery_ms, 99):.3f} ms')
+    print(f'datagrams seen:   {received}/{args.devices * args.frames}')
+
+
+if __name__ == '__main__':
+    main()
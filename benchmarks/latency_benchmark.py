@@ -0,0 +1,74 @@
+"""
+Audio Latency Benchmark
+Measures how long FrequencyAnalyzer takes to notice a change in pitch
+
+A file source plays a 200 Hz tone that switches to 2 kHz at a random
+sample. Latency is the audio time between the switch and the first
+spectrum whose dominant frequency is the new tone, plus the measured
+processing time of that spectrum. Full-chunk capture blocks (the old
+blocking read) are compared with overlapping windows at several hop sizes.
+
+Usage:
+    python -m benchmarks.latency_benchmark --trials 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from audio.frequency_analyzer import FrequencyAnalyzer
+from audio.sources import WavFileSource
+
+
+def pitch_change(sample_rate: int, onset: int, length: int) -> np.ndarray:
+    """Render a 200 Hz tone that switches to 2 kHz at sample `onset`"""
+    t = np.arange(length) / sample_rate
+    signal = np.where(np.arange(length) < onset,
+                      np.sin(2 * np.pi * 200 * t),
+                      np.sin(2 * np.pi * 2000 * t))
+    return (signal * 10000).astype(np.int16)
+
+
+def measure(sample_rate: int, chunk_size: int, hop_size, trials: int, rng):
+    """Average detection latency in milliseconds for one configuration"""
+    latencies = []
+    for _ in range(trials):
+        onset = int(rng.integers(chunk_size, 3 * chunk_size))
+        source = WavFileSource(samples=pitch_change(sample_rate, onset, onset + 4 * chunk_size),
+                               sample_rate=sample_rate, block_size=hop_size or chunk_size,
+                               realtime=False)
+        analyzer = FrequencyAnalyzer(sample_rate, chunk_size, hop_size=hop_size, source=source)
+        analyzer.start_stream()
+        
+        # Each push is one capture callback; analysis runs right after it
+        while source.push_block():
+            start = time.perf_counter()
+            frequency = analyzer.get_dominant_frequency()
+            elapsed = time.perf_counter() - start
+            if frequency > 1000:
+                break
+        
+        audio_delay = (source.position - onset) / sample_rate
+        latencies.append((audio_delay + elapsed) * 1000)
+        analyzer.cleanup()
+    return np.mean(latencies), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rate', type=int, default=44100)
+    parser.add_argument('--chunk', type=int, default=4096)
+    parser.add_argument('--trials', type=int, default=50)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    
+    print(f'FFT window {args.chunk} samples '
+          f'({args.chunk / args.rate * 1000:.1f} ms, {args.rate / args.chunk:.1f} Hz bins)')
+    for hop_size in (None, 2048, 1024, 512, 256):
+        mean, p95 = measure(args.rate, args.chunk, hop_size, args.trials, rng)
+        label = 'full chunk' if hop_size is None else f'hop {hop_size}'
+        print(f'{label:<14} mean {mean:6.1f} ms   p95 {p95:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Resilience Benchmark
+Exercises retries, circuit breakers, 429 handling and hedged sends against a fault-injecting mock server
+
+Each scenario runs once with the resilience feature and once without, and
+reports delivered commands and time taken:
+
+- errors:   a share of commands fail with a 500 (retries with backoff)
+- throttle: every Nth command gets a 429 with Retry-After (rate limiter pauses)
+- offline:  one strip times out on every command (circuit breaker)
+- hedge:    LAN devices whose datagrams are lost (cloud copies of each frame)
+
+Usage:
+    python -m benchmarks.resilience_benchmark --commands 200 --error-rate 0.3
+"""
+import argparse
+import os
+import time
+
+from govee_api.client import GoveeAPIClient
+from govee_api.lan import LanTransport
+from govee_api.mock_lan import MockLanDevice
+from govee_api.mock_server import MockGoveeServer, make_devices
+from govee_api.resilience import BreakerBoard, RetryPolicy
+from govee_api.transport import AsyncTransport, RateLimitScheduler
+
+
+def make_client(url: str, resilient: bool, lan: LanTransport = None,
+                hedge: bool = False) -> GoveeAPIClient:
+    """Client with unlimited rate limits, with or without retries and breakers"""
+    scheduler = RateLimitScheduler(device_rate=1e9, device_burst=1e9,
+                                   account_rate=1e9, account_burst=1e9)
+    transport = AsyncTransport(url, scheduler=scheduler, timeout=2.0)
+    retry = RetryPolicy(attempts=4, base_delay=0.02) if resilient else RetryPolicy(attempts=1)
+    breakers = BreakerBoard(reset_timeout=1.0) if resilient \
+        else BreakerBoard(failure_threshold=1 << 30)
+    client = GoveeAPIClient(api_key='benchmark', base_url=url, transport=transport,
+                            lan=lan, retry=retry, breakers=breakers, hedge=hedge)
+    client.get_devices()
+    return client
+
+
+def color(i: int) -> dict:
+    """A distinct color command"""
+    return {'name': 'color', 'value': {'r': i % 256, 'g': 0, 'b': 0}}
+
+
+def commands_case(server: MockGoveeServer, device_ids: list, commands: int, resilient: bool):
+    """Send commands one by one; returns (delivered, seconds)"""
+    client = make_client(server.url, resilient)
+    start = time.perf_counter()
+    delivered = sum(
+        client.control_device(device_ids[i % len(device_ids)], color(i)) for i in range(commands)
+    )
+    elapsed = time.perf_counter() - start
+    client.transport.close()
+    return delivered, elapsed
+
+
+def offline_case(server: MockGoveeServer, device_ids: list, frames: int, resilient: bool):
+    """Send color frames to every strip; returns (healthy strips' delivered frames, p50 frame seconds)"""
+    client = make_client(server.url, resilient)
+    healthy = [d for d in device_ids if d not in server.offline]
+    delivered = 0
+    frame_times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        results = client.set_colors({d: (i % 256, 0, 0) for d in device_ids})
+        frame_times.append(time.perf_counter() - start)
+        delivered += sum(results[d] for d in healthy)
+    client.transport.close()
+    frame_times.sort()
+    return delivered, frame_times[len(frame_times) // 2]
+
+
+def hedge_case(server: MockGoveeServer, device_ids: list, frames: int, hedge: bool):
+    """Send color frames to LAN devices whose datagrams are lost; returns (frames shown, seconds)"""
+    devices = [MockLanDevice(device_id).start() for device_id in device_ids]
+    lan = LanTransport(bind_host='127.0.0.1', listen_port=0)
+    for device in devices:
+        lan.discover(timeout=0.2, address=device.address)
+    # Discovery worked; from here on every datagram is lost on the way
+    for device in devices:
+        device.stop()
+    
+    client = make_client(server.url, True, lan=lan, hedge=hedge)
+    shown = 0
+    start = time.perf_counter()
+    for i in range(frames):
+        expected = (i % 256, i % 7, 0)
+        client.set_colors({d: expected for d in device_ids})
+        time.sleep(0.02)
+        shown += sum(
+            server.states[d]['color'] == {'r': expected[0], 'g': expected[1], 'b': expected[2]}
+            for d in device_ids
+        )
+    elapsed = time.perf_counter() - start
+    client.transport.close()
+    lan.close()
+    return shown, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=200)
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--error-rate', type=float, default=0.3)
+    parser.add_argument('--throttle-every', type=int, default=10)
+    parser.add_argument('--offline-delay', type=float, default=0.5)
+    args = parser.parse_args()
+    # Only the hedge scenario uses the LAN, with its own transport
+    os.environ['GOVEE_LAN'] = '0'
+    
+    devices = make_devices(args.devices)
+    device_ids = [d['device'] for d in devices]
+    server = MockGoveeServer(devices=devices, offline_delay=args.offline_delay, retry_after=0.05).start()
+    
+    try:
+        server.error_rate = args.error_rate
+        for resilient in (False, True):
+            delivered, elapsed = commands_case(server, device_ids, args.commands, resilient)
+            print(f'errors   {"retries" if resilient else "single ":<8} '
+                  f'{delivered}/{args.commands} delivered in {elapsed:.2f}s')
+        server.error_rate = 0.0
+        
+        server.rate_limit_every = args.throttle_every
+        for resilient in (False, True):
+            delivered, elapsed = commands_case(server, device_ids, args.commands, resilient)
+            print(f'throttle {"retries" if resilient else "single ":<8} '
+                  f'{delivered}/{args.commands} delivered in {elapsed:.2f}s '
+                  f'({server.faults["rate_limited"]} 429s so far)')
+        server.rate_limit_every = 0
+        
+        server.offline = {device_ids[-1]}
+        healthy = args.frames * (args.devices - 1)
+        for resilient in (False, True):
+            delivered, frame_s = offline_case(server, device_ids, args.frames, resilient)
+            print(f'offline  {"breaker" if resilient else "none   ":<8} '
+                  f'{delivered}/{healthy} frames to healthy strips, '
+                  f'frame p50 {frame_s * 1000:.1f} ms')
+        server.offline = set()
+        
+        for hedge in (False, True):
+            shown, elapsed = hedge_case(server, device_ids, args.frames, hedge)
+            print(f'hedge    {"on" if hedge else "off":<8} '
+                  f'{shown}/{args.frames * args.devices} frames shown despite lost datagrams '
+                  f'in {elapsed:.2f}s')
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
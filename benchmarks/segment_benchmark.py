@@ -0,0 +1,86 @@
+"""
+Segment Benchmark
+Measures per-segment strip frames (render, reduce, pack, send) against local stand-in LAN devices
+
+Every pixel changes every frame, so each strip sends one packed
+streaming-mode datagram per frame. Reports LEDs rendered per second per
+strip, the datagram size, and what the same frame would cost as one JSON
+color command per segment.
+
+Usage:
+    python -m benchmarks.segment_benchmark --strips 8 --leds 1000 --frames 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from audio.light_sync import LightSyncCoordinator
+from benchmarks.suite import rainbow_effect
+from govee_api.client import GoveeAPIClient
+from govee_api.coalescer import CommandCoalescer
+from govee_api.lan import LanTransport, encode_command, encode_segments
+from govee_api.mock_lan import MockLanDevice
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--strips', type=int, default=8)
+    parser.add_argument('--leds', type=int, default=1000)
+    parser.add_argument('--segments', type=int, help='segments per strip (default: most a frame holds)')
+    parser.add_argument('--frames', type=int, default=500)
+    args = parser.parse_args()
+    
+    devices = [MockLanDevice(f'LAN:{i:02X}').start() for i in range(args.strips)]
+    lan = LanTransport(bind_host='127.0.0.1', listen_port=0)
+    for device in devices:
+        lan.discover(timeout=0.2, address=device.address)
+    client = GoveeAPIClient(api_key='benchmark', base_url='http://127.0.0.1:9/v1', lan=lan)
+    device_ids = [d.device_id for d in devices]
+    
+    segments = [args.segments] * args.strips if args.segments else None
+    coordinator = LightSyncCoordinator(device_ids, [args.leds] * args.strips,
+                                       CommandCoalescer(client), segments)
+    framebuffer = coordinator.framebuffer
+    draw = rainbow_effect(framebuffer.size)
+    
+    frame_times = []
+    try:
+        for step in range(args.frames):
+            start = time.perf_counter()
+            framebuffer.render(draw, step)
+            for strip in {segment[0] for segment in framebuffer.diff()}:
+                coordinator.send_strip(strip)
+            frame_times.append(time.perf_counter() - start)
+        time.sleep(0.2)
+    finally:
+        for device in devices:
+            device.stop()
+        lan.close()
+    
+    # The devices should show exactly the last frame that was sent
+    expected = [list(map(tuple, coordinator._strip_segments(i).tolist())) for i in range(args.strips)]
+    matched = sum(1 for device, frame in zip(devices, expected) if device.segments == frame)
+    
+    count = coordinator.segments[0]
+    zones = coordinator._strip_segments(0)
+    packed = len(encode_segments(zones.tobytes()))
+    per_segment = sum(
+        len(encode_command({'name': 'color', 'value': {'r': r, 'g': g, 'b': b}}))
+        for r, g, b in zones.tolist()
+    )
+    
+    frame_ms = np.array(frame_times) * 1000
+    elapsed = sum(frame_times)
+    print(f'strips:            {args.strips} x {args.leds} LEDs, {count} segments each')
+    print(f'frames/s:          {args.frames / elapsed:.0f}')
+    print(f'LEDs/s per strip:  {args.frames * args.leds / elapsed:,.0f}')
+    print(f'frame p50 / p99:   {np.percentile(frame_ms, 50):.3f} / {np.percentile(frame_ms, 99):.3f} ms')
+    print(f'datagram:          {packed} bytes per strip frame '
+          f'({per_segment} bytes as {count} color commands)')
+    print(f'last frame shown:  {matched}/{args.strips} strips, '
+          f'{sum(d.bad_frames for d in devices)} malformed frames')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Light Show Benchmark
+Compares rendering effects and audio live with playing the same frames back from a compiled show
+
+For each case the frames are first compiled into a show file, then rendered
+live and played back for the same number of frames (no device sends). Reports
+CPU time per frame for both, file size against the raw frames, and how
+long compiling took.
+
+Usage:
+    python -m benchmarks.show_benchmark --strips 8 --leds 1000 --seconds 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from audio.framebuffer import FrameBuffer, rolling_effect, trail_effect
+from audio.show import ShowFile, audio_strip_colors, compile_audio, compile_effect, show_effect
+from benchmarks.suite import rainbow_effect, write_music
+
+
+def cpu_per_frame(framebuffer: FrameBuffer, draw, frames: int) -> float:
+    """CPU seconds per framebuffer.render() call"""
+    start = time.process_time()
+    for step in range(frames):
+        framebuffer.render(draw, step)
+    return (time.process_time() - start) / frames
+
+
+def report(name: str, stats: dict, compile_s: float, live_s: float, play_s: float):
+    """Print one case"""
+    print(f'{name:<16} {stats["frames"]:>5} frames  '
+          f'{stats["bytes"] / 1024:>8.1f} KiB ({stats["bytes"] / stats["bytes_raw"]:>6.1%} of raw)  '
+          f'compile {compile_s:>5.2f}s  '
+          f'live {live_s * 1e6:>7.1f} us/frame  play {play_s * 1e6:>6.1f} us/frame  '
+          f'({live_s / play_s:>5.1f}x)')
+
+
+def effect_case(name: str, make_effect, led_counts: list, fps: float, seconds: float, path: str):
+    """Compile an effect, then render it live and from the show"""
+    size = sum(led_counts)
+    start = time.perf_counter()
+    stats = compile_effect(path, led_counts, make_effect(size), fps, seconds)
+    compile_s = time.perf_counter() - start
+    
+    live_s = cpu_per_frame(FrameBuffer(led_counts), make_effect(size), stats['frames'])
+    show = ShowFile(path)
+    play_s = cpu_per_frame(FrameBuffer(led_counts), show_effect(show), stats['frames'])
+    show.close()
+    report(name, stats, compile_s, live_s, play_s)
+
+
+def audio_case(mode: str, wav_path: str, led_counts: list, fps: float, path: str):
+    """Compile an audio show, then analyse the file live and play the show"""
+    start = time.perf_counter()
+    stats = compile_audio(path, wav_path, led_counts, fps, mode=mode)
+    compile_s = time.perf_counter() - start
+    
+    # Live: the analysis and strip fill the audio agent does for every frame
+    next_colors = audio_strip_colors(wav_path, len(led_counts), fps, mode)
+    framebuffer = FrameBuffer(led_counts)
+    
+    def live(frame: np.ndarray, step: int):
+        np.take(next_colors(), framebuffer.strip_index, axis=0, out=frame)
+    
+    live_s = cpu_per_frame(framebuffer, live, stats['frames'])
+    show = ShowFile(path)
+    play_s = cpu_per_frame(FrameBuffer(led_counts), show_effect(show), stats['frames'])
+    show.close()
+    report(f'audio/{mode}', stats, compile_s, live_s, play_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--strips', type=int, default=8)
+    parser.add_argument('--leds', type=int, default=1000)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--seconds', type=float, default=20.0)
+    args = parser.parse_args()
+    
+    led_counts = [args.leds] * args.strips
+    print(f'{args.strips} strips x {args.leds} LEDs at {args.fps:g} fps')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'benchmark.show')
+        effects = {
+            'rolling': lambda size: rolling_effect(size, (255, 0, 0), trail_length=5),
+            'trail': lambda size: trail_effect(size, (0, 255, 0)),
+            'rainbow': rainbow_effect
+        }
+        for name, make_effect in effects.items():
+            effect_case(name, make_effect, led_counts, args.fps, args.seconds, path)
+        
+        wav_path = os.path.join(tmp, 'music.wav')
+        write_music(wav_path, args.seconds)
+        for mode in ('dominant', 'bands'):
+            audio_case(mode, wav_path, led_counts, args.fps, path)
+
+
+if __name__ == '__main__':
+    main()
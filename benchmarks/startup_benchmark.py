@@ -0,0 +1,98 @@
+"""
+Startup Benchmark
+Cold-start time and memory of the web server, before and after audio mode loads
+
+Each run imports server.main in a fresh interpreter (against an unreachable
+API, so nothing waits on the network), then starts an audio task from a
+generated WAV file to show what audio mode adds on first use.
+
+Usage:
+    python -m benchmarks.startup_benchmark --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import wave
+
+import numpy as np
+
+HEAVY_MODULES = ('numpy', 'scipy', 'pyaudio', 'audio.frequency_analyzer', 'agents.audio_agent')
+
+PROBE = r'''
+import json, resource, sys, time
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+start = time.perf_counter()
+import server.main
+from agents.task_manager import task_manager
+report = {
+    'import_s': time.perf_counter() - start,
+    'rss_mb': rss_mb(),
+    'loaded': [m for m in HEAVY_MODULES if m in sys.modules]
+}
+
+start = time.perf_counter()
+task_manager.submit_task('audio_reactive', {'action': 'start', 'device_ids': [],
+                                            'wav_path': WAV_PATH})
+while not getattr(sys.modules.get('agents.audio_agent'), 'audio_analyzer', None):
+    time.sleep(0.001)
+report['audio_start_s'] = time.perf_counter() - start
+report['audio_rss_mb'] = rss_mb()
+print(json.dumps(report))
+'''
+
+
+def write_tone(path: str, seconds: float = 1.0, rate: int = 44100):
+    """Write a 440 Hz test tone"""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 16000).astype(np.int16)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def probe(wav_path: str) -> dict:
+    """Start the server module in a fresh interpreter and report its cost"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\nWAV_PATH = {wav_path!r}\n' + PROBE
+    env = dict(os.environ,
+               GOVEE_API_KEY='benchmark', GOVEE_API_BASE_URL='http://127.0.0.1:9',
+               GOVEE_LAN='0', GOVEE_REGISTRY_SNAPSHOT=os.devnull,
+               PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                         capture_output=True, text=True, timeout=60)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, 'tone.wav')
+        write_tone(wav_path)
+        reports = [probe(wav_path) for _ in range(args.runs)]
+
+    def median(key):
+        return float(np.median([report[key] for report in reports]))
+
+    print(f'median of {args.runs} runs')
+    print(f'import server.main  {median("import_s") * 1000:>8.0f} ms   '
+          f'{median("rss_mb"):>6.1f} MB peak RSS')
+    print(f'  heavy modules loaded: {", ".join(reports[0]["loaded"]) or "none"}')
+    print(f'first audio task    {median("audio_start_s") * 1000:>8.0f} ms   '
+          f'{median("audio_rss_mb"):>6.1f} MB peak RSS')
+
+
+if __name__ == '__main__':
+    main()
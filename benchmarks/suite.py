@@ -0,0 +1,376 @@
+"""
+Benchmark Suite
+Runs the offline benchmarks as one suite and compares them against stored baselines
+
+Needs no microphone and no network: audio comes from WAV fixtures
+(synthesised on the fly unless --wav is given) and devices from the mock
+server, started in its own process. Every result is a rate, so higher is
+better. Each case runs --repeat times and keeps its best run.
+
+Baselines are per machine; record them on the machine that checks them.
+
+Usage:
+    python -m benchmarks.suite                  # compare with benchmarks/baselines.json
+    python -m benchmarks.suite --save           # record new baselines
+    python -m benchmarks.suite --only sync --wav song.wav
+    GOVEE_BENCHMARKS=1 python -m pytest tests/test_benchmarks.py   # same check under pytest
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import wave
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents.task_manager import TaskManager
+from audio.features import FeatureExtractor
+from audio.framebuffer import rolling_effect
+from audio.frequency_analyzer import FrequencyAnalyzer
+from audio.light_sync import LightSyncCoordinator
+from audio.palette import scale_colors
+from audio.sources import WavFileSource
+from benchmarks.transport_benchmark import _serve
+from govee_api.client import GoveeAPIClient
+from govee_api.lan import encode_segments
+from govee_api.mock_server import make_devices
+from govee_api.transport import AsyncTransport, RateLimitScheduler
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# (strips, LEDs per strip) for the framebuffer cases
+SYNC_LAYOUTS = ((2, 100), (2, 1000), (8, 100), (8, 1000), (64, 100), (64, 1000))
+
+
+def write_music(path: str, seconds: float = 8.0, rate: int = 44100, seed: int = 0):
+    """
+    Write a deterministic stand-in for a music recording
+    
+    Kick drum on the beat, a chord that changes every bar, hi-hat noise on
+    the off-beats and a noise floor, so spectra and beats vary like real
+    audio instead of holding still like a test tone.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    beat = 0.5
+    phase = t % beat
+    
+    kick = np.sin(2 * np.pi * 55 * phase * (1 + 4 * np.exp(-phase * 30))) * np.exp(-phase * 12)
+    chords = ((220.0, 277.2, 329.6), (196.0, 246.9, 293.7), (174.6, 220.0, 261.6))
+    bar = (t // (4 * beat)).astype(int) % len(chords)
+    chord = sum(np.sin(2 * np.pi * np.take([c[i] for c in chords], bar) * t) for i in range(3)) / 3
+    offbeat = (t + beat / 2) % beat
+    hat = rng.standard_normal(len(t)) * np.exp(-offbeat * 60)
+    signal = 0.5 * kick + 0.3 * chord + 0.15 * hat + 0.01 * rng.standard_normal(len(t))
+    
+    samples = (np.clip(signal, -1, 1) * 24000).astype(np.int16)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def rate_of(step: Callable[[], int], seconds: float, min_calls: int = 5) -> float:
+    """
+    Call step() until `seconds` have passed and report its rate
+    
+    Args:
+        step: Does one unit of work and returns how many items it handled
+        seconds: Minimum measuring time
+        min_calls: Minimum number of calls, for slow steps
+    
+    Returns:
+        Items per second
+    """
+    for _ in range(3):
+        step()
+    items = calls = 0
+    start = time.perf_counter()
+    while True:
+        items += step()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds and calls >= min_calls:
+            return items / elapsed
+
+
+def analyzer_case(wav_path: str, seconds: float) -> Dict[str, float]:
+    """FrequencyAnalyzer spectra and colors per second over a WAV fixture"""
+    source = WavFileSource(wav_path, block_size=1024, realtime=False, loop=True)
+    analyzer = FrequencyAnalyzer(source.sample_rate, 4096, hop_size=1024, source=source)
+    analyzer.start_stream()
+    
+    def spectrum():
+        source.push_block()
+        analyzer.get_frequency_spectrum()
+        return 1
+    
+    def color():
+        source.push_block()
+        analyzer.get_current_color()
+        return 1
+    
+    return {'spectrum_fps': rate_of(spectrum, seconds), 'color_fps': rate_of(color, seconds)}
+
+
+def rainbow_effect(size: int):
+    """Scroll a full-length gradient one LED per frame, so every pixel changes"""
+    hue = np.arange(size) * (6.0 / size)
+    gradient = np.stack([
+        np.clip(np.abs((hue + shift) % 6 - 3) - 1, 0, 1) for shift in (0, 4, 2)
+    ], axis=1)
+    gradient = (gradient * 255).astype(np.uint8)
+    index = np.arange(size)
+    
+    def draw(frame: np.ndarray, step: int):
+        np.take(gradient, (index + step) % size, axis=0, out=frame)
+    
+    return draw
+
+
+def sync_case(strips: int, leds: int, effect: str, seconds: float) -> Dict[str, float]:
+    """LightSyncCoordinator frames per second: render, diff and per-strip colors, no sends"""
+    coordinator = LightSyncCoordinator([f'strip-{i}' for i in range(strips)], [leds] * strips)
+    framebuffer = coordinator.framebuffer
+    if effect == 'rolling':
+        draw = rolling_effect(framebuffer.size, (255, 255, 255), trail_length=5)
+    else:
+        draw = rainbow_effect(framebuffer.size)
+    counter = iter(range(1 << 62))
+    
+    def frame():
+        framebuffer.render(draw, next(counter))
+        # One send per changed strip, as LightSyncCoordinator._send_strips does
+        for strip in {segment[0] for segment in framebuffer.diff()}:
+            coordinator._strip_color(strip)
+        return 1
+    
+    fps = rate_of(frame, seconds)
+    return {'fps': fps, 'leds_per_s': fps * framebuffer.size}
+
+
+def segments_case(strips: int, leds: int, seconds: float) -> Dict[str, float]:
+    """Per-segment strip frames per second: render, diff, reduce and pack, no sends"""
+    coordinator = LightSyncCoordinator([f'strip-{i}' for i in range(strips)], [leds] * strips)
+    framebuffer = coordinator.framebuffer
+    draw = rainbow_effect(framebuffer.size)
+    counter = iter(range(1 << 62))
+    
+    def frame():
+        framebuffer.render(draw, next(counter))
+        for strip in {segment[0] for segment in framebuffer.diff()}:
+            encode_segments(coordinator._strip_segments(strip).tobytes())
+        return 1
+    
+    fps = rate_of(frame, seconds)
+    return {'fps': fps, 'leds_per_s': fps * framebuffer.size}
+
+
+def task_case(mode: str, tasks: int, seconds: float) -> Dict[str, float]:
+    """TaskManager dispatch rate for tasks that do no work"""
+    manager = TaskManager(workers=4, long_running_workers=0, mode=mode)
+    
+    def noop(task_data: dict):
+        return None
+    
+    async def async_noop(task_data: dict):
+        return None
+    
+    manager.register_agent('noop', noop, async_function=async_noop)
+    manager.start()
+    try:
+        def batch():
+            handles = [manager.submit_task('noop', {}) for _ in range(tasks)]
+            concurrent.futures.wait(handles)
+            return tasks
+        
+        return {'tasks_per_s': rate_of(batch, seconds, min_calls=2)}
+    finally:
+        manager.stop()
+
+
+def end_to_end_case(url: str, wav_path: str, devices: int, seconds: float) -> Dict[str, float]:
+    """Audio to acknowledged device updates: WAV -> bands -> colors -> mock cloud API"""
+    scheduler = RateLimitScheduler(device_rate=1e9, device_burst=1e9,
+                                   account_rate=1e9, account_burst=1e9)
+    transport = AsyncTransport(url, scheduler=scheduler, max_connections=16)
+    client = GoveeAPIClient(api_key='benchmark', base_url=url, transport=transport)
+    client.get_devices()
+    device_ids = [d['device'] for d in make_devices(devices)]
+    
+    source = WavFileSource(wav_path, block_size=1024, realtime=False, loop=True)
+    analyzer = FrequencyAnalyzer(source.sample_rate, 4096, hop_size=1024, source=source)
+    analyzer.start_stream()
+    extractor = FeatureExtractor(analyzer, n_bands=devices)
+    band_colors = analyzer.frequencies_to_colors(extractor.band_frequencies)
+    
+    def frame():
+        source.push_block()
+        extractor.update()
+        colors = scale_colors(band_colors, extractor.levels)
+        results = client.set_colors(dict(zip(device_ids, map(tuple, colors.tolist()))))
+        return sum(results.values())
+    
+    try:
+        return {'updates_per_s': rate_of(frame, seconds)}
+    finally:
+        transport.close()
+
+
+def build_cases(args, wav_paths: List[str], url: str) -> List[Tuple[str, Callable]]:
+    """Every (name prefix, case) pair the suite runs"""
+    cases = []
+    for path in wav_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        cases.append((f'analyzer/{name}', lambda path=path: analyzer_case(path, args.seconds)))
+    for strips, leds in SYNC_LAYOUTS:
+        cases.append((f'sync/rainbow/{strips}x{leds}',
+                      lambda s=strips, l=leds: sync_case(s, l, 'rainbow', args.seconds)))
+    cases.append(('sync/rolling/64x1000', lambda: sync_case(64, 1000, 'rolling', args.seconds)))
+    for strips, leds in SYNC_LAYOUTS:
+        cases.append((f'segments/{strips}x{leds}',
+                      lambda s=strips, l=leds: segments_case(s, l, args.seconds)))
+    for mode in ('thread', 'async'):
+        cases.append((f'tasks/{mode}', lambda mode=mode: task_case(mode, 2000, args.seconds)))
+    cases.append((f'e2e/{args.devices}_devices',
+                  lambda: end_to_end_case(url, wav_paths[0], args.devices, args.seconds)))
+    return cases
+
+
+def machine() -> Dict[str, str]:
+    """Where the numbers came from"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': str(os.cpu_count())
+    }
+
+
+def compare(results: Dict[str, float], baselines: Dict, tolerance: float) -> int:
+    """
+    Print results next to their baselines
+    
+    Returns:
+        Number of results below baseline by more than the tolerance
+    """
+    stored = baselines.get('results', {})
+    if baselines.get('machine') and baselines['machine'] != machine():
+        print('note: baselines were recorded on a different machine:')
+        print(f'      {baselines["machine"]}')
+    
+    regressions = 0
+    print(f'{"benchmark":<40} {"result":>14} {"baseline":>14} {"change":>8}')
+    for name, value in results.items():
+        baseline = stored.get(name)
+        if baseline is None:
+            print(f'{name:<40} {value:>14.1f} {"-":>14} {"new":>8}')
+            continue
+        change = value / baseline - 1
+        flag = ''
+        if change < -tolerance:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f'{name:<40} {value:>14.1f} {baseline:>14.1f} {change:>+8.1%}{flag}')
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options (argv defaults to sys.argv)"""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wav', action='append', default=[],
+                        help='recorded audio fixture (repeatable; default: synthesised)')
+    parser.add_argument('--only', action='append', default=[],
+                        help='run cases whose name starts with this (repeatable)')
+    parser.add_argument('--seconds', type=float, default=0.5, help='measuring time per run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case (best is kept)')
+    parser.add_argument('--devices', type=int, default=16, help='devices in the e2e case')
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='allowed slowdown before a result counts as a regression')
+    parser.add_argument('--save', action='store_true', help='store results as the new baselines')
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace, wav_paths: List[str]) -> Dict[str, float]:
+    """
+    Run the selected cases
+    
+    Args:
+        args: Options from parse_args()
+        wav_paths: Audio fixtures for the analyzer and end-to-end cases
+    
+    Returns:
+        Best result over the repeats, by benchmark name
+    """
+    # Cloud only; the mock server stands in for every device
+    os.environ['GOVEE_LAN'] = '0'
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args.devices, 0.0, urls), daemon=True)
+    server.start()
+    url = urls.get()
+    
+    results: Dict[str, float] = {}
+    try:
+        for prefix, case in build_cases(args, wav_paths, url):
+            if args.only and not any(prefix.startswith(part) for part in args.only):
+                continue
+            best: Dict[str, float] = {}
+            for _ in range(args.repeat):
+                for key, value in case().items():
+                    best[key] = max(best.get(key, 0.0), value)
+            for key, value in best.items():
+                results[f'{prefix}/{key}'] = value
+                print(f'{prefix}/{key}: {value:.1f}', file=sys.stderr)
+    finally:
+        server.terminate()
+    return results
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict:
+    """Read stored baselines (empty if none were saved)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    args = parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_paths = args.wav
+        if not wav_paths:
+            wav_paths = [os.path.join(tmp, 'music.wav')]
+            write_music(wav_paths[0])
+        results = run(args, wav_paths)
+    
+    if args.save:
+        baselines = {'machine': machine(),
+                     'results': load_baselines(args.baselines).get('results', {})}
+        baselines['results'].update(results)
+        tmp_path = f'{args.baselines}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp_path, args.baselines)
+        print(f'saved {len(results)} baselines to {args.baselines}')
+        return
+    
+    regressions = compare(results, load_baselines(args.baselines), args.tolerance)
+    if regressions:
+        print(f'{regressions} regression(s) beyond {args.tolerance:.0%}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Transport Benchmark
+Measures GoveeAPIClient command throughput and latency against the mock server
+
+Usage:
+    python -m benchmarks.transport_benchmark --commands 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+import numpy as np
+
+from govee_api.client import GoveeAPIClient
+from govee_api.mock_server import MockGoveeServer, make_devices
+from govee_api.transport import AsyncTransport, RateLimitScheduler, get_loop_thread
+
+
+def _serve(devices: int, latency: float, urls: multiprocessing.Queue):
+    """Run the mock server in its own process so it does not share our GIL"""
+    server = MockGoveeServer(devices=make_devices(devices), latency=latency)
+    urls.put(server.url)
+    server.serve_forever()
+
+
+async def _run(client: GoveeAPIClient, device_ids: list, commands: int, concurrency: int):
+    """Send commands with bounded concurrency and collect per-request latencies"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def send(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await client.async_control_device(
+                device_ids[i % len(device_ids)],
+                {'name': 'color', 'value': {'r': i % 256, 'g': 0, 'b': 0}}
+            )
+            latencies.append(time.perf_counter() - start)
+    
+    await client.async_get_devices()
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(commands)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--devices', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help='mock server delay (s)')
+    args = parser.parse_args()
+    
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args.devices, args.latency, urls),
+                                     daemon=True)
+    server.start()
+    url = urls.get()
+    # Benchmark the transport itself, not Govee's published rate limits
+    scheduler = RateLimitScheduler(device_rate=1e9, device_burst=1e9,
+                                   account_rate=1e9, account_burst=1e9)
+    transport = AsyncTransport(url, scheduler=scheduler,
+                               max_connections=args.concurrency)
+    client = GoveeAPIClient(api_key='benchmark', base_url=url, transport=transport)
+    device_ids = [d['device'] for d in make_devices(args.devices)]
+    
+    try:
+        elapsed, latencies = get_loop_thread().run(
+            _run(client, device_ids, args.commands, args.concurrency)
+        )
+    finally:
+        transport.close()
+        server.terminate()
+    
+    latencies_ms = np.array(latencies) * 1000
+    print(f'commands:    {args.commands} over {args.devices} devices')
+    print(f'throughput:  {args.commands / elapsed:.0f} commands/s')
+    print(f'latency p50: {np.percentile(latencies_ms, 50):.2f} ms')
+    print(f'latency p99: {np.percentile(latencies_ms, 99):.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Analysis Worker Benchmark
+Compares the cost of audio analysis to the server process in-process and with the worker process
+
+Plays a WAV file in real time and reads spectra and band features the way
+the audio agent's bands mode does. Reports the CPU time the main process
+spends per analyzed frame and its share of one core; with the worker, the
+FFT and feature work no longer holds this process's GIL.
+
+Usage:
+    python -m benchmarks.worker_benchmark --seconds 5 --hop 512
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from audio.analysis_worker import SharedAnalyzer, feature_extractor
+from audio.frequency_analyzer import FrequencyAnalyzer
+from audio.sources import WavFileSource
+from benchmarks.suite import write_music
+
+
+def run(name: str, analyzer, extractor, seconds: float):
+    """Read every new frame for `seconds` and report this process's share of the work"""
+    analyzer.start_stream()
+    while not extractor.update():
+        time.sleep(0.001)
+    
+    frames = 0
+    read_times = []
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        read_start = time.perf_counter()
+        if extractor.update():
+            analyzer.get_current_color()
+            read_times.append(time.perf_counter() - read_start)
+            frames += 1
+        else:
+            time.sleep(0.001)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    analyzer.cleanup()
+    
+    read_us = np.array(read_times) * 1e6
+    print(f'{name:<10} {frames / wall:>6.1f} frames/s   '
+          f'read p50 {np.percentile(read_us, 50):>7.1f} us   '
+          f'main process CPU {1e3 * cpu / max(frames, 1):>6.2f} ms/frame '
+          f'({100 * cpu / wall:>4.1f}% of a core)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--hop', type=int, default=512)
+    parser.add_argument('--size', type=int, default=4096)
+    parser.add_argument('--bands', type=int, default=8)
+    parser.add_argument('--wav', help='recorded audio to play instead of the synthesised track')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = args.wav
+        if not wav_path:
+            wav_path = os.path.join(tmp, 'music.wav')
+            write_music(wav_path)
+        
+        source = WavFileSource(wav_path, block_size=args.hop, loop=True)
+        local = FrequencyAnalyzer(source.sample_rate, args.size, hop_size=args.hop, source=source)
+        run('in-process', local, feature_extractor(local, args.bands), args.seconds)
+        
+        shared = SharedAnalyzer(chunk_size=args.size, hop_size=args.hop, wav_path=wav_path,
+                                n_bands=args.bands)
+        run('worker', shared, feature_extractor(shared, args.bands), args.seconds)
+
+
+if __name__ == '__main__':
+    main()
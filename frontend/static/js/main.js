@@ -5,6 +5,7 @@ let audioContext = null;
 let microphone = null;
 let audioAnalyzer = null;
 let isAudioActive = false;
+let lightState = {};
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
@@ -30,6 +31,7 @@ async function loadLights() {
                 // Add to lights list
                 const lightItem = createLightItem(light);
                 container.appendChild(lightItem);
+                updateLightStatus(light.id);
                 
                 // Add to select dropdowns
                 const option1 = new Option(light.name, light.id);
@@ -50,6 +52,7 @@ async function loadLights() {
 function createLightItem(light) {
     const div = document.createElement('div');
     div.className = 'light-item';
+    div.dataset.lightId = light.id;
     div.innerHTML = `
         <h3>${light.name}</h3>
         <p>Status: <span class="light-status ${light.status}">${light.status.toUpperCase()}</span></p>
@@ -198,6 +201,27 @@ function stopRollingEffect() {
 function setupSocketListeners() {
     socket.on('connect', () => {
         console.log('Connected to server');
+        // Server-side spectrum and device state, throttled per client
+        socket.emit('subscribe', { fps: 20, spectrum: true, state: true });
+    });
+    
+    socket.on('spectrum', (data) => {
+        // While the local microphone is active it drives the canvas
+        if (!isAudioActive) {
+            visualizeFrequency(new Uint8Array(data.bars));
+        }
+    });
+    
+    socket.on('state_full', (state) => {
+        lightState = state;
+        Object.keys(state).forEach(updateLightStatus);
+    });
+    
+    socket.on('state_delta', (delta) => {
+        Object.entries(delta).forEach(([lightId, changed]) => {
+            lightState[lightId] = Object.assign(lightState[lightId] || {}, changed);
+            updateLightStatus(lightId);
+        });
     });
     
     socket.on('status', (data) => {
@@ -214,6 +238,20 @@ function setupSocketListeners() {
     });
 }
 
+function updateLightStatus(lightId) {
+    const item = document.querySelector(`.light-item[data-light-id="${lightId}"]`);
+    const state = lightState[lightId];
+    if (!item || !state) return;
+    
+    const status = item.querySelector('.light-status');
+    const power = state.power || 'unknown';
+    status.className = `light-status ${power}`;
+    status.textContent = power.toUpperCase();
+    if (state.color) {
+        status.style.color = `rgb(${state.color.join(', ')})`;
+    }
+}
+
 // Control individual light
 async function controlLight(lightId, action) {
     try {
@@ -226,9 +264,10 @@ async function controlLight(lightId, action) {
         });
         
         const data = await response.json();
-        if (data.status === 'success') {
-            loadLights(); // Refresh lights list
+        if (data.status !== 'success') {
+            console.warn('Light control failed:', data);
         }
+        // The new state arrives over the socket as a state_delta
     } catch (error) {
         console.error('Error controlling light:', error);
     }
@@ -2,26 +2,63 @@
 Govee API Client
 Handles communication with Govee devices via their API
 """
-import requests
+import asyncio
 import os
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Tuple
+
+import httpx
+
+from govee_api import metrics
+from govee_api.lan import LanTransport, get_shared_lan_transport
+from govee_api.resilience import (IDEMPOTENT_COMMANDS, BreakerBoard, RetryPolicy,
+                                  account_exhausted, is_retryable, retry_after)
+from govee_api.transport import AsyncTransport, get_loop_thread, get_shared_transport
+
+DEFAULT_BASE_URL = 'https://developer-api.govee.com/v1'
 
 class GoveeAPIClient:
     """Client for interacting with Govee API"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 transport: Optional[AsyncTransport] = None,
+                 lan: Optional[LanTransport] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breakers: Optional[BreakerBoard] = None,
+                 hedge: Optional[bool] = None):
         """
         Initialize Govee API client
         
         Args:
             api_key: Govee API key (or set GOVEE_API_KEY env var)
+            base_url: API base URL (or set GOVEE_API_BASE_URL env var)
+            transport: Transport to use instead of the shared pooled one
+            lan: LAN transport to use instead of the shared one (set
+                GOVEE_LAN=0 to disable LAN control entirely)
+            retry: Backoff for repeating failed cloud commands
+            breakers: Per-device circuit breakers for cloud commands
+            hedge: Also send color frames for LAN devices to the cloud when
+                the rate limit has room (or set GOVEE_HEDGE=1)
         """
         self.api_key = api_key or os.environ.get('GOVEE_API_KEY')
-        self.base_url = 'https://developer-api.govee.com/v1'
+        self.base_url = base_url or os.environ.get('GOVEE_API_BASE_URL', DEFAULT_BASE_URL)
         self.headers = {
             'Govee-API-Key': self.api_key,
             'Content-Type': 'application/json'
         } if self.api_key else {}
+        self.transport = transport or get_shared_transport(self.base_url, self.api_key, self.headers)
+        self.device_models: Dict[str, str] = {}
+        # Smoothed time from send to acknowledgement per device, in ns
+        self.latency_ns: Dict[str, float] = {}
+        self.retry = retry or RetryPolicy()
+        self.breakers = breakers or BreakerBoard()
+        self.hedge = hedge if hedge is not None else os.environ.get('GOVEE_HEDGE', '0') == '1'
+        # Hedged cloud sends in flight (kept referenced until they finish)
+        self._hedges = set()
+        
+        if lan is None and os.environ.get('GOVEE_LAN', '1') != '0':
+            lan = get_shared_lan_transport()
+        self.lan = lan
     
     def get_devices(self) -> List[Dict]:
         """
@@ -30,9 +67,36 @@ class GoveeAPIClient:
         Returns:
             List of device dictionaries
         """
-        # TODO: Implement actual API call
-        # Example endpoint: GET /devices
-        return []
+        try:
+            response = self.transport.request_sync('GET', '/devices')
+        except httpx.HTTPError as e:
+            print(f"Error listing Govee devices: {e}")
+            return []
+        return self._parse_devices(response)
+    
+    async def async_get_devices(self) -> List[Dict]:
+        """
+        Get list of all available Govee devices (coroutine version)
+        
+        Returns:
+            List of device dictionaries
+        """
+        try:
+            response = await self.transport.request('GET', '/devices')
+        except httpx.HTTPError as e:
+            print(f"Error listing Govee devices: {e}")
+            return []
+        return self._parse_devices(response)
+    
+    def _parse_devices(self, response: httpx.Response) -> List[Dict]:
+        """Extract the device list and remember each device's model"""
+        if response.status_code != 200:
+            return []
+        
+        devices = response.json().get('data', {}).get('devices', [])
+        for device in devices:
+            self.device_models[device['device']] = device.get('model')
+        return devices
     
     def get_device_info(self, device_id: str) -> Dict:
         """
@@ -40,12 +104,61 @@ class GoveeAPIClient:
         
         Args:
             device_id: Device identifier
-            
+        
         Returns:
             Device information dictionary
         """
-        # TODO: Implement actual API call
-        return {}
+        model = self._get_model(device_id)
+        if model is None:
+            return {}
+        
+        try:
+            response = self.transport.request_sync(
+                'GET', '/devices/state', device_id,
+                params={'device': device_id, 'model': model}
+            )
+        except httpx.HTTPError as e:
+            print(f"Error reading state of device '{device_id}': {e}")
+            return {}
+        
+        if response.status_code != 200:
+            return {}
+        return response.json().get('data', {})
+    
+    def _get_model(self, device_id: str) -> Optional[str]:
+        """Look up a device's model, listing devices once if it is unknown"""
+        if device_id not in self.device_models:
+            self.get_devices()
+        return self.device_models.get(device_id)
+    
+    def _control_payload(self, device_id: str, model: str, command: Dict) -> Dict:
+        """Build the request body for a control command"""
+        return {
+            'device': device_id,
+            'model': model,
+            'cmd': command
+        }
+    
+    def compile_command(self, device_id: str, command: Dict,
+                        model: Optional[str] = None) -> Optional[Dict]:
+        """
+        Build a control request body ahead of time
+        
+        Never touches the network, so it is safe on the event loop.
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary
+            model: Device model (defaults to the one learned from the device list)
+        
+        Returns:
+            Request body for async_control_device(payload=...), or None if
+            the model is not known yet
+        """
+        model = model or self.device_models.get(device_id)
+        if model is None:
+            return None
+        return self._control_payload(device_id, model, command)
     
     def control_device(self, device_id: str, command: Dict) -> bool:
         """
@@ -54,12 +167,138 @@ class GoveeAPIClient:
         Args:
             device_id: Device identifier
             command: Command dictionary (e.g., {'name': 'turn', 'value': 'on'})
-            
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        start = time.monotonic_ns()
+        if self.lan and self.lan.can_send(device_id, command) and self.lan.send(device_id, command):
+            return self._record_latency(device_id, start, True, 'lan')
+        
+        # Not on the LAN, no LAN encoding for the command, or the datagram failed
+        model = self._get_model(device_id)
+        if model is None:
+            return False
+        
+        payload = self._control_payload(device_id, model, command)
+        return get_loop_thread().run(self._send_cloud(device_id, command, payload))
+    
+    async def async_control_device(self, device_id: str, command: Dict,
+                                   payload: Optional[Dict] = None, retry: bool = True) -> bool:
+        """
+        Send control command to a device (coroutine version)
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary (e.g., {'name': 'turn', 'value': 'on'})
+            payload: Cloud request body from compile_command() (built here if omitted)
+            retry: Whether a failed cloud send may be retried
+        
         Returns:
             True if successful, False otherwise
         """
-        # TODO: Implement actual API call
-        return False
+        start = time.monotonic_ns()
+        if self.lan and self.lan.can_send(device_id, command) and self.lan.send(device_id, command):
+            return self._record_latency(device_id, start, True, 'lan')
+        
+        if payload is None:
+            if device_id not in self.device_models:
+                await self.async_get_devices()
+            payload = self.compile_command(device_id, command)
+            if payload is None:
+                return False
+        
+        return await self._send_cloud(device_id, command, payload, retry)
+    
+    async def _send_cloud(self, device_id: str, command: Dict, payload: Dict,
+                          retry: bool = True, paced: bool = True) -> bool:
+        """
+        Send a control request to the cloud API, retrying where it is safe
+        
+        Commands are refused at once while the device's circuit breaker is
+        open. Idempotent commands are repeated with jittered exponential
+        backoff after connection errors, timeouts, 429 and 5xx responses;
+        a 429 also holds back the rate limiter for as long as the response
+        asks.
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary
+            payload: Request body
+            retry: Whether failures may be retried
+            paced: Wait for the rate limiter (see AsyncTransport.request)
+        
+        Returns:
+            True if the device accepted the command
+        """
+        breaker = self.breakers.get(device_id)
+        if not breaker.allow():
+            metrics.DEVICE_SENDS.inc(device_id, 'rejected')
+            return False
+        
+        attempts = self.retry.attempts if retry and command['name'] in IDEMPOTENT_COMMANDS else 1
+        ok = False
+        for attempt in range(attempts):
+            response = error = None
+            start = time.monotonic_ns()
+            try:
+                response = await self.transport.request(
+                    'PUT', '/devices/control', device_id, paced=paced, json=payload
+                )
+            except httpx.HTTPError as e:
+                error = e
+            ok = self._record_latency(device_id, start, response is not None and response.status_code == 200)
+            limited = response is not None and response.status_code == 429
+            if limited:
+                # Rate limiting says nothing about whether the device is reachable
+                breaker.abandon()
+            else:
+                # Every failed attempt counts, so a dead device trips its breaker quickly
+                breaker.record(ok)
+            if ok or not is_retryable(response) or attempt + 1 == attempts or not breaker.allow():
+                break
+            
+            if limited:
+                # The rate limiter holds the retry (and everything else) back
+                wait = retry_after(response)
+                self.transport.scheduler.defer(
+                    self.retry.delay(attempt) if wait is None else wait,
+                    None if account_exhausted(response) else device_id
+                )
+                metrics.DEVICE_RETRIES.inc(device_id, 'rate_limited')
+            else:
+                await asyncio.sleep(self.retry.delay(attempt))
+                metrics.DEVICE_RETRIES.inc(device_id, 'error')
+            paced = True
+        
+        if error is not None:
+            print(f"Error controlling device '{device_id}': {error}")
+        return ok
+    
+    def _record_latency(self, device_id: str, start_ns: int, ok: bool,
+                        transport: str = 'cloud') -> bool:
+        """Fold one successful send's duration into the device's latency; returns ok"""
+        elapsed = time.monotonic_ns() - start_ns
+        if ok:
+            previous = self.latency_ns.get(device_id)
+            self.latency_ns[device_id] = (
+                elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+            )
+            metrics.DEVICE_SEND_SECONDS.observe(elapsed / 1e9, device_id, transport)
+        metrics.DEVICE_SENDS.inc(device_id, 'ok' if ok else 'error')
+        return ok
+    
+    def send_latency(self, device_id: str) -> float:
+        """
+        Get the measured time a command takes to reach a device
+        
+        Args:
+            device_id: Device identifier
+        
+        Returns:
+            Smoothed latency in seconds (0.0 until a command has been sent)
+        """
+        return self.latency_ns.get(device_id, 0.0) / 1e9
     
     def set_color(self, device_id: str, r: int, g: int, b: int) -> bool:
         """
@@ -70,7 +309,7 @@ class GoveeAPIClient:
             r: Red value (0-255)
             g: Green value (0-255)
             b: Blue value (0-255)
-            
+        
         Returns:
             True if successful, False otherwise
         """
@@ -84,6 +323,200 @@ class GoveeAPIClient:
         }
         return self.control_device(device_id, command)
     
+    def is_reachable(self, device_id: str) -> bool:
+        """
+        Check whether commands for a device are currently being sent
+        
+        Returns:
+            False while the device is a cloud device with an open circuit breaker
+        """
+        if self.lan and self.lan.has_device(device_id):
+            return True
+        return not self.breakers.is_open(device_id)
+    
+    def supports_segments(self, device_id: str) -> bool:
+        """Check whether a device can be sent per-segment frames (LAN streaming mode)"""
+        return bool(self.lan and self.lan.has_device(device_id))
+    
+    def set_segments(self, device_id: str, pixels, gradient: bool = False) -> bool:
+        """
+        Show one color per segment of a device
+        
+        LAN devices get the whole frame as a single streaming-mode datagram.
+        The cloud API has no per-segment command, so other devices show
+        their brightest segment's color instead.
+        
+        Args:
+            device_id: Device identifier
+            pixels: uint8 [n, 3] segment colors, first segment first
+                (n up to lan.MAX_SEGMENTS)
+            gradient: Let the device blend between neighbouring segments
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if self.supports_segments(device_id):
+            start = time.monotonic_ns()
+            ok = self.lan.send_segments(device_id, pixels.tobytes(), gradient)
+            return self._record_latency(device_id, start, ok, 'lan')
+        
+        r, g, b = pixels[pixels.sum(axis=1, dtype='uint16').argmax()].tolist()
+        return self.set_color(device_id, r, g, b)
+    
+    def set_colors(self, colors: Dict[str, Tuple[int, int, int]],
+                   retry: bool = True) -> Dict[str, bool]:
+        """
+        Set the color of several devices at once
+        
+        LAN devices are updated in a single pass over the shared UDP socket;
+        the rest are sent to the cloud API concurrently. With hedging on,
+        LAN devices are also sent the color over the cloud whenever the rate
+        limit has room, without waiting for it, in case the datagram is lost.
+        
+        Args:
+            colors: Mapping of device ID to (r, g, b)
+            retry: Whether failed cloud sends may be retried (frames that a
+                newer frame will replace soon can skip it)
+        
+        Returns:
+            Mapping of device ID to success flag
+        """
+        results, cloud_commands, lan_commands = self._send_lan_colors(colors)
+        loop_thread = get_loop_thread()
+        if lan_commands and self.hedge:
+            future = asyncio.run_coroutine_threadsafe(self._send_hedges(lan_commands), loop_thread.loop)
+            self._hedges.add(future)
+            future.add_done_callback(self._hedges.discard)
+        if cloud_commands:
+            results.update(loop_thread.run(self._send_cloud_batch(cloud_commands, retry)))
+        return results
+    
+    async def async_set_colors(self, colors: Dict[str, Tuple[int, int, int]],
+                               retry: bool = True) -> Dict[str, bool]:
+        """
+        Set the color of several devices at once (coroutine version)
+        
+        Args:
+            colors: Mapping of device ID to (r, g, b)
+            retry: Whether failed cloud sends may be retried
+        
+        Returns:
+            Mapping of device ID to success flag
+        """
+        results, cloud_commands, lan_commands = self._send_lan_colors(colors)
+        if lan_commands and self.hedge:
+            task = asyncio.ensure_future(self._send_hedges(lan_commands))
+            self._hedges.add(task)
+            task.add_done_callback(self._hedges.discard)
+        if cloud_commands:
+            results.update(await self._send_cloud_batch(cloud_commands, retry))
+        return results
+    
+    async def _send_hedges(self, commands: Dict[str, Dict]):
+        """
+        Repeat LAN commands over the cloud where it costs no waiting
+        
+        Devices whose model is unknown, whose breaker is open, or whose
+        rate limit has no slot free right now are skipped.
+        """
+        sends = []
+        for device_id, command in commands.items():
+            payload = self.compile_command(device_id, command)
+            if payload is None or self.breakers.is_open(device_id):
+                continue
+            if not self.transport.scheduler.try_reserve(device_id):
+                continue
+            metrics.DEVICE_RETRIES.inc(device_id, 'hedge')
+            sends.append(self._send_cloud(device_id, command, payload, retry=False, paced=False))
+        await asyncio.gather(*sends)
+    
+    def _send_lan_colors(self, colors: Dict[str, Tuple[int, int, int]]
+                         ) -> Tuple[Dict[str, bool], Dict[str, Dict], Dict[str, Dict]]:
+        """
+        Send the LAN devices' colors as one frame
+        
+        Returns:
+            Tuple of (results so far, cloud commands still to send, commands
+            sent over the LAN)
+        """
+        commands = {
+            device_id: {'name': 'color', 'value': {'r': int(r), 'g': int(g), 'b': int(b)}}
+            for device_id, (r, g, b) in colors.items()
+        }
+        
+        lan_commands = {}
+        if self.lan:
+            lan_commands = {d: c for d, c in commands.items() if self.lan.has_device(d)}
+        cloud_commands = {d: c for d, c in commands.items() if d not in lan_commands}
+        
+        results = {device_id: False for device_id in commands}
+        if lan_commands:
+            start = time.monotonic_ns()
+            acked = set(self.lan.send_frame(lan_commands))
+            for device_id in lan_commands:
+                if device_id in acked:
+                    results[device_id] = self._record_latency(device_id, start, True, 'lan')
+                else:
+                    # The datagram could not be sent; try the cloud instead
+                    cloud_commands[device_id] = lan_commands[device_id]
+            lan_commands = {d: c for d, c in lan_commands.items() if d in acked}
+        return results, cloud_commands, lan_commands
+    
+    async def _send_cloud_batch(self, commands: Dict[str, Dict], retry: bool = True) -> Dict[str, bool]:
+        """Send commands to several cloud devices concurrently"""
+        device_ids = list(commands)
+        sent = await asyncio.gather(
+            *(self.async_control_device(d, commands[d], retry=retry) for d in device_ids)
+        )
+        return dict(zip(device_ids, sent))
+    
+    def send_batch(self, commands: List[Tuple[str, Dict, Optional[Dict]]]) -> List[Dict]:
+        """
+        Send many commands, devices in parallel
+        
+        Args:
+            commands: List of (device_id, command, payload or None)
+        
+        Returns:
+            One result per command, in order (see async_send_batch)
+        """
+        return get_loop_thread().run(self.async_send_batch(commands))
+    
+    async def async_send_batch(self, commands: List[Tuple[str, Dict, Optional[Dict]]]
+                               ) -> List[Dict]:
+        """
+        Send many commands, devices in parallel (coroutine version)
+        
+        Commands for different devices are in flight together; commands for
+        the same device go out one after another in the order given, so
+        e.g. power on lands before a color change.
+        
+        Args:
+            commands: List of (device_id, command, payload or None)
+        
+        Returns:
+            One {'device_id', 'command', 'ok', 'ms'} per command, in order
+        """
+        by_device: Dict[str, List[int]] = {}
+        for index, (device_id, _, _) in enumerate(commands):
+            by_device.setdefault(device_id, []).append(index)
+        results: List[Optional[Dict]] = [None] * len(commands)
+        
+        async def send_device(indices: List[int]):
+            for index in indices:
+                device_id, command, payload = commands[index]
+                start = time.monotonic_ns()
+                ok = await self.async_control_device(device_id, command, payload)
+                results[index] = {
+                    'device_id': device_id,
+                    'command': command['name'],
+                    'ok': ok,
+                    'ms': (time.monotonic_ns() - start) / 1e6
+                }
+        
+        await asyncio.gather(*(send_device(indices) for indices in by_device.values()))
+        return results
+    
     def set_brightness(self, device_id: str, brightness: int) -> bool:
         """
         Set device brightness
@@ -91,7 +524,7 @@ class GoveeAPIClient:
         Args:
             device_id: Device identifier
             brightness: Brightness value (0-100)
-            
+        
         Returns:
             True if successful, False otherwise
         """
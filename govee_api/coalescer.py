@@ -0,0 +1,408 @@
+"""
+Command Coalescer
+Latest-wins command queue that keeps only the newest state per device attribute
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Dict, List, Optional, Tuple
+
+from govee_api import metrics
+from govee_api.client import GoveeAPIClient
+from govee_api.shadow import DeviceShadow, get_shared_shadow
+from govee_api.transport import get_loop_thread
+
+# Commands that write the same device attribute replace each other
+ATTRIBUTES = {
+    'turn': 'power',
+    'brightness': 'brightness',
+    'color': 'color',
+    'colorTem': 'color'
+}
+
+# Seconds that acknowledged or reported state is trusted for interactive
+# commands; the device may have been changed from the app or its switch since
+FRESH_SECONDS = 5.0
+
+
+class CommandCoalescer:
+    """Merges pending commands per device and sends each device's on the transport event loop"""
+    
+    def __init__(self, client: Optional[GoveeAPIClient] = None,
+                 shadow: Optional[DeviceShadow] = None):
+        """
+        Initialize coalescer
+        
+        Args:
+            client: Client used to send commands (defaults to a new shared-transport client)
+            shadow: Device shadow told about queued and acknowledged commands,
+                and consulted for state this coalescer has not written itself
+        """
+        self.client = client or GoveeAPIClient()
+        self.shadow = shadow
+        self.pending: Dict[str, Dict[str, Dict]] = {}
+        self.acked: Dict[str, Dict[str, Dict]] = {}
+        # time.time() when each acknowledged command was recorded
+        self._acked_at: Dict[str, Dict[str, float]] = {}
+        self.inflight: Dict[str, Dict[str, Dict]] = {}
+        self.counters = {
+            'submitted': 0,
+            'sent': 0,
+            'failed': 0,
+            'dropped_stale': 0,
+            'dropped_redundant': 0,
+            'merged': 0
+        }
+        self.is_running = False
+        self.thread = None
+        self._cond = threading.Condition()
+        # metrics.clock() when each device's oldest pending command was queued
+        self._queued_at: Dict[str, int] = {}
+        # Sends running on the event loop
+        self._sends = set()
+    
+    def submit(self, device_id: str, command: Dict, max_age: Optional[float] = None):
+        """
+        Queue a command, replacing any pending command for the same attribute
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary (e.g., {'name': 'turn', 'value': 'on'})
+            max_age: Only drop the command as redundant against state known
+                within this many seconds (None trusts state of any age, for
+                effect frames; user commands pass FRESH_SECONDS)
+        """
+        attribute = ATTRIBUTES.get(command.get('name'), command.get('name'))
+        
+        with self._cond:
+            self.counters['submitted'] += 1
+            device_pending = self.pending.setdefault(device_id, {})
+            
+            if attribute in device_pending:
+                self.counters['dropped_stale'] += 1
+                del device_pending[attribute]
+            elif device_pending:
+                self.counters['merged'] += 1
+            
+            if self._last_written(device_id, attribute, max_age) == command:
+                # Device already shows (or is about to show) this state
+                self.counters['dropped_redundant'] += 1
+                if not device_pending:
+                    del self.pending[device_id]
+                return
+            
+            device_pending[attribute] = command
+            if device_id not in self._queued_at:
+                self._queued_at[device_id] = metrics.clock()
+            self._cond.notify()
+        if self.shadow:
+            self.shadow.desire(device_id, command)
+    
+    def _last_written(self, device_id: str, attribute: str,
+                      max_age: Optional[float] = None) -> Optional[Dict]:
+        """
+        Most recent command for an attribute that is in flight or acknowledged
+        
+        Acknowledged and reported state older than max_age seconds is
+        ignored (None accepts any age).
+        """
+        command = self.inflight.get(device_id, {}).get(attribute)
+        if command is not None:
+            return command
+        cutoff = None if max_age is None else time.time() - max_age
+        if cutoff is None or self._acked_at.get(device_id, {}).get(attribute, 0.0) >= cutoff:
+            command = self.acked.get(device_id, {}).get(attribute)
+        if command is None and self.shadow and (cutoff is None or
+                                                self.shadow.updated.get(device_id, 0.0) >= cutoff):
+            # Known from an earlier run or from reconciliation
+            command = self.shadow.command(device_id, attribute)
+        return command
+    
+    def last_command(self, device_id: str, attribute: str) -> Optional[Dict]:
+        """
+        Get the newest command for a device attribute (pending, in flight or acknowledged)
+        
+        Args:
+            device_id: Device identifier
+            attribute: 'power', 'brightness' or 'color'
+        
+        Returns:
+            Command dictionary, or None if nothing has been written
+        """
+        with self._cond:
+            command = self.pending.get(device_id, {}).get(attribute)
+            return command or self._last_written(device_id, attribute)
+    
+    def is_redundant(self, device_id: str, command: Dict, max_age: Optional[float] = None) -> bool:
+        """
+        Check whether a command would not change what the device shows
+        
+        For callers that send around the queue; submit() applies the same
+        check itself.
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary
+            max_age: Ignore state older than this many seconds (see submit)
+        
+        Returns:
+            True if nothing is pending for the attribute and the device
+            already shows (or is being sent) this state
+        """
+        attribute = ATTRIBUTES.get(command.get('name'), command.get('name'))
+        with self._cond:
+            if attribute in self.pending.get(device_id, {}):
+                return False
+            return self._last_written(device_id, attribute, max_age) == command
+    
+    def set_color(self, device_id: str, r: int, g: int, b: int):
+        """Queue a color change"""
+        self.submit(device_id, {'name': 'color', 'value': {'r': int(r), 'g': int(g), 'b': int(b)}})
+    
+    def set_brightness(self, device_id: str, brightness: int):
+        """Queue a brightness change"""
+        self.submit(device_id, {'name': 'brightness', 'value': int(brightness)})
+    
+    def set_power(self, device_id: str, on: bool):
+        """Queue a power change"""
+        self.submit(device_id, {'name': 'turn', 'value': 'on' if on else 'off'})
+    
+    def invalidate(self, device_id: Optional[str] = None):
+        """
+        Forget acknowledged state so the next write is always sent
+        
+        The shadow's reported state is dropped too, since it would otherwise
+        stand in for what was forgotten.
+        
+        Args:
+            device_id: Device to forget (None for all devices)
+        """
+        with self._cond:
+            if device_id is None:
+                self.acked.clear()
+                self._acked_at.clear()
+            else:
+                self.acked.pop(device_id, None)
+                self._acked_at.pop(device_id, None)
+        if self.shadow:
+            self.shadow.forget(device_id)
+    
+    def acknowledge(self, device_id: str, command: Dict):
+        """
+        Record a command that was sent around the coalescer as acknowledged
+        
+        Args:
+            device_id: Device identifier
+            command: Command the device accepted
+        """
+        attribute = ATTRIBUTES.get(command.get('name'), command.get('name'))
+        with self._cond:
+            self.acked.setdefault(device_id, {})[attribute] = command
+            self._acked_at.setdefault(device_id, {})[attribute] = time.time()
+        if self.shadow:
+            self.shadow.acknowledge(device_id, command)
+    
+    def _ready(self) -> bool:
+        """Whether some device has pending commands and nothing in flight (under _cond)"""
+        return any(device_id not in self.inflight for device_id in self.pending)
+    
+    def _take(self) -> Dict[str, Dict[str, Dict]]:
+        """Move pending commands of devices with nothing in flight to inflight (under _cond)"""
+        batch = {device_id: commands for device_id, commands in self.pending.items()
+                 if device_id not in self.inflight}
+        for device_id in batch:
+            del self.pending[device_id]
+            queued = self._queued_at.pop(device_id, None)
+            if queued is not None:
+                # Time commands waited in the queue before going out
+                metrics.STAGE_SECONDS.observe_since(queued, 'queue')
+        self.inflight.update(batch)
+        return batch
+    
+    def _launch(self, batch: Dict[str, Dict[str, Dict]]) -> List[Future]:
+        """
+        Start sending a batch on the transport event loop without waiting
+        
+        Colors for LAN devices go out together as one frame; every other
+        device is sent on its own, so a rate-limited or offline device only
+        holds up its own commands.
+        
+        Returns:
+            One future per send, each resolving to the number of commands sent
+        """
+        lan = self.client.lan
+        local = {}
+        if lan:
+            local = {device_id: commands for device_id, commands in batch.items()
+                     if set(commands) == {'color'} and lan.has_device(device_id)}
+        groups = [local] if local else []
+        groups += [{device_id: commands} for device_id, commands in batch.items()
+                   if device_id not in local]
+        
+        loop = get_loop_thread().loop
+        futures = []
+        for group in groups:
+            future = asyncio.run_coroutine_threadsafe(self._send(group), loop)
+            self._sends.add(future)
+            future.add_done_callback(self._sends.discard)
+            futures.append(future)
+        return futures
+    
+    async def _send(self, batch: Dict[str, Dict[str, Dict]]) -> int:
+        """
+        Send one group of devices' commands and record the outcome
+        
+        Color changes go out through async_set_colors without retries, since
+        a newer frame soon replaces a lost one; other attributes are sent one
+        command at a time, power before color.
+        
+        Returns:
+            Number of commands sent successfully
+        """
+        results = []
+        start = metrics.clock()
+        try:
+            colors = {}
+            for device_id, commands in batch.items():
+                for attribute, command in commands.items():
+                    if command['name'] == 'color':
+                        value = command['value']
+                        colors[device_id] = (value['r'], value['g'], value['b'])
+                    else:
+                        ok = await self.client.async_control_device(device_id, command)
+                        results.append((device_id, attribute, command, ok))
+            
+            if colors:
+                sent = await self.client.async_set_colors(colors, retry=False)
+                for device_id, ok in sent.items():
+                    results.append((device_id, 'color', batch[device_id]['color'], ok))
+        except Exception as e:
+            print(f"Error sending device commands: {e}")
+        finally:
+            sent = self._settle(batch, results)
+            metrics.STAGE_SECONDS.observe_since(start, 'send')
+        return sent
+    
+    def _settle(self, batch: Dict[str, Dict[str, Dict]], results: List[Tuple]) -> int:
+        """
+        Record a finished send and queue again what it did not get to
+        
+        Commands without a result (the send raised before reaching them)
+        go back to pending unless a newer one for the attribute is waiting.
+        
+        Returns:
+            Number of commands sent successfully
+        """
+        done = {(device_id, attribute) for device_id, attribute, _, _ in results}
+        sent = 0
+        with self._cond:
+            for device_id, attribute, command, ok in results:
+                if ok:
+                    self.acked.setdefault(device_id, {})[attribute] = command
+                    self._acked_at.setdefault(device_id, {})[attribute] = time.time()
+                    sent += 1
+                else:
+                    self.counters['failed'] += 1
+            self.counters['sent'] += sent
+            
+            for device_id, commands in batch.items():
+                self.inflight.pop(device_id, None)
+                unsent = {attribute: command for attribute, command in commands.items()
+                          if (device_id, attribute) not in done}
+                if not unsent:
+                    continue
+                device_pending = self.pending.setdefault(device_id, {})
+                for attribute, command in unsent.items():
+                    device_pending.setdefault(attribute, command)
+                self._queued_at.setdefault(device_id, metrics.clock())
+            self._cond.notify_all()
+        
+        if self.shadow:
+            for device_id, attribute, command, ok in results:
+                if ok:
+                    self.shadow.acknowledge(device_id, command)
+                else:
+                    self.shadow.discard(device_id, command)
+        return sent
+    
+    def flush(self) -> int:
+        """
+        Send everything that is pending and wait for it
+        
+        Sends already in flight are waited for too, and whatever was queued
+        for their devices meanwhile is sent after them.
+        
+        Returns:
+            Number of commands this call sent successfully
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                batch = self._take()
+                waiting = list(self._sends)
+            if not batch and not waiting:
+                return sent
+            for future in self._launch(batch) if batch else ():
+                sent += future.result()
+            wait(waiting)
+    
+    def start(self):
+        """Start the sender thread"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        self.thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the sender thread after flushing what is pending"""
+        with self._cond:
+            self.is_running = False
+            self._cond.notify()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.flush()
+    
+    def _sender_loop(self):
+        """Start sends for devices with pending commands and nothing in flight"""
+        while self.is_running:
+            with self._cond:
+                while self.is_running and not self._ready():
+                    self._cond.wait(timeout=1.0)
+                if not self.is_running:
+                    break
+                batch = self._take()
+            try:
+                self._launch(batch)
+            except Exception as e:
+                print(f"Error flushing device commands: {e}")
+                self._settle(batch, [])
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters
+        
+        Returns:
+            Dictionary of counters plus the number of pending commands
+        """
+        with self._cond:
+            stats = dict(self.counters)
+            stats['pending'] = sum(len(commands) for commands in self.pending.values())
+        return stats
+
+
+_coalescer: Optional[CommandCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+
+def get_shared_coalescer() -> CommandCoalescer:
+    """Get (and lazily start) the process-wide command coalescer"""
+    global _coalescer
+    
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = CommandCoalescer(shadow=get_shared_shadow())
+            _coalescer.start()
+        return _coalescer
@@ -0,0 +1,363 @@
+"""
+Govee LAN Transport
+Controls devices over Govee's local UDP protocol, bypassing the cloud API
+"""
+import base64
+import json
+import os
+import select
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Govee LAN API addresses and ports
+MULTICAST_GROUP = '239.255.255.250'
+SCAN_PORT = 4001
+LISTEN_PORT = 4002
+CONTROL_PORT = 4003
+
+SCAN_MESSAGE = {'msg': {'cmd': 'scan', 'data': {'account_topic': 'reserve'}}}
+
+# Binary frames of the LAN "razer" (DreamView) streaming mode:
+#   0xBB 0x00 <length> <opcode> <body...> <xor of every previous byte>
+# The length byte counts the body plus one (or two) header bytes that follow it
+RAZER_MODE = 0xB1
+RAZER_COLORS = 0xB0
+# Colors per frame: 3 * n + 2 must fit in the single length byte
+MAX_SEGMENTS = 84
+
+
+def _xor(frame: bytes) -> int:
+    """XOR of every byte (folding one big integer is faster than a byte loop)"""
+    value = int.from_bytes(frame, 'little')
+    width = len(frame)
+    while width > 1:
+        half = (width + 1) // 2
+        value = (value & ((1 << (8 * half)) - 1)) ^ (value >> (8 * half))
+        width = half
+    return value
+
+
+def _razer_datagram(frame: bytearray) -> bytes:
+    """Append the checksum and wrap a binary frame in its JSON envelope"""
+    frame.append(_xor(frame))
+    return b'{"msg":{"cmd":"razer","data":{"pt":"' + base64.b64encode(frame) + b'"}}}'
+
+
+def encode_razer_mode(on: bool) -> bytes:
+    """
+    Build the datagram that switches a device's streaming mode on or off
+    
+    A device only shows segment frames while streaming mode is on, and
+    ignores ordinary color commands until it is switched off again.
+    """
+    return _razer_datagram(bytearray((0xBB, 0x00, 0x01, RAZER_MODE, int(on))))
+
+
+def encode_segments(rgb: bytes, gradient: bool = False) -> bytes:
+    """
+    Pack per-segment colors into one streaming-mode datagram
+    
+    Args:
+        rgb: Packed r, g, b bytes for each segment, first segment first
+            (e.g. a C-contiguous uint8 [n, 3] array)
+        gradient: Let the device blend between neighbouring segments
+    
+    Returns:
+        Encoded datagram
+    """
+    count = len(rgb) // 3
+    if not 0 < count <= MAX_SEGMENTS or len(rgb) != 3 * count:
+        raise ValueError(f"Segment frames carry 1-{MAX_SEGMENTS} RGB triples, got {len(rgb)} bytes")
+    frame = bytearray((0xBB, 0x00, 3 * count + 2, RAZER_COLORS, int(gradient), count))
+    frame += rgb
+    return _razer_datagram(frame)
+
+
+def encode_command(command: Dict) -> Optional[bytes]:
+    """
+    Translate a cloud-style command into a LAN datagram
+    
+    Args:
+        command: Command dictionary (e.g., {'name': 'turn', 'value': 'on'})
+    
+    Returns:
+        Encoded datagram, or None if the command has no LAN equivalent
+    """
+    name = command.get('name')
+    value = command.get('value')
+    
+    if name == 'turn':
+        msg = {'cmd': 'turn', 'data': {'value': 1 if value == 'on' else 0}}
+    elif name == 'brightness':
+        msg = {'cmd': 'brightness', 'data': {'value': int(value)}}
+    elif name == 'color':
+        msg = {'cmd': 'colorwc', 'data': {'color': value, 'colorTemInKelvin': 0}}
+    elif name == 'colorTem':
+        msg = {'cmd': 'colorwc', 'data': {'color': {'r': 0, 'g': 0, 'b': 0},
+                                          'colorTemInKelvin': int(value)}}
+    else:
+        return None
+    
+    return json.dumps({'msg': msg}, separators=(',', ':')).encode()
+
+
+class LanTransport:
+    """Shared non-blocking UDP socket for all LAN-enabled devices"""
+    
+    def __init__(self, bind_host: str = '', listen_port: int = LISTEN_PORT,
+                 scan_address: Tuple[str, int] = (MULTICAST_GROUP, SCAN_PORT),
+                 rescan_interval: Optional[float] = None):
+        """
+        Initialize LAN transport
+        
+        Args:
+            bind_host: Interface to bind ('' for all)
+            listen_port: Port devices reply to (0 picks a free port)
+            scan_address: Where discovery requests are sent
+            rescan_interval: Scan again in the background when a device is
+                looked up but unknown, at most this often in seconds (None
+                scans only when discover() is called)
+        """
+        self.scan_address = scan_address
+        self.rescan_interval = rescan_interval
+        self.last_scan: Optional[float] = None
+        self._scanning = False
+        self._scan_lock = threading.Lock()
+        self.devices: Dict[str, Dict] = {}
+        self.frames_sent = 0
+        self.send_errors = 0
+        
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        self.sock.bind((bind_host, listen_port))
+        self.sock.setblocking(False)
+        self._recv_lock = threading.Lock()
+    
+    def add_device(self, device_id: str, ip: str, sku: Optional[str] = None,
+                   port: int = CONTROL_PORT):
+        """
+        Register a device reachable over the LAN
+        
+        Args:
+            device_id: Device identifier (same as in the cloud API)
+            ip: Device IP address
+            sku: Device model
+            port: Device control port
+        """
+        self.devices[device_id] = {
+            'device': device_id,
+            'ip': ip,
+            'sku': sku,
+            'address': (ip, port),
+            'streaming': False
+        }
+    
+    def has_device(self, device_id: str) -> bool:
+        """
+        Check whether a device can be controlled over the LAN
+        
+        A miss starts a background scan (see rescan_interval), so devices
+        that power on or answer late are picked up.
+        """
+        if device_id in self.devices:
+            return True
+        if self.rescan_interval is not None:
+            self.discover_async()
+        return False
+    
+    def can_send(self, device_id: str, command: Dict) -> bool:
+        """Check whether a command can go to a device over the LAN"""
+        return self.has_device(device_id) and encode_command(command) is not None
+    
+    def discover_async(self, timeout: float = 1.0):
+        """Scan on a background thread unless a scan is running or ran within rescan_interval"""
+        with self._scan_lock:
+            if self._scanning or (self.last_scan is not None and
+                                  time.monotonic() - self.last_scan < (self.rescan_interval or 0.0)):
+                return
+            self._scanning = True
+        
+        def run():
+            try:
+                self.discover(timeout)
+            finally:
+                with self._scan_lock:
+                    self._scanning = False
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def discover(self, timeout: float = 1.0,
+                 address: Optional[Tuple[str, int]] = None) -> List[Dict]:
+        """
+        Multicast a scan request and collect device replies
+        
+        Args:
+            timeout: Seconds to wait for replies
+            address: Scan address to use instead of the multicast group
+        
+        Returns:
+            List of devices that answered
+        """
+        found = []
+        payload = json.dumps(SCAN_MESSAGE).encode()
+        self.last_scan = time.monotonic()
+        try:
+            self.sock.sendto(payload, address or self.scan_address)
+        except OSError as e:
+            print(f"LAN discovery failed: {e}")
+            return found
+        
+        deadline = time.monotonic() + timeout
+        with self._recv_lock:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    readable, _, _ = select.select([self.sock], [], [], remaining)
+                    if not readable:
+                        continue
+                    data, sender = self.sock.recvfrom(4096)
+                except BlockingIOError:
+                    continue
+                except (OSError, ValueError):
+                    # Socket closed while a background scan was waiting
+                    break
+                
+                device = self._handle_scan_reply(data, sender)
+                if device:
+                    found.append(device)
+        return found
+    
+    def _handle_scan_reply(self, data: bytes, sender: Tuple[str, int]) -> Optional[Dict]:
+        """Register the device described by a scan reply"""
+        try:
+            msg = json.loads(data).get('msg', {})
+        except ValueError:
+            return None
+        if msg.get('cmd') != 'scan':
+            return None
+        
+        info = msg.get('data', {})
+        device_id = info.get('device')
+        if not device_id:
+            return None
+        
+        # Real devices always listen on CONTROL_PORT; local stand-ins report their own
+        port = info.get('port', CONTROL_PORT)
+        self.add_device(device_id, info.get('ip', sender[0]), info.get('sku'), port)
+        return self.devices[device_id]
+    
+    def send(self, device_id: str, command: Dict) -> bool:
+        """
+        Send a single command to a LAN device
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary
+        
+        Returns:
+            True if the datagram was handed to the network
+        """
+        return device_id in self.send_frame({device_id: command})
+    
+    def send_frame(self, commands: Dict[str, Dict]) -> List[str]:
+        """
+        Send one command to each of several devices in a single pass
+        
+        Args:
+            commands: Mapping of device ID to command dictionary
+        
+        Returns:
+            IDs of the devices a datagram was sent to
+        """
+        sent = []
+        for device_id, command in commands.items():
+            device = self.devices.get(device_id)
+            payload = encode_command(command)
+            if device is None or payload is None:
+                continue
+            try:
+                if device['streaming']:
+                    # Whole-device commands are ignored while streaming
+                    self.sock.sendto(encode_razer_mode(False), device['address'])
+                    device['streaming'] = False
+                self.sock.sendto(payload, device['address'])
+                sent.append(device_id)
+            except OSError:
+                self.send_errors += 1
+        if sent:
+            self.frames_sent += 1
+        return sent
+    
+    def send_segments(self, device_id: str, rgb: bytes, gradient: bool = False) -> bool:
+        """
+        Send one frame of per-segment colors to a LAN device
+        
+        Streaming mode is switched on before the first frame.
+        
+        Args:
+            device_id: Device identifier
+            rgb: Packed r, g, b bytes per segment (see encode_segments)
+            gradient: Let the device blend between neighbouring segments
+        
+        Returns:
+            True if the datagram was handed to the network
+        """
+        device = self.devices.get(device_id)
+        if device is None:
+            return False
+        payload = encode_segments(rgb, gradient)
+        try:
+            if not device['streaming']:
+                self.sock.sendto(encode_razer_mode(True), device['address'])
+                device['streaming'] = True
+            self.sock.sendto(payload, device['address'])
+        except OSError:
+            self.send_errors += 1
+            return False
+        self.frames_sent += 1
+        return True
+    
+    def close(self):
+        """Close the socket"""
+        self.sock.close()
+
+
+_lan_transport: Optional[LanTransport] = None
+_lan_lock = threading.Lock()
+
+
+def get_shared_lan_transport(discover: bool = True) -> Optional[LanTransport]:
+    """
+    Get the process-wide LAN transport, creating it on first use
+    
+    Discovery runs on a background thread so callers never wait for it;
+    devices fall back to the cloud until they have answered. Looking up an
+    unknown device scans again, at most every GOVEE_LAN_RESCAN seconds
+    (default 30).
+    
+    Args:
+        discover: Start discovery when the transport is created
+    
+    Returns:
+        Shared LanTransport, or None if the LAN socket could not be opened
+    """
+    global _lan_transport
+    
+    with _lan_lock:
+        if _lan_transport is None:
+            try:
+                _lan_transport = LanTransport(
+                    rescan_interval=float(os.environ.get('GOVEE_LAN_RESCAN', 30.0))
+                )
+            except OSError as e:
+                print(f"LAN control unavailable: {e}")
+                return None
+            if discover:
+                _lan_transport.discover_async()
+        return _lan_transport
+
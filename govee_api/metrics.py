@@ -0,0 +1,233 @@
+"""
+Metrics
+Low-overhead latency histograms and counters exported in Prometheus text format
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Upper bounds in seconds, from 50 us (an FFT) to 5 s (a rate-limited send)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# (metric name, labels, value) reported by a collector at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+enabled = os.environ.get('GOVEE_METRICS', '1') != '0'
+
+
+def set_enabled(on: bool):
+    """Turn recording on or off at runtime (already recorded values are kept)"""
+    global enabled
+    enabled = on
+
+
+def clock() -> int:
+    """
+    Start timing a stage
+    
+    Returns:
+        time.perf_counter_ns(), or 0 when metrics are disabled so the
+        matching observe_since() does nothing
+    """
+    return time.perf_counter_ns() if enabled else 0
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    """Format a label set as {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic count per label set"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels: str, amount: float = 1.0):
+        """Add to the count for a label set"""
+        if not enabled:
+            return
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        """Text-format sample lines"""
+        with self._lock:
+            items = list(self.values.items())
+        return [f'{self.name}{_labels(self.labelnames, labels)} {value:g}' for labels, value in items]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label set -> [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float, *labels: str):
+        """Record one value for a label set"""
+        if not enabled:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += seconds
+            entry[2] += 1
+    
+    def observe_since(self, start_ns: int, *labels: str):
+        """Record the time since a clock() reading (no-op if it was taken disabled)"""
+        if start_ns:
+            self.observe((time.perf_counter_ns() - start_ns) / 1e9, *labels)
+    
+    def render(self) -> List[str]:
+        """Text-format sample lines"""
+        with self._lock:
+            items = [(labels, list(entry[0]), entry[1], entry[2])
+                     for labels, entry in self.values.items()]
+        lines = []
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total:g}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that are asked for gauges at scrape time"""
+    
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: Dict[str, Tuple[Callable[[], Iterable[Sample]], Dict]] = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, cls, name: str, *args, **kwargs):
+        """Get a metric, creating it on first use"""
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+    
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """Get (or create) a counter"""
+        return self._get(Counter, name, help_text, labelnames)
+    
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get (or create) a histogram"""
+        return self._get(Histogram, name, help_text, labelnames, buckets)
+    
+    def register_collector(self, key: str, collect: Callable[[], Iterable[Sample]],
+                           families: Dict[str, Tuple[str, str]]):
+        """
+        Add a function polled on every scrape
+        
+        Suits values that already exist elsewhere (queue depths, running
+        counts), which then cost nothing between scrapes.
+        
+        Args:
+            key: Name to replace or remove the collector by
+            collect: Function returning (metric name, labels, value) samples
+            families: {metric name: (type, help)} for the samples it returns
+        """
+        with self._lock:
+            self.collectors[key] = (collect, families)
+    
+    def unregister_collector(self, key: str):
+        """Remove a collector"""
+        with self._lock:
+            self.collectors.pop(key, None)
+    
+    def render(self) -> str:
+        """
+        Render every metric and collector in Prometheus text format
+        
+        Returns:
+            Exposition text (version 0.0.4)
+        """
+        with self._lock:
+            metrics = list(self.metrics.values())
+            collectors = list(self.collectors.items())
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines += metric.render()
+        
+        for key, (collect, families) in collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"Error collecting metrics from '{key}': {e}")
+                continue
+            by_name: Dict[str, List[str]] = {}
+            for name, labels, value in samples:
+                by_name.setdefault(name, []).append(
+                    f'{name}{_labels(labels.keys(), labels.values())} {value:g}'
+                )
+            for name, sample_lines in by_name.items():
+                kind, help_text = families.get(name, ('gauge', name))
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines += sample_lines
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Audio-reactive chain: read -> fft -> color -> queue (coalescer) -> send (HTTP/LAN)
+STAGE_SECONDS = REGISTRY.histogram(
+    'govee_stage_seconds', 'Time spent in each stage of the light pipeline', ('stage',)
+)
+FRAMES = REGISTRY.counter(
+    'govee_frames_total', 'Frames produced by each render loop', ('loop',)
+)
+DEVICE_SEND_SECONDS = REGISTRY.histogram(
+    'govee_device_send_seconds', 'Time from sending a command to its acknowledgement',
+    ('device', 'transport')
+)
+DEVICE_SENDS = REGISTRY.counter(
+    'govee_device_sends_total', 'Commands sent to each device by outcome', ('device', 'result')
+)
+DEVICE_RETRIES = REGISTRY.counter(
+    'govee_device_retries_total', 'Extra cloud sends per device: retries after errors or 429s, and hedges',
+    ('device', 'reason')
+)
+
+
+def render() -> str:
+    """Render the shared registry in Prometheus text format"""
+    return REGISTRY.render()
@@ -0,0 +1,120 @@
+"""
+Mock Govee LAN Device
+UDP stand-in for a LAN-enabled Govee device, used for offline development and tests
+"""
+import base64
+import json
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class MockLanDevice:
+    """Answers scan requests and records control datagrams like a real device"""
+    
+    def __init__(self, device_id: str, sku: str = 'H619A', host: str = '127.0.0.1',
+                 port: int = 0):
+        """
+        Initialize mock device
+        
+        Args:
+            device_id: Device identifier to report
+            sku: Model to report
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+        """
+        self.device_id = device_id
+        self.sku = sku
+        self.state = {'onOff': 0, 'brightness': 100,
+                      'color': {'r': 255, 'g': 255, 'b': 255}, 'colorTemInKelvin': 0}
+        # Streaming mode and the last segment frame shown in it
+        self.streaming = False
+        self.segments: List[Tuple[int, int, int]] = []
+        self.bad_frames = 0
+        self.received: List[Tuple[float, Dict]] = []
+        
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.2)
+        self.is_running = False
+        self.thread: Optional[threading.Thread] = None
+    
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Address the device listens on for scans and commands"""
+        return self.sock.getsockname()
+    
+    def start(self) -> 'MockLanDevice':
+        """Start answering datagrams on a background thread"""
+        self.is_running = True
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        """Stop the device and close its socket"""
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.sock.close()
+    
+    def _serve(self):
+        """Receive loop"""
+        while self.is_running:
+            try:
+                data, sender = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            
+            msg = json.loads(data).get('msg', {})
+            self._handle(msg, sender)
+    
+    def _handle(self, msg: Dict, sender: Tuple[str, int]):
+        """Apply one LAN message"""
+        cmd = msg.get('cmd')
+        data = msg.get('data', {})
+        
+        if cmd == 'scan':
+            ip, port = self.address
+            reply = {'msg': {'cmd': 'scan', 'data': {
+                'ip': ip, 'port': port, 'device': self.device_id, 'sku': self.sku
+            }}}
+            self.sock.sendto(json.dumps(reply).encode(), sender)
+            return
+        if cmd == 'devStatus':
+            reply = {'msg': {'cmd': 'devStatus', 'data': self.state}}
+            self.sock.sendto(json.dumps(reply).encode(), sender)
+            return
+        
+        self.received.append((time.perf_counter(), msg))
+        if cmd == 'turn':
+            self.state['onOff'] = data.get('value', 0)
+        elif cmd == 'brightness':
+            self.state['brightness'] = data.get('value')
+        elif cmd == 'colorwc' and not self.streaming:
+            self.state['color'] = data.get('color')
+            self.state['colorTemInKelvin'] = data.get('colorTemInKelvin', 0)
+        elif cmd == 'razer':
+            self._handle_razer(base64.b64decode(data.get('pt', '')))
+    
+    def _handle_razer(self, frame: bytes):
+        """Apply a streaming-mode binary frame, dropping malformed ones like a device would"""
+        checksum = 0
+        for byte in frame[:-1]:
+            checksum ^= byte
+        if len(frame) < 6 or frame[0] != 0xBB or frame[-1] != checksum:
+            self.bad_frames += 1
+            return
+        
+        if frame[3] == 0xB1:
+            self.streaming = bool(frame[4])
+        elif frame[3] == 0xB0 and self.streaming:
+            count = frame[5]
+            if frame[2] != 3 * count + 2 or len(frame) != 3 * count + 7:
+                self.bad_frames += 1
+                return
+            rgb = frame[6:-1]
+            self.segments = [tuple(rgb[i:i + 3]) for i in range(0, len(rgb), 3)]
@@ -0,0 +1,268 @@
+"""
+Mock Govee Server
+Local stand-in for the Govee cloud API, used for offline development and benchmarks
+
+Run standalone with:
+    python -m govee_api.mock_server --port 8081 --devices 4
+
+then point the client at it with GOVEE_API_BASE_URL=http://127.0.0.1:8081/v1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def make_devices(count: int, model: str = 'H6159') -> List[Dict]:
+    """
+    Build a list of fake device descriptions
+    
+    Args:
+        count: Number of devices
+        model: Model name to report for each device
+    
+    Returns:
+        List of device dictionaries in Govee's /devices format
+    """
+    return [{
+        'device': f'AA:BB:CC:DD:EE:FF:00:{i:02X}',
+        'model': model,
+        'deviceName': f'Mock Strip {i + 1}',
+        'controllable': True,
+        'retrievable': True,
+        'supportCmds': ['turn', 'brightness', 'color', 'colorTem'],
+        'properties': {'colorTem': {'range': {'min': 2000, 'max': 9000}}}
+    } for i in range(count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler implementing the subset of the API the client uses"""
+    
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: 'MockGoveeServer'
+    
+    def log_message(self, format, *args):
+        """Silence per-request logging"""
+        pass
+    
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        """Write a JSON response with keep-alive friendly headers"""
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _read_json(self) -> Dict:
+        """Read the JSON request body"""
+        length = int(self.headers.get('Content-Length', 0))
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+    
+    def do_GET(self):
+        """Handle device listing and state queries"""
+        self.server.simulate_latency()
+        url = urlparse(self.path)
+        
+        if url.path == '/v1/devices':
+            self._send_json(200, {
+                'code': 200,
+                'message': 'Success',
+                'data': {'devices': self.server.devices}
+            })
+        elif url.path == '/v1/devices/state':
+            device_id = parse_qs(url.query).get('device', [''])[0]
+            state = self.server.states.get(device_id)
+            if state is None:
+                self._send_json(400, {'code': 400, 'message': 'Device Not Found'})
+                return
+            properties = [{'online': True}] + [{k: v} for k, v in state.items()]
+            self._send_json(200, {
+                'code': 200,
+                'message': 'Success',
+                'data': {
+                    'device': device_id,
+                    'model': self.server.models[device_id],
+                    'properties': properties
+                }
+            })
+        else:
+            self._send_json(404, {'code': 404, 'message': 'Not Found'})
+    
+    def do_PUT(self):
+        """Handle device control commands"""
+        self.server.simulate_latency()
+        url = urlparse(self.path)
+        
+        if url.path != '/v1/devices/control':
+            self._send_json(404, {'code': 404, 'message': 'Not Found'})
+            return
+        
+        body = self._read_json()
+        device_id = body.get('device')
+        cmd = body.get('cmd', {})
+        if device_id not in self.server.states:
+            self._send_json(400, {'code': 400, 'message': 'Device Not Found'})
+            return
+        
+        fault = self.server.inject_fault(device_id)
+        if fault:
+            status, message, headers = fault
+            self._send_json(status, {'code': status, 'message': message}, headers)
+            return
+        
+        self.server.apply_command(device_id, cmd)
+        self._send_json(200, {'code': 200, 'message': 'Success', 'data': {}})
+
+
+class MockGoveeServer(ThreadingHTTPServer):
+    """Threaded HTTP server emulating the Govee cloud API"""
+    
+    daemon_threads = True
+    request_queue_size = 128
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 devices: Optional[List[Dict]] = None, latency: float = 0.0,
+                 error_rate: float = 0.0, offline: Optional[List[str]] = None,
+                 offline_delay: float = 1.0, rate_limit_every: int = 0,
+                 retry_after: float = 1.0):
+        """
+        Initialize mock server
+        
+        Control commands can be made to fail on purpose (see inject_fault);
+        the fault settings are attributes and may be changed while serving.
+        
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            devices: Device descriptions to serve (defaults to two strips)
+            latency: Artificial delay added to every response, in seconds
+            error_rate: Share of control commands answered with a 500
+            offline: Device IDs whose control commands time out: answered
+                with a 503 after offline_delay seconds
+            offline_delay: Seconds an offline device's commands hang
+            rate_limit_every: Answer every Nth control command with a 429
+                (0 disables)
+            retry_after: Retry-After seconds sent with each 429
+        """
+        super().__init__((host, port), _Handler)
+        self.devices = devices if devices is not None else make_devices(2)
+        self.models = {d['device']: d['model'] for d in self.devices}
+        self.states = {
+            d['device']: {'powerState': 'off', 'brightness': 100,
+                          'color': {'r': 255, 'g': 255, 'b': 255}}
+            for d in self.devices
+        }
+        self.latency = latency
+        self.error_rate = error_rate
+        self.offline = set(offline or ())
+        self.offline_delay = offline_delay
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.command_count = 0
+        self.requests = 0
+        self.faults: Dict[str, int] = {'error': 0, 'offline': 0, 'rate_limited': 0}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        """Base URL to hand to GoveeAPIClient"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+    
+    def simulate_latency(self):
+        """Sleep for the configured artificial latency"""
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def inject_fault(self, device_id: str) -> Optional[Tuple[int, str, Dict]]:
+        """
+        Decide whether a control command should fail
+        
+        Args:
+            device_id: Device the command targets
+        
+        Returns:
+            (status, message, headers) for a failure response, or None to
+            apply the command
+        """
+        with self._lock:
+            self.requests += 1
+            limited = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+        
+        if device_id in self.offline:
+            time.sleep(self.offline_delay)
+            fault = (503, 'Device Offline', {})
+            kind = 'offline'
+        elif limited:
+            fault = (429, 'Too Many Requests', {'Retry-After': f'{self.retry_after:g}'})
+            kind = 'rate_limited'
+        elif self.error_rate and random.random() < self.error_rate:
+            fault = (500, 'Internal Server Error', {})
+            kind = 'error'
+        else:
+            return None
+        
+        with self._lock:
+            self.faults[kind] += 1
+        return fault
+    
+    def apply_command(self, device_id: str, cmd: Dict):
+        """
+        Update stored device state from a control command
+        
+        Args:
+            device_id: Device identifier
+            cmd: Command dictionary ({'name': ..., 'value': ...})
+        """
+        names = {'turn': 'powerState', 'brightness': 'brightness', 'color': 'color'}
+        with self._lock:
+            self.command_count += 1
+            name = names.get(cmd.get('name'))
+            if name:
+                self.states[device_id][name] = cmd.get('value')
+    
+    def start(self) -> 'MockGoveeServer':
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Shut down the server"""
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a mock Govee cloud API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--devices', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of control commands answered with a 500')
+    parser.add_argument('--offline', type=int, default=0,
+                        help='number of devices (from the last) whose commands time out')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='answer every Nth control command with a 429')
+    args = parser.parse_args()
+    
+    devices = make_devices(args.devices)
+    offline = [d['device'] for d in devices[len(devices) - args.offline:]] if args.offline else []
+    server = MockGoveeServer(args.host, args.port, devices, args.latency, args.error_rate,
+                             offline, rate_limit_every=args.rate_limit_every)
+    print(f'Mock Govee API listening on {server.url}')
+    server.serve_forever()
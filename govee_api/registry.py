@@ -0,0 +1,261 @@
+"""
+Device Registry
+Cached device list with a capability index, TTL refresh and an on-disk snapshot
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from govee_api.client import GoveeAPIClient
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.expanduser('~'), '.govee_lights', 'devices.json')
+
+# Seconds between refresh attempts while the API keeps returning no devices
+RETRY_INTERVAL = 30.0
+
+# Cloud command names mapped to the capability they advertise
+COMMAND_CAPABILITIES = {
+    'turn': 'power',
+    'brightness': 'brightness',
+    'color': 'color',
+    'colorTem': 'color_temperature',
+    'segmentedColorRgb': 'segment',
+    'segmentedBrightness': 'segment'
+}
+
+
+def describe_device(device: Dict) -> Dict:
+    """
+    Normalize a device entry from the Govee API
+    
+    Args:
+        device: Device dictionary as returned by GET /devices
+    
+    Returns:
+        Device description with a flat capability list
+    """
+    properties = device.get('properties', {})
+    capabilities = sorted({
+        COMMAND_CAPABILITIES[cmd]
+        for cmd in device.get('supportCmds', [])
+        if cmd in COMMAND_CAPABILITIES
+    })
+    led_count = properties.get('ledCount') or properties.get('segmentCount')
+    
+    return {
+        'id': device['device'],
+        'name': device.get('deviceName', device['device']),
+        'model': device.get('model'),
+        'type': device.get('model'),
+        'controllable': device.get('controllable', True),
+        'retrievable': device.get('retrievable', True),
+        'capabilities': capabilities,
+        'led_count': led_count
+    }
+
+
+class DeviceRegistry:
+    """In-memory device cache that network I/O never blocks readers on"""
+    
+    def __init__(self, client: Optional[GoveeAPIClient] = None, ttl: float = 300.0,
+                 snapshot_path: Optional[str] = None):
+        """
+        Initialize device registry
+        
+        Args:
+            client: Client used to list devices
+            ttl: Seconds before the cached list is considered stale
+            snapshot_path: JSON file for warm starts (or set GOVEE_REGISTRY_SNAPSHOT)
+        """
+        self.client = client or GoveeAPIClient()
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path or os.environ.get(
+            'GOVEE_REGISTRY_SNAPSHOT', DEFAULT_SNAPSHOT_PATH
+        )
+        self.devices: Dict[str, Dict] = {}
+        self.index: Dict[str, Set[str]] = {}
+        self.etag = ''
+        self.updated = 0.0
+        self.attempted = 0.0
+        self.is_running = False
+        self.thread = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        
+        self._load_snapshot()
+    
+    def _set_devices(self, devices: List[Dict], updated: float):
+        """Replace the cache and rebuild the capability index"""
+        by_id = {device['id']: device for device in devices}
+        index: Dict[str, Set[str]] = {}
+        for device in devices:
+            for capability in device['capabilities']:
+                index.setdefault(capability, set()).add(device['id'])
+            if device['led_count']:
+                index.setdefault('led_count', set()).add(device['id'])
+        
+        body = json.dumps(devices, sort_keys=True).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        
+        with self._lock:
+            self.devices = by_id
+            self.index = index
+            self.etag = etag
+            self.updated = updated
+    
+    def _load_snapshot(self):
+        """Warm-start the cache from the last saved snapshot"""
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._set_devices(snapshot.get('devices', []), snapshot.get('updated', 0.0))
+    
+    def _save_snapshot(self):
+        """Write the cache to disk"""
+        with self._lock:
+            snapshot = {'updated': self.updated, 'devices': list(self.devices.values())}
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Error saving device snapshot: {e}")
+    
+    def refresh(self) -> bool:
+        """
+        Reload the device list from the API
+        
+        Returns:
+            True if the cache was updated
+        """
+        self.attempted = time.time()
+        devices = self.client.get_devices()
+        if not devices:
+            # Keep serving the old list rather than wiping it on an API error
+            return False
+        
+        self._set_devices([describe_device(d) for d in devices], time.time())
+        self._save_snapshot()
+        return True
+    
+    def _refresh_async(self):
+        """Refresh on a background thread unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def is_stale(self) -> bool:
+        """Check whether the cached list is older than the TTL"""
+        return time.time() - self.updated > self.ttl
+    
+    def get_all(self) -> List[Dict]:
+        """
+        Get all known devices
+        
+        Serves from memory; a stale cache is refreshed in the background.
+        Only the first call on a cold registry with no snapshot waits for the
+        API. While the API returns nothing (no devices, bad key, outage), an
+        empty or stale list is served and retried every RETRY_INTERVAL.
+        
+        Returns:
+            List of device descriptions
+        """
+        if not self.attempted and not self.devices:
+            self.refresh()
+        elif self.is_stale() and time.time() - self.attempted > RETRY_INTERVAL:
+            self._refresh_async()
+        return list(self.devices.values())
+    
+    def get(self, device_id: str) -> Optional[Dict]:
+        """
+        Get one device
+        
+        Args:
+            device_id: Device identifier
+        
+        Returns:
+            Device description, or None if unknown
+        """
+        return self.devices.get(device_id)
+    
+    def find(self, capability: str) -> List[str]:
+        """
+        Get IDs of devices that support a capability
+        
+        Args:
+            capability: Capability name (e.g., 'color', 'segment', 'led_count')
+        
+        Returns:
+            List of device IDs
+        """
+        return sorted(self.index.get(capability, ()))
+    
+    def supports(self, device_id: str, capability: str) -> bool:
+        """Check whether a device supports a capability"""
+        return device_id in self.index.get(capability, ())
+    
+    def led_count(self, device_id: str) -> Optional[int]:
+        """Get a device's LED count, if the API reports one"""
+        device = self.devices.get(device_id)
+        return device['led_count'] if device else None
+    
+    def start(self):
+        """Start periodic background refresh"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        self.thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop periodic refresh"""
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+    
+    def _refresh_loop(self):
+        """Refresh whenever the cache goes stale, backing off after failures"""
+        while self.is_running:
+            delay = 1.0
+            if self.is_stale():
+                try:
+                    refreshed = self.refresh()
+                except Exception as e:
+                    print(f"Error refreshing device registry: {e}")
+                    refreshed = False
+                if not refreshed:
+                    delay = 30.0
+            time.sleep(min(delay, self.ttl))
+
+
+_registry: Optional[DeviceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_shared_registry() -> DeviceRegistry:
+    """Get (and lazily start) the process-wide device registry"""
+    global _registry
+    
+    with _registry_lock:
+        if _registry is None:
+            _registry = DeviceRegistry()
+            _registry.start()
+        return _registry
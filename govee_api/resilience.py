@@ -0,0 +1,218 @@
+"""
+Send Resilience
+Jittered retries, per-device circuit breakers and rate-limit header parsing for device commands
+"""
+import email.utils
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+# Control commands set absolute state, so sending one twice is harmless
+IDEMPOTENT_COMMANDS = {'turn', 'brightness', 'color', 'colorTem'}
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+    
+    def __init__(self, attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0):
+        """
+        Initialize retry policy
+        
+        Args:
+            attempts: Most times a command is sent, including the first
+            base_delay: Backoff ceiling before the first retry, in seconds
+            max_delay: Largest backoff ceiling, in seconds
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay(self, retry: int) -> float:
+        """
+        Get how long to wait before a retry
+        
+        Full jitter spreads retries from many devices over the whole window
+        instead of letting them arrive together.
+        
+        Args:
+            retry: Retry number, starting at 0
+        
+        Returns:
+            Seconds to wait, uniform in [0, min(max_delay, base_delay * 2**retry)]
+        """
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+
+class CircuitBreaker:
+    """
+    Stops sending to a device that keeps failing
+    
+    After `failure_threshold` consecutive failures the breaker opens and
+    sends fail at once. After `reset_timeout` seconds one trial send is let
+    through (half-open); its success closes the breaker, its failure opens
+    it again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        """
+        Initialize circuit breaker
+        
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial send
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """
+        Check whether a send may go out now
+        
+        Returns:
+            True while closed, and for the single trial send once the open
+            period has passed
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+    
+    def record(self, ok: bool):
+        """
+        Record the outcome of a send that allow() let through
+        
+        Args:
+            ok: Whether the device accepted the command
+        """
+        with self._lock:
+            if ok:
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial = False
+    
+    def abandon(self):
+        """Let another trial through after one that ended without saying anything about the device"""
+        with self._lock:
+            self._trial = False
+
+
+class BreakerBoard:
+    """Circuit breakers per device, created on first use"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        """
+        Initialize breaker board
+        
+        Args:
+            failure_threshold: Consecutive failures that open a device's breaker
+            reset_timeout: Seconds a breaker stays open before a trial send
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, device_id: str) -> CircuitBreaker:
+        """Get a device's breaker"""
+        breaker = self.breakers.get(device_id)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.setdefault(
+                    device_id, CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+        return breaker
+    
+    def is_open(self, device_id: str) -> bool:
+        """Check whether sends to a device are currently being refused"""
+        breaker = self.breakers.get(device_id)
+        return bool(breaker) and breaker.state == OPEN and \
+            time.monotonic() - breaker.opened_at < breaker.reset_timeout
+    
+    def states(self) -> Dict[str, str]:
+        """Get every device's breaker state"""
+        return {device_id: breaker.state for device_id, breaker in list(self.breakers.items())}
+
+
+def is_retryable(response: Optional[httpx.Response]) -> bool:
+    """
+    Check whether a failed send is worth repeating
+    
+    Args:
+        response: Response, or None if the request never got one
+            (connection error or timeout)
+    
+    Returns:
+        True for no response, 429 and 5xx
+    """
+    return response is None or response.status_code == 429 or response.status_code >= 500
+
+
+def account_exhausted(response: httpx.Response) -> bool:
+    """Check whether a rate-limited response is about the whole account rather than one device"""
+    return response.headers.get('X-RateLimit-Remaining') == '0'
+
+
+def retry_after(response: httpx.Response, now: Optional[float] = None) -> Optional[float]:
+    """
+    Read how long the API asks callers to wait after a rate-limited response
+    
+    Uses Retry-After (seconds or an HTTP date), else the reset time
+    (Unix seconds) of whichever of Govee's per-account (X-RateLimit-*) or
+    per-minute (API-RateLimit-*) limits is exhausted.
+    
+    Args:
+        response: HTTP response
+        now: Current Unix time (defaults to time.time())
+    
+    Returns:
+        Seconds to wait, or None if the response gives no hint
+    """
+    if now is None:
+        now = time.time()
+    headers = response.headers
+    
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            pass
+    
+    for prefix in ('X-RateLimit', 'API-RateLimit'):
+        if headers.get(f'{prefix}-Remaining') == '0' and headers.get(f'{prefix}-Reset'):
+            try:
+                return max(0.0, float(headers[f'{prefix}-Reset']) - now)
+            except ValueError:
+                continue
+    return None
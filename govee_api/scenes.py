@@ -0,0 +1,149 @@
+"""
+Scene Store
+Named multi-device scenes saved to disk and pre-compiled into send-ready commands
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from govee_api.client import GoveeAPIClient
+from govee_api.registry import DeviceRegistry, get_shared_registry
+
+DEFAULT_SCENES_PATH = os.path.join(os.path.expanduser('~'), '.govee_lights', 'scenes.json')
+
+# (device_id, command, cloud request body or None)
+CompiledCommand = Tuple[str, Dict, Optional[Dict]]
+
+
+class SceneStore:
+    """Scenes kept as validated device commands plus their compiled payloads"""
+    
+    def __init__(self, client: Optional[GoveeAPIClient] = None,
+                 registry: Optional[DeviceRegistry] = None, path: Optional[str] = None):
+        """
+        Initialize scene store
+        
+        Args:
+            client: Client that builds request bodies
+            registry: Registry supplying device models (defaults to the shared one)
+            path: JSON file scenes are saved to (or set GOVEE_SCENES)
+        """
+        self.registry = registry or get_shared_registry()
+        self.client = client or self.registry.client
+        self.path = path or os.environ.get('GOVEE_SCENES', DEFAULT_SCENES_PATH)
+        self.scenes: Dict[str, List[Dict]] = {}
+        self._compiled: Dict[str, List[CompiledCommand]] = {}
+        self._lock = threading.Lock()
+        
+        self._load()
+    
+    def _load(self):
+        """Read saved scenes"""
+        try:
+            with open(self.path) as f:
+                self.scenes = json.load(f).get('scenes', {})
+        except (OSError, ValueError):
+            return
+    
+    def _save(self):
+        """Write scenes to disk"""
+        with self._lock:
+            body = {'scenes': dict(self.scenes)}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(body, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving scenes: {e}")
+    
+    def _compile(self, commands: List[Dict]) -> List[CompiledCommand]:
+        """Build request bodies for a scene's commands"""
+        compiled = []
+        for entry in commands:
+            device = self.registry.get(entry['device_id'])
+            model = device['model'] if device else None
+            payload = self.client.compile_command(entry['device_id'], entry['command'], model)
+            compiled.append((entry['device_id'], entry['command'], payload))
+        return compiled
+    
+    def save(self, name: str, commands: List[Tuple[str, Dict]]):
+        """
+        Store a scene, replacing any scene with the same name
+        
+        Args:
+            name: Scene name
+            commands: Validated (device_id, command) pairs, in send order
+        """
+        entries = [{'device_id': device_id, 'command': command} for device_id, command in commands]
+        compiled = self._compile(entries)
+        with self._lock:
+            self.scenes[name] = entries
+            self._compiled[name] = compiled
+        self._save()
+    
+    def delete(self, name: str) -> bool:
+        """
+        Remove a scene
+        
+        Returns:
+            True if the scene existed
+        """
+        with self._lock:
+            existed = self.scenes.pop(name, None) is not None
+            self._compiled.pop(name, None)
+        if existed:
+            self._save()
+        return existed
+    
+    def get(self, name: str) -> Optional[List[Dict]]:
+        """Get a scene's commands as [{'device_id', 'command'}]"""
+        with self._lock:
+            return self.scenes.get(name)
+    
+    def names(self) -> List[str]:
+        """Get the names of all scenes"""
+        with self._lock:
+            return sorted(self.scenes)
+    
+    def compiled(self, name: str) -> Optional[List[CompiledCommand]]:
+        """
+        Get a scene ready to hand to GoveeAPIClient.send_batch
+        
+        Compiled once and cached; entries whose model was unknown at compile
+        time are retried on each call until the registry knows the device.
+        
+        Args:
+            name: Scene name
+        
+        Returns:
+            List of (device_id, command, payload), or None if no such scene
+        """
+        with self._lock:
+            entries = self.scenes.get(name)
+            compiled = self._compiled.get(name)
+        if entries is None:
+            return None
+        
+        if compiled is None or any(payload is None for _, _, payload in compiled):
+            compiled = self._compile(entries)
+            with self._lock:
+                if self.scenes.get(name) is entries:
+                    self._compiled[name] = compiled
+        return compiled
+
+
+_store: Optional[SceneStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_scene_store() -> SceneStore:
+    """Get the process-wide scene store"""
+    global _store
+    
+    with _store_lock:
+        if _store is None:
+            _store = SceneStore()
+        return _store
@@ -0,0 +1,357 @@
+"""
+Device Shadow
+Last known and desired power, brightness and color per device, optionally persisted to SQLite
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from govee_api.registry import DeviceRegistry, get_shared_registry
+
+ATTRIBUTES = ('power', 'brightness', 'color')
+
+
+def command_state(command: Dict) -> Optional[Tuple[str, Any]]:
+    """
+    Get the shadow attribute and value a command sets
+    
+    Args:
+        command: Command dictionary (e.g., {'name': 'turn', 'value': 'on'})
+    
+    Returns:
+        Tuple of (attribute, value), or None for commands the shadow does
+        not track
+    """
+    name, value = command.get('name'), command.get('value')
+    if name == 'turn':
+        return 'power', value
+    if name == 'brightness':
+        return 'brightness', int(value)
+    if name == 'color':
+        return 'color', [int(value['r']), int(value['g']), int(value['b'])]
+    return None
+
+
+def state_command(attribute: str, value: Any) -> Dict:
+    """Build the command that sets an attribute to a value (inverse of command_state)"""
+    if attribute == 'power':
+        return {'name': 'turn', 'value': value}
+    if attribute == 'brightness':
+        return {'name': 'brightness', 'value': value}
+    r, g, b = value
+    return {'name': 'color', 'value': {'r': r, 'g': g, 'b': b}}
+
+
+def parse_properties(properties: List[Dict]) -> Dict[str, Any]:
+    """
+    Read shadow attributes from a GET /devices/state response
+    
+    Args:
+        properties: The response's data['properties'] list
+    
+    Returns:
+        Attributes the device reported
+    """
+    state = {}
+    for prop in properties:
+        if 'powerState' in prop:
+            state['power'] = prop['powerState']
+        elif 'brightness' in prop:
+            state['brightness'] = int(prop['brightness'])
+        elif 'color' in prop:
+            color = prop['color']
+            state['color'] = [int(color['r']), int(color['g']), int(color['b'])]
+    return state
+
+
+class DeviceShadow:
+    """
+    What each device is showing (reported) and has been asked to show (desired)
+    
+    Reported state comes from acknowledged commands and from periodic
+    reconciliation against the API, so it survives without a round-trip per
+    read. Desired state is what has been queued but not yet acknowledged.
+    """
+    
+    def __init__(self, path: Optional[str] = None, registry: Optional[DeviceRegistry] = None,
+                 interval: float = 60.0):
+        """
+        Initialize device shadow
+        
+        Args:
+            path: SQLite file reported state is kept in across restarts (or
+                set GOVEE_SHADOW_DB; memory only when neither is given)
+            registry: Registry listing the devices to reconcile (defaults to
+                the shared one when reconciliation starts)
+            interval: Seconds between reconciliation passes; devices updated
+                more recently than this are not polled
+        """
+        self.path = path or os.environ.get('GOVEE_SHADOW_DB')
+        self.registry = registry
+        self.interval = interval
+        self.reported: Dict[str, Dict[str, Any]] = {}
+        self.desired: Dict[str, Dict[str, Any]] = {}
+        self.updated: Dict[str, float] = {}
+        # Bumped on every change so readers can cheaply tell the shadow moved
+        self.version = 0
+        self.is_running = False
+        self.thread = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._db: Optional[sqlite3.Connection] = None
+        
+        if self.path:
+            self._open()
+    
+    def _open(self):
+        """Open the SQLite file and load reported state"""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS shadow '
+                '(device_id TEXT PRIMARY KEY, reported TEXT NOT NULL, updated REAL NOT NULL)'
+            )
+            rows = self._db.execute('SELECT device_id, reported, updated FROM shadow').fetchall()
+        except sqlite3.Error as e:
+            print(f"Error opening device shadow database: {e}")
+            self._db = None
+            return
+        for device_id, reported, updated in rows:
+            self.reported[device_id] = json.loads(reported)
+            self.updated[device_id] = updated
+    
+    def save(self) -> int:
+        """
+        Write changed devices' reported state to SQLite
+        
+        Returns:
+            Number of devices written
+        """
+        with self._lock:
+            if self._db is None or not self._dirty:
+                return 0
+            rows = [
+                (device_id, json.dumps(self.reported.get(device_id, {})),
+                 self.updated.get(device_id, 0.0))
+                for device_id in self._dirty
+            ]
+            self._dirty.clear()
+            try:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO shadow (device_id, reported, updated) VALUES (?, ?, ?)',
+                    rows
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error saving device shadow: {e}")
+                return 0
+        return len(rows)
+    
+    def desire(self, device_id: str, command: Dict):
+        """
+        Record a command that has been queued for a device
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary
+        """
+        state = command_state(command)
+        if state is None:
+            return
+        attribute, value = state
+        with self._lock:
+            self.desired.setdefault(device_id, {})[attribute] = value
+            self.version += 1
+    
+    def acknowledge(self, device_id: str, command: Dict):
+        """
+        Record a command the device accepted
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary
+        """
+        state = command_state(command)
+        if state is None:
+            if command.get('name') == 'colorTem':
+                # The device left RGB mode; its color is no longer known
+                self.report(device_id, {'color': None})
+            return
+        self.report(device_id, dict([state]))
+    
+    def discard(self, device_id: str, command: Dict):
+        """
+        Drop a desired value whose command failed
+        
+        Args:
+            device_id: Device identifier
+            command: Command dictionary that was not accepted
+        """
+        state = command_state(command)
+        if state is None:
+            return
+        attribute, value = state
+        with self._lock:
+            desired = self.desired.get(device_id, {})
+            if desired.get(attribute) == value:
+                del desired[attribute]
+                self.version += 1
+    
+    def report(self, device_id: str, state: Dict[str, Any]):
+        """
+        Set reported attributes (from an acknowledgement or a state query)
+        
+        Desired values the device now shows are no longer pending.
+        
+        Args:
+            device_id: Device identifier
+            state: Attributes and values the device is known to have
+        """
+        with self._lock:
+            reported = self.reported.setdefault(device_id, {})
+            reported.update(state)
+            desired = self.desired.get(device_id)
+            if desired:
+                for attribute, value in state.items():
+                    if desired.get(attribute) == value:
+                        del desired[attribute]
+            self.updated[device_id] = time.time()
+            self._dirty.add(device_id)
+            self.version += 1
+    
+    def forget(self, device_id: Optional[str] = None):
+        """
+        Drop reported state so it is treated as unknown
+        
+        Args:
+            device_id: Device to forget (None for all devices)
+        """
+        with self._lock:
+            devices = list(self.reported) if device_id is None else [device_id]
+            for device in devices:
+                if self.reported.pop(device, None) is not None:
+                    self.updated[device] = 0.0
+                    self._dirty.add(device)
+            self.version += 1
+    
+    def command(self, device_id: str, attribute: str) -> Optional[Dict]:
+        """
+        Get the command that reproduces a device's reported attribute
+        
+        Args:
+            device_id: Device identifier
+            attribute: 'power', 'brightness' or 'color'
+        
+        Returns:
+            Command dictionary, or None if the attribute is unknown
+        """
+        with self._lock:
+            value = self.reported.get(device_id, {}).get(attribute)
+        return None if value is None else state_command(attribute, value)
+    
+    def get(self, device_id: str) -> Dict[str, Any]:
+        """
+        Get a device's shadow
+        
+        Returns:
+            {'reported': {...}, 'desired': {...}, 'updated': unix time or None}
+            with desired holding only values not yet reported
+        """
+        with self._lock:
+            return {
+                'reported': dict(self.reported.get(device_id, {})),
+                'desired': dict(self.desired.get(device_id, {})),
+                'updated': self.updated.get(device_id) or None
+            }
+    
+    def state(self, device_id: str) -> Dict[str, Any]:
+        """
+        Get the newest state of a device for display
+        
+        Returns:
+            'power', 'brightness' and 'color', preferring pending desired
+            values over reported ones (None where unknown)
+        """
+        with self._lock:
+            state = dict.fromkeys(ATTRIBUTES)
+            state.update(self.reported.get(device_id, {}))
+            state.update(self.desired.get(device_id, {}))
+        return state
+    
+    def reconcile(self, device_ids: Optional[List[str]] = None) -> int:
+        """
+        Refresh reported state from the API
+        
+        Args:
+            device_ids: Devices to query (default: retrievable devices not
+                updated within the last interval)
+        
+        Returns:
+            Number of devices refreshed
+        """
+        registry = self.registry or get_shared_registry()
+        if device_ids is None:
+            # May refresh from the cloud; readers must not wait on that
+            devices = [device['id'] for device in registry.get_all()
+                       if device.get('retrievable', True)]
+            cutoff = time.time() - self.interval
+            with self._lock:
+                device_ids = [device_id for device_id in devices
+                              if self.updated.get(device_id, 0.0) < cutoff]
+        
+        refreshed = 0
+        for device_id in device_ids:
+            info = registry.client.get_device_info(device_id)
+            state = parse_properties(info.get('properties', []))
+            if state:
+                self.report(device_id, state)
+                refreshed += 1
+        return refreshed
+    
+    def start(self):
+        """Start reconciling (and saving) in the background"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._reconcile_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop reconciling and save what changed"""
+        self.is_running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.save()
+    
+    def _reconcile_loop(self):
+        """Reconcile and save every interval"""
+        while self.is_running:
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Error reconciling device shadow: {e}")
+            self.save()
+            self._stop.wait(self.interval)
+
+
+_shadow: Optional[DeviceShadow] = None
+_shadow_lock = threading.Lock()
+
+
+def get_shared_shadow() -> DeviceShadow:
+    """Get (and lazily start) the process-wide device shadow"""
+    global _shadow
+    
+    with _shadow_lock:
+        if _shadow is None:
+            _shadow = DeviceShadow()
+            _shadow.start()
+        return _shadow
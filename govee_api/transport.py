@@ -0,0 +1,333 @@
+"""
+Govee Transport
+Shared, pooled async HTTP transport with rate-limit-aware request scheduling
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+# Govee cloud API limits (see the developer API reference)
+DEVICE_RATE_PER_MINUTE = 10
+ACCOUNT_RATE_PER_DAY = 10000
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of rejecting callers"""
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize token bucket
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def reserve(self, now: Optional[float] = None) -> float:
+        """
+        Take one token, going into debt if none are available
+        
+        Args:
+            now: Current monotonic time (defaults to time.monotonic())
+        
+        Returns:
+            Seconds the caller must wait before its token is valid
+        """
+        if now is None:
+            now = time.monotonic()
+        
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+    
+    def available(self, now: Optional[float] = None) -> bool:
+        """Check whether reserve() would return without a wait, without taking a token"""
+        if now is None:
+            now = time.monotonic()
+        return min(self.capacity, self.tokens + (now - self.updated) * self.rate) >= 1
+    
+    def defer(self, seconds: float, now: Optional[float] = None):
+        """
+        Hold back every reservation for at least `seconds`
+        
+        Used when the server says the limit is exhausted, whatever this
+        bucket believed.
+        
+        Args:
+            seconds: Seconds until the next token may be handed out
+            now: Current monotonic time (defaults to time.monotonic())
+        """
+        if now is None:
+            now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class RateLimitScheduler:
+    """Paces requests against per-device and per-account token buckets"""
+    
+    def __init__(self, device_rate: float = DEVICE_RATE_PER_MINUTE / 60.0,
+                 device_burst: float = DEVICE_RATE_PER_MINUTE,
+                 account_rate: float = ACCOUNT_RATE_PER_DAY / 86400.0,
+                 account_burst: float = 100):
+        """
+        Initialize scheduler
+        
+        Args:
+            device_rate: Sustained requests per second allowed per device
+            device_burst: Burst size per device
+            account_rate: Sustained requests per second allowed per account
+            account_burst: Burst size for the account
+        """
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.account = TokenBucket(account_rate, account_burst)
+        self.devices: Dict[str, TokenBucket] = {}
+        self.queued = 0
+    
+    def reserve(self, device_id: Optional[str] = None) -> float:
+        """
+        Reserve a slot for one request
+        
+        Args:
+            device_id: Device the request targets (None for account-only calls)
+        
+        Returns:
+            Seconds to wait before sending
+        """
+        now = time.monotonic()
+        delay = self.account.reserve(now)
+        
+        if device_id is not None:
+            delay = max(delay, self._bucket(device_id).reserve(now))
+        
+        return delay
+    
+    def _bucket(self, device_id: str) -> TokenBucket:
+        """Get a device's bucket, creating it on first use"""
+        bucket = self.devices.get(device_id)
+        if bucket is None:
+            bucket = TokenBucket(self.device_rate, self.device_burst)
+            self.devices[device_id] = bucket
+        return bucket
+    
+    def try_reserve(self, device_id: Optional[str] = None) -> bool:
+        """
+        Reserve a slot only if the request could be sent right away
+        
+        Args:
+            device_id: Device the request targets
+        
+        Returns:
+            True if a slot was reserved
+        """
+        now = time.monotonic()
+        if not self.account.available(now):
+            return False
+        if device_id is not None and not self._bucket(device_id).available(now):
+            return False
+        self.reserve(device_id)
+        return True
+    
+    def defer(self, seconds: float, device_id: Optional[str] = None):
+        """
+        Pause requests after the server reported a rate limit
+        
+        Args:
+            seconds: Seconds to hold requests back
+            device_id: Device whose requests to pause (None pauses the account)
+        """
+        bucket = self._bucket(device_id) if device_id is not None else self.account
+        bucket.defer(seconds)
+    
+    async def acquire(self, device_id: Optional[str] = None):
+        """
+        Wait until a request for the device may be sent
+        
+        Args:
+            device_id: Device the request targets
+        """
+        delay = self.reserve(device_id)
+        if delay > 0:
+            self.queued += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.queued -= 1
+
+
+class _LoopThread:
+    """Background thread running the event loop shared by all transports"""
+    
+    def __init__(self):
+        """Initialize loop thread"""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        """Run the event loop forever"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the loop and wait for its result
+        
+        Args:
+            coro: Coroutine to execute
+            timeout: Maximum seconds to wait for the result
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout)
+
+
+_loop_thread: Optional[_LoopThread] = None
+_loop_lock = threading.Lock()
+
+
+def get_loop_thread() -> _LoopThread:
+    """Get (and lazily start) the shared transport event loop"""
+    global _loop_thread
+    
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        return _loop_thread
+
+
+class AsyncTransport:
+    """
+    Pooled keep-alive HTTP transport for the Govee cloud API
+    
+    Coroutines must be awaited on the shared loop from get_loop_thread();
+    threaded callers use the *_sync wrappers.
+    """
+    
+    def __init__(self, base_url: str, headers: Optional[Dict] = None,
+                 scheduler: Optional[RateLimitScheduler] = None,
+                 max_connections: int = 20, timeout: float = 10.0):
+        """
+        Initialize transport
+        
+        Args:
+            base_url: API base URL
+            headers: Headers sent with every request
+            scheduler: Rate-limit scheduler (defaults to Govee's published limits)
+            max_connections: Size of the keep-alive connection pool
+            timeout: Request timeout in seconds
+        """
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the pooled client on first use (must run on the loop)"""
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=limits,
+                timeout=self.timeout
+            )
+            # Queue excess requests here rather than inside the connection pool
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._client
+    
+    async def request(self, method: str, path: str, device_id: Optional[str] = None,
+                      paced: bool = True, **kwargs) -> httpx.Response:
+        """
+        Send a request once the rate limiter allows it
+        
+        Args:
+            method: HTTP method
+            path: Path relative to the base URL
+            device_id: Device the request targets, used for per-device pacing
+            paced: Wait for the rate limiter (False when the caller already
+                reserved a slot with scheduler.try_reserve())
+            **kwargs: Extra arguments passed to httpx (json, params, ...)
+        
+        Returns:
+            HTTP response
+        """
+        if paced:
+            await self.scheduler.acquire(device_id)
+        client = self._get_client()
+        async with self._slots:
+            return await client.request(method, path, **kwargs)
+    
+    def request_sync(self, method: str, path: str, device_id: Optional[str] = None,
+                     **kwargs) -> httpx.Response:
+        """
+        Blocking wrapper around request() for threaded callers
+        
+        Args:
+            method: HTTP method
+            path: Path relative to the base URL
+            device_id: Device the request targets
+            **kwargs: Extra arguments passed to httpx
+        
+        Returns:
+            HTTP response
+        """
+        return get_loop_thread().run(self.request(method, path, device_id, **kwargs))
+    
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def close(self):
+        """Blocking wrapper around aclose()"""
+        if self._client is not None:
+            get_loop_thread().run(self.aclose())
+
+
+_transports: Dict[Tuple[str, Optional[str]], AsyncTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_shared_transport(base_url: str, api_key: Optional[str],
+                         headers: Optional[Dict] = None) -> AsyncTransport:
+    """
+    Get the process-wide transport for a base URL and API key
+    
+    All clients for the same account share one connection pool and one
+    rate-limit scheduler, so limits hold across agents.
+    
+    Args:
+        base_url: API base URL
+        api_key: Govee API key
+        headers: Headers to use if the transport has to be created
+    
+    Returns:
+        Shared AsyncTransport
+    """
+    key = (base_url, api_key)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = AsyncTransport(base_url, headers)
+            _transports[key] = transport
+        return transport
@@ -1,14 +1,123 @@
 """
 Main web server for Govee Lights Controller
+
+Development: python server/main.py
+Production:  GOVEE_SERVER_MODE=production python server/main.py
+             (or gunicorn -w 1 --threads 100 server.main:app)
 """
-from flask import Flask, render_template, jsonify
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
 import os
+import sys
+
+# Allow `python server/main.py` to import the sibling packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.task_manager import PRIORITY_INTERACTIVE, TaskExpired, task_manager
+from govee_api import metrics
+from govee_api.coalescer import get_shared_coalescer
+from govee_api.registry import get_shared_registry
+from govee_api.scenes import get_shared_scene_store
+from govee_api.shadow import get_shared_shadow
+from server.profiler import SamplingProfiler
+from server.streaming import LiveStream
+from agents.light_control_agent import parse_commands  # registers the light agents
+
+# Audio and effect agents pull in numpy and the audio stack; load them on first use
+task_manager.register_lazy_agent('audio_reactive', 'agents.audio_agent')
+task_manager.register_lazy_agent('sync_effect', 'agents.sync_agent')
+task_manager.register_lazy_agent('light_show', 'agents.show_agent')
+
+# User clicks overtake effect work; give up on them if they cannot run soon
+COMMAND_TTL = 5.0
+COMMAND_TIMEOUT = 2.0
+# A batch fans out to many devices; allow it longer to finish
+BATCH_TIMEOUT = 10.0
+# Compiling renders every frame of a show; answer 202 if it takes longer
+SHOW_COMPILE_TIMEOUT = 30.0
 
 app = Flask(__name__, template_folder='../frontend/templates', static_folder='../frontend/static')
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Threading mode: the task manager and transport run real threads and an asyncio
+# loop, which eventlet/gevent monkey-patching would break. WebSockets are
+# served by simple-websocket under werkzeug or gunicorn's threaded worker.
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+# One producer packs spectrum frames and diffs device state for every client
+live_stream = LiveStream(
+    socketio,
+    # Only look for an analyzer once the audio agent has been loaded
+    analyzer_source=lambda: getattr(sys.modules.get('agents.audio_agent'), 'audio_analyzer', None),
+    devices_source=lambda: [light['id'] for light in get_shared_registry().get_all()],
+    shadow_source=get_shared_shadow
+)
+
+# Off until started from /api/profiler
+profiler = SamplingProfiler()
+
+TASK_COUNTS = ('submitted', 'completed', 'failed', 'cancelled', 'expired', 'preempted')
+
+def _task_samples():
+    """Queue depths and per-agent task counts from the task manager"""
+    task_metrics = task_manager.metrics()
+    for lane, lane_metrics in task_metrics['lanes'].items():
+        for key, value in lane_metrics.items():
+            yield f'govee_task_lane_{key}', {'lane': lane}, value
+    for agent_name, agent_metrics in task_metrics['agents'].items():
+        labels = {'agent': agent_name}
+        yield 'govee_tasks_running', labels, agent_metrics['running']
+        yield 'govee_tasks_deferred', labels, agent_metrics['deferred']
+        for key in TASK_COUNTS:
+            yield 'govee_tasks_total', {**labels, 'outcome': key}, agent_metrics[key]
+
+def _command_samples():
+    """Pending commands, coalescing counters and circuit breakers"""
+    coalescer = get_shared_coalescer()
+    stats = coalescer.stats()
+    yield 'govee_commands_pending', {}, stats.pop('pending')
+    for key, value in stats.items():
+        yield 'govee_commands_total', {'outcome': key}, value
+    for device_id, state in coalescer.client.breakers.states().items():
+        yield 'govee_device_circuit_open', {'device': device_id}, int(state != 'closed')
+
+def _stream_samples():
+    """Live stream subscribers"""
+    yield 'govee_stream_clients', {}, len(live_stream.stats()['clients'])
+
+def _effect_samples():
+    """Running effects and render loops (nothing until the sync agent has been loaded)"""
+    effect_registry = sys.modules.get('agents.effect_registry')
+    if effect_registry is None:
+        return
+    stats = effect_registry.get_shared_effect_registry().stats()
+    yield 'govee_effects', {'state': 'running'}, stats['running']
+    yield 'govee_effects', {'state': 'idle'}, stats['idle']
+    yield 'govee_effects_evicted_total', {}, stats['evicted']
+    yield 'govee_render_threads', {}, sum(1 for loop in stats['loops'] if loop['running'])
+
+metrics.REGISTRY.register_collector('tasks', _task_samples, {
+    'govee_task_lane_queued': ('gauge', 'Tasks waiting in each task manager lane'),
+    'govee_task_lane_workers': ('gauge', 'Worker threads serving each lane'),
+    'govee_task_lane_running': ('gauge', 'Coroutine tasks running on the async lane'),
+    'govee_tasks_running': ('gauge', 'Tasks running per agent'),
+    'govee_tasks_deferred': ('gauge', 'Tasks held back by per-agent concurrency limits'),
+    'govee_tasks_total': ('counter', 'Tasks per agent by outcome')
+})
+metrics.REGISTRY.register_collector('commands', _command_samples, {
+    'govee_commands_pending': ('gauge', 'Commands waiting in the coalescer'),
+    'govee_commands_total': ('counter', 'Coalescer command counts by outcome'),
+    'govee_device_circuit_open': ('gauge', 'Whether cloud commands to a device are being refused (1) or sent (0)')
+})
+metrics.REGISTRY.register_collector('stream', _stream_samples, {
+    'govee_stream_clients': ('gauge', 'Clients subscribed to the live stream')
+})
+metrics.REGISTRY.register_collector('effects', _effect_samples, {
+    'govee_effects': ('gauge', 'Sync effects running or kept idle for reuse'),
+    'govee_effects_evicted_total': ('counter', 'Idle effect coordinators dropped'),
+    'govee_render_threads': ('gauge', 'Render loop threads running')
+})
 
 @app.route('/')
 def index():
@@ -17,22 +126,219 @@ def index():
 
 @app.route('/api/lights', methods=['GET'])
 def get_lights():
-    """Get list of available lights"""
-    # TODO: Implement Govee API integration
-    return jsonify({
-        'lights': [],
+    """Get list of available lights (served from the device registry and shadow)"""
+    registry = get_shared_registry()
+    shadow = get_shared_shadow()
+    lights = registry.get_all()
+    
+    etag = f'{registry.etag}-{shadow.version}' if registry.etag else ''
+    if etag and request.if_none_match.contains(etag):
+        return '', 304
+    
+    states = {light['id']: shadow.state(light['id']) for light in lights}
+    response = jsonify({
+        'lights': [
+            dict(light, status=states[light['id']]['power'] or 'unknown', state=states[light['id']])
+            for light in lights
+        ],
         'status': 'success'
     })
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/lights/<light_id>/state', methods=['GET'])
+def get_light_state(light_id):
+    """Get a light's last reported and pending state (no device round-trip)"""
+    return jsonify(dict(get_shared_shadow().get(light_id), light_id=light_id, status='success'))
 
 @app.route('/api/lights/<light_id>/control', methods=['POST'])
 def control_light(light_id):
     """Control a specific light"""
-    # TODO: Implement light control
+    body = request.get_json(silent=True) or {}
+    task = task_manager.submit_task(
+        'light_control',
+        {'device_id': light_id, 'action': body.get('action'), 'params': body.get('params', {})},
+        priority=PRIORITY_INTERACTIVE,
+        ttl=COMMAND_TTL,
+        preempt=True
+    )
+    
+    try:
+        ok = task.result(timeout=COMMAND_TIMEOUT)
+    except FutureTimeoutError:
+        # Still queued or running; it will be dropped if it outlives its TTL
+        return jsonify({'status': 'pending', 'light_id': light_id, 'task_id': task.id}), 202
+    except TaskExpired:
+        return jsonify({'status': 'expired', 'light_id': light_id}), 503
+    except ValueError as e:
+        return jsonify({'status': 'error', 'light_id': light_id, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'light_id': light_id, 'message': str(e)}), 500
+    
+    if not ok and not get_shared_coalescer().client.is_reachable(light_id):
+        return jsonify({'status': 'error', 'light_id': light_id,
+                        'message': 'Device is not responding'}), 503
+    if not ok:
+        return jsonify({'status': 'error', 'light_id': light_id,
+                        'message': f"Unsupported action '{body.get('action')}'"}), 400
     return jsonify({
         'status': 'success',
         'light_id': light_id
     })
 
+def _run_batch(task_data: dict):
+    """Submit a light_batch task and turn its outcome into a response"""
+    task = task_manager.submit_task('light_batch', task_data, priority=PRIORITY_INTERACTIVE,
+                                    ttl=COMMAND_TTL, preempt=True)
+    try:
+        summary = task.result(timeout=BATCH_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({'status': 'pending', 'task_id': task.id}), 202
+    except TaskExpired:
+        return jsonify({'status': 'expired'}), 503
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    if summary is None:
+        return jsonify({'status': 'error', 'message': f"Unknown scene '{task_data.get('scene')}'"}), 404
+    return jsonify(dict(summary, status='success'))
+
+@app.route('/api/lights/batch', methods=['POST'])
+def control_lights():
+    """Apply many light commands (or a stored scene) in one request"""
+    body = request.get_json(silent=True) or {}
+    if body.get('scene'):
+        return _run_batch({'scene': body['scene']})
+    
+    commands, errors = parse_commands(body.get('commands') or [])
+    if errors or not commands:
+        return jsonify({'status': 'error', 'errors': errors or ['No commands given']}), 400
+    return _run_batch({'commands': commands})
+
+@app.route('/api/scenes', methods=['GET'])
+def list_scenes():
+    """List stored scenes"""
+    return jsonify({'scenes': get_shared_scene_store().names(), 'status': 'success'})
+
+@app.route('/api/scenes/<name>', methods=['GET'])
+def get_scene(name):
+    """Get a stored scene's device commands"""
+    scene = get_shared_scene_store().get(name)
+    if scene is None:
+        return jsonify({'status': 'error', 'message': f"Unknown scene '{name}'"}), 404
+    return jsonify({'name': name, 'commands': scene, 'status': 'success'})
+
+@app.route('/api/scenes/<name>', methods=['PUT'])
+def save_scene(name):
+    """Validate, compile and store a scene"""
+    body = request.get_json(silent=True) or {}
+    commands, errors = parse_commands(body.get('commands') or [], allow_toggle=False)
+    if errors or not commands:
+        return jsonify({'status': 'error', 'errors': errors or ['No commands given']}), 400
+    get_shared_scene_store().save(name, commands)
+    return jsonify({'name': name, 'commands': len(commands), 'status': 'success'})
+
+@app.route('/api/scenes/<name>', methods=['DELETE'])
+def delete_scene(name):
+    """Delete a stored scene"""
+    if not get_shared_scene_store().delete(name):
+        return jsonify({'status': 'error', 'message': f"Unknown scene '{name}'"}), 404
+    return jsonify({'name': name, 'status': 'success'})
+
+@app.route('/api/scenes/<name>/apply', methods=['POST'])
+def apply_scene(name):
+    """Send a stored scene to its lights"""
+    return _run_batch({'scene': name})
+
+def _run_show(task_data: dict, timeout: float = COMMAND_TIMEOUT):
+    """
+    Submit a light_show task
+    
+    Returns:
+        Tuple of (task result, None), or (None, error response)
+    """
+    task = task_manager.submit_task('light_show', task_data, priority=PRIORITY_INTERACTIVE,
+                                    long_running=task_data['action'] == 'compile')
+    name = task_data.get('name')
+    try:
+        return task.result(timeout=timeout), None
+    except FutureTimeoutError:
+        return None, (jsonify({'status': 'pending', 'name': name, 'task_id': task.id}), 202)
+    except FileNotFoundError:
+        return None, (jsonify({'status': 'error', 'message': f"Unknown show '{name}'"}), 404)
+    except ValueError as e:
+        return None, (jsonify({'status': 'error', 'message': str(e)}), 400)
+    except Exception as e:
+        return None, (jsonify({'status': 'error', 'message': str(e)}), 500)
+
+@app.route('/api/shows', methods=['GET'])
+def list_shows():
+    """List stored light shows"""
+    shows, error = _run_show({'action': 'list'})
+    return error or jsonify({'shows': shows, 'status': 'success'})
+
+@app.route('/api/shows/<name>', methods=['PUT'])
+def compile_show(name):
+    """Render an effect (or a WAV file with "wav_path") into a stored show"""
+    body = request.get_json(silent=True) or {}
+    show, error = _run_show(dict(body, action='compile', name=name), timeout=SHOW_COMPILE_TIMEOUT)
+    return error or jsonify(dict(show, status='success'))
+
+@app.route('/api/shows/<name>', methods=['DELETE'])
+def delete_show(name):
+    """Stop and delete a stored show"""
+    _, error = _run_show({'action': 'delete', 'name': name})
+    return error or jsonify({'name': name, 'status': 'success'})
+
+@app.route('/api/shows/<name>/play', methods=['POST'])
+def play_show(name):
+    """Play a stored show on strips ({"strips": [...], "loop": bool})"""
+    body = request.get_json(silent=True) or {}
+    show, error = _run_show(dict(body, action='play', name=name))
+    return error or jsonify(dict(show, status='success'))
+
+@app.route('/api/shows/<name>/stop', methods=['POST'])
+def stop_show(name):
+    """Stop a playing show"""
+    stopped, error = _run_show({'action': 'stop', 'name': name})
+    if error:
+        return error
+    if not stopped:
+        return jsonify({'status': 'error', 'message': f"Show '{name}' is not playing"}), 404
+    return jsonify({'name': name, 'status': 'success'})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics', methods=['POST'])
+def set_metrics():
+    """Turn metric recording on or off ({"enabled": bool})"""
+    data = request.get_json(silent=True) or {}
+    metrics.set_enabled(bool(data.get('enabled', True)))
+    return jsonify({'enabled': metrics.enabled})
+
+@app.route('/api/profiler', methods=['GET'])
+def get_profile():
+    """Top sampled stacks, or every stack in collapsed format with ?format=collapsed"""
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    return jsonify(profiler.report(request.args.get('limit', 50, type=int)))
+
+@app.route('/api/profiler', methods=['POST'])
+def control_profiler():
+    """Start or stop the sampling profiler ({"action": "start"|"stop", "interval": seconds})"""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action == 'start':
+        profiler.start(data.get('interval'))
+    elif action == 'stop':
+        profiler.stop()
+    else:
+        return jsonify({'error': f'Unknown action: {action}'}), 400
+    return jsonify(profiler.report(limit=0))
+
 @socketio.on('connect')
 def handle_connect():
     """Handle WebSocket connection"""
@@ -43,8 +349,53 @@ def handle_connect():
 def handle_disconnect():
     """Handle WebSocket disconnection"""
     print('Client disconnected')
+    live_stream.unsubscribe(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    """Start streaming state deltas and spectrum frames to this client"""
+    data = data or {}
+    live_stream.subscribe(
+        request.sid,
+        fps=data.get('fps', 10),
+        spectrum=data.get('spectrum', True),
+        state=data.get('state', True)
+    )
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe():
+    """Stop streaming to this client"""
+    live_stream.unsubscribe(request.sid)
+
+def serve_production(host: str, port: int, threads: int = 100):
+    """
+    Replace this process with gunicorn running the app on its threaded worker
+    
+    gunicorn forks its worker, and threads (task manager, event loop) do not
+    survive a fork, so the worker imports the app itself rather than
+    inheriting this process's. One worker only: Socket.IO sessions, the task
+    manager and the live stream all live in that process's memory.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        threads: Concurrent requests and WebSocket connections
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.execvp(sys.executable, [
+        sys.executable, '-m', 'gunicorn',
+        '--chdir', root,
+        '--bind', f'{host}:{port}',
+        '--workers', '1',
+        '--worker-class', 'gthread',
+        '--threads', str(threads),
+        'server.main:app'
+    ])
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    socketio.run(app, host='0.0.0.0', port=port, debug=True)
+    if os.environ.get('GOVEE_SERVER_MODE') == 'production':
+        serve_production('0.0.0.0', port, int(os.environ.get('GOVEE_SERVER_THREADS', 100)))
+    else:
+        socketio.run(app, host='0.0.0.0', port=port, debug=True)
 
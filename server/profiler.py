@@ -0,0 +1,126 @@
+"""
+Sampling Profiler
+Periodically samples every thread's stack while switched on, for finding hot paths in production
+"""
+import collections
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that can be started and stopped at runtime
+    
+    A background thread reads sys._current_frames() every interval and
+    counts each distinct stack. Nothing is traced between samples, so the
+    cost is one stack walk per thread per interval and zero while stopped.
+    """
+    
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        """
+        Initialize profiler
+        
+        Args:
+            interval: Seconds between samples
+            max_depth: Deepest stack frames kept per sample
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self.is_running = False
+        self.thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+    
+    def start(self, interval: Optional[float] = None):
+        """
+        Clear previous results and start sampling
+        
+        Args:
+            interval: Seconds between samples (keeps the current one if omitted)
+        """
+        if self.is_running:
+            return
+        
+        if interval:
+            self.interval = interval
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+        self.started_at = time.monotonic()
+        self.duration = 0.0
+        self.is_running = True
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop sampling (results are kept until the next start)"""
+        if not self.is_running:
+            return
+        
+        self.is_running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.duration = time.monotonic() - self.started_at
+    
+    def _stack(self, frame) -> str:
+        """Collapse a frame chain into 'outer;...;inner' with file:function names"""
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f'{code.co_filename.rsplit("/", 1)[-1]}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+    
+    def _sample_loop(self):
+        """Take a sample of every other thread each interval"""
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = [self._stack(frame) for ident, frame in sys._current_frames().items()
+                      if ident != own]
+            with self._lock:
+                self.stacks.update(stacks)
+                self.samples += 1
+    
+    def report(self, limit: int = 50) -> Dict:
+        """
+        Get the most frequently sampled stacks
+        
+        Args:
+            limit: Number of stacks to return
+        
+        Returns:
+            Dictionary with sample count, seconds profiled, and the top
+            stacks with their share of samples
+        """
+        with self._lock:
+            top = self.stacks.most_common(limit)
+            samples = self.samples
+        duration = time.monotonic() - self.started_at if self.is_running else self.duration
+        return {
+            'running': self.is_running,
+            'interval': self.interval,
+            'samples': samples,
+            'seconds': duration,
+            'stacks': [
+                {'stack': stack, 'count': count, 'share': count / samples if samples else 0.0}
+                for stack, count in top
+            ]
+        }
+    
+    def collapsed(self) -> str:
+        """
+        Get every sampled stack in collapsed format ('a;b;c count' per line)
+        
+        The output feeds flamegraph.pl or speedscope directly.
+        """
+        with self._lock:
+            lines: List[str] = [f'{stack} {count}' for stack, count in self.stacks.most_common()]
+        return '\n'.join(lines) + '\n'
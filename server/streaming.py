@@ -0,0 +1,234 @@
+"""
+Live Stream
+Pushes device state deltas and packed spectrum frames to Socket.IO clients
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from govee_api import metrics
+
+class Subscriber:
+    """Per-client stream settings and throttling state"""
+    
+    def __init__(self, fps: float, spectrum: bool = True, state: bool = True):
+        self.interval = 1.0 / fps
+        self.spectrum = spectrum
+        self.state = state
+        self.next_send = 0.0
+        # Deltas only make sense on top of a full snapshot, sent first
+        self.needs_snapshot = state
+        self.pending: Dict[str, Dict] = {}
+        self.sent = 0
+        self.dropped = 0
+
+
+def state_delta(previous: Dict[str, Dict], current: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Find the fields that changed between two state snapshots
+    
+    Args:
+        previous: {device_id: state} last sent
+        current: {device_id: state} now
+    
+    Returns:
+        {device_id: {attribute: value}} holding only changed attributes
+    """
+    delta = {}
+    for device_id, state in current.items():
+        before = previous.get(device_id, {})
+        changed = {k: v for k, v in state.items() if before.get(k) != v}
+        if changed:
+            delta[device_id] = changed
+    return delta
+
+
+class LiveStream:
+    """
+    Single producer that fans state and spectrum updates out to clients
+    
+    Each tick the producer packs one spectrum frame and diffs device state
+    once, then hands the same bytes to every subscriber that is due. Slow
+    clients skip spectrum frames (only the latest matters) but have their
+    state deltas merged until they can be sent, so no change is lost.
+    """
+    
+    def __init__(self, socketio, analyzer_source: Callable[[], Optional[object]],
+                 devices_source: Callable[[], list], shadow_source: Callable[[], object],
+                 fps: float = 30.0, max_client_fps: float = 30.0):
+        """
+        Initialize stream
+        
+        Args:
+            socketio: Flask-SocketIO server used to emit
+            analyzer_source: Function returning the active FrequencyAnalyzer (or None)
+            devices_source: Function returning the device IDs to report
+            shadow_source: Function returning the DeviceShadow state is read from
+            fps: Producer rate
+            max_client_fps: Highest rate a client may request
+        """
+        self.socketio = socketio
+        self.analyzer_source = analyzer_source
+        self.devices_source = devices_source
+        self.shadow_source = shadow_source
+        self.fps = fps
+        self.max_client_fps = max_client_fps
+        
+        self.subscribers: Dict[str, Subscriber] = {}
+        self.state: Dict[str, Dict] = {}
+        self._state_key = None
+        self.frames = 0
+        self.is_running = False
+        self.thread = None
+        self._packer = None
+        self._spectrum_error = None
+        self._lock = threading.Lock()
+    
+    def subscribe(self, sid: str, fps: float = 10.0, spectrum: bool = True,
+                  state: bool = True):
+        """
+        Add (or update) a client
+        
+        A state subscriber first receives a 'state_full' snapshot from the
+        producer, then 'state_delta' messages on top of it.
+        
+        Args:
+            sid: Socket.IO session ID
+            fps: Highest rate the client wants updates at
+            spectrum: Whether to send spectrum frames
+            state: Whether to send state deltas
+        """
+        fps = min(max(float(fps), 1.0), self.max_client_fps)
+        with self._lock:
+            self.subscribers[sid] = Subscriber(fps, spectrum, state)
+        self.start()
+    
+    def unsubscribe(self, sid: str):
+        """Remove a client"""
+        with self._lock:
+            self.subscribers.pop(sid, None)
+    
+    def start(self):
+        """Start the producer (no-op if it is running)"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        self.thread = self.socketio.start_background_task(self._producer_loop)
+    
+    def stop(self):
+        """Stop the producer"""
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+    
+    def _spectrum_frame(self) -> Optional[Dict]:
+        """Pack the current spectrum once for all clients"""
+        analyzer = self.analyzer_source()
+        if analyzer is None:
+            self._packer = None
+            return None
+        if self._packer is None or self._packer.analyzer is not analyzer:
+            # numpy is only loaded once audio mode has started an analyzer
+            from audio.features import SpectrumPacker
+            self._packer = SpectrumPacker(analyzer)
+        try:
+            bars = self._packer.pack()
+        except RuntimeError as e:
+            # A failed analysis worker must not hold up state updates; report it once
+            if str(e) != self._spectrum_error:
+                print(f"Error packing spectrum: {e}")
+            self._spectrum_error = str(e)
+            return None
+        self._spectrum_error = None
+        if bars is None:
+            return None
+        return {
+            'seq': self.frames,
+            'bars': bars,
+            'min_freq': analyzer.min_freq,
+            'max_freq': analyzer.max_freq
+        }
+    
+    def _state_changes(self) -> Dict[str, Dict]:
+        """Diff device state against the previous tick"""
+        shadow = self.shadow_source()
+        device_ids = self.devices_source()
+        key = (shadow.version, tuple(device_ids))
+        if key == self._state_key:
+            # Nothing in the shadow moved since the last tick
+            return {}
+        self._state_key = key
+        current = {device_id: shadow.state(device_id) for device_id in device_ids}
+        delta = state_delta(self.state, current)
+        self.state = current
+        return delta
+    
+    def tick(self):
+        """Produce one update and send it to every client that is due"""
+        with self._lock:
+            subscribers = list(self.subscribers.items())
+        wants_spectrum = any(sub.spectrum for _, sub in subscribers)
+        wants_state = any(sub.state for _, sub in subscribers)
+        
+        frame = self._spectrum_frame() if wants_spectrum else None
+        delta = self._state_changes() if wants_state else {}
+        self.frames += 1
+        metrics.FRAMES.inc('stream')
+        
+        now = time.monotonic()
+        for sid, sub in subscribers:
+            if sub.state and not sub.needs_snapshot:
+                for device_id, changed in delta.items():
+                    sub.pending.setdefault(device_id, {}).update(changed)
+            if now < sub.next_send:
+                if frame is not None and sub.spectrum:
+                    sub.dropped += 1
+                continue
+            
+            # Keep the client's own cadence; after a stall start again from now
+            sub.next_send = max(sub.next_send + sub.interval, now)
+            if frame is not None and sub.spectrum:
+                self.socketio.emit('spectrum', frame, to=sid)
+                sub.sent += 1
+            if sub.needs_snapshot:
+                self.socketio.emit('state_full', self.state, to=sid)
+                sub.needs_snapshot = False
+            elif sub.pending:
+                self.socketio.emit('state_delta', sub.pending, to=sid)
+                sub.pending = {}
+    
+    def _producer_loop(self):
+        """Tick at the producer rate while anyone is subscribed"""
+        interval = 1.0 / self.fps
+        deadline = time.monotonic()
+        while self.is_running:
+            if self.subscribers:
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Error producing live stream frame: {e}")
+            
+            deadline += interval
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                # Fell behind; restart the schedule instead of bursting
+                deadline = time.monotonic()
+                delay = 0
+            self.socketio.sleep(delay)
+    
+    def stats(self) -> Dict:
+        """
+        Get stream counters
+        
+        Returns:
+            Producer frame count plus frames sent and dropped per client
+        """
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'clients': {
+                    sid: {'fps': 1.0 / sub.interval, 'sent': sub.sent, 'dropped': sub.dropped}
+                    for sid, sub in self.subscribers.items()
+                }
+            }
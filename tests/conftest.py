@@ -0,0 +1,95 @@
+"""
+Test Fixtures
+Local stand-ins for the Govee cloud API and LAN devices
+"""
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from govee_api.client import GoveeAPIClient
+from govee_api.lan import LanTransport
+from govee_api.mock_lan import MockLanDevice
+from govee_api.mock_server import MockGoveeServer, make_devices
+from govee_api.resilience import BreakerBoard, RetryPolicy
+from govee_api.transport import AsyncTransport, RateLimitScheduler
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    """Poll until condition() is true or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture(scope='session')
+def wav_path(tmp_path_factory) -> str:
+    """Two seconds of a 440 Hz tone as a 16-bit mono WAV file"""
+    path = str(tmp_path_factory.mktemp('audio') / 'tone.wav')
+    rate = 44100
+    samples = 8000 * np.sin(2 * np.pi * 440 * np.arange(2 * rate) / rate)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.astype('<i2').tobytes())
+    return path
+
+
+@pytest.fixture(autouse=True)
+def no_shared_lan(monkeypatch):
+    """Keep clients off the shared LAN socket unless a test hands them one"""
+    monkeypatch.setenv('GOVEE_LAN', '0')
+
+
+@pytest.fixture
+def cloud():
+    """Mock cloud API serving three strips"""
+    server = MockGoveeServer(devices=make_devices(3), retry_after=0.2).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def lan_devices(cloud):
+    """LAN stand-ins for the cloud's devices"""
+    devices = [MockLanDevice(d['device']).start() for d in cloud.devices]
+    yield devices
+    for device in devices:
+        device.stop()
+
+
+@pytest.fixture
+def lan():
+    """LAN transport on a free local port"""
+    transport = LanTransport(bind_host='127.0.0.1', listen_port=0)
+    yield transport
+    transport.close()
+
+
+@pytest.fixture
+def make_client(cloud):
+    """Build clients for the mock cloud with their own transport and rate limits"""
+    clients = []
+    
+    def make(lan=None, retry=None, breakers=None, hedge=False, scheduler=None):
+        scheduler = scheduler or RateLimitScheduler(device_rate=1e9, device_burst=1e9,
+                                                    account_rate=1e9, account_burst=1e9)
+        transport = AsyncTransport(cloud.url, scheduler=scheduler, timeout=2.0)
+        client = GoveeAPIClient(
+            api_key='test', base_url=cloud.url, transport=transport, lan=lan,
+            retry=retry or RetryPolicy(attempts=3, base_delay=0.001),
+            breakers=breakers or BreakerBoard(failure_threshold=1 << 30),
+            hedge=hedge
+        )
+        client.get_devices()
+        clients.append(client)
+        return client
+    
+    yield make
+    for client in clients:
+        client.transport.close()
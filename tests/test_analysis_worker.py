@@ -0,0 +1,119 @@
+"""
+Analysis Worker Tests
+Seqlock reads and writes of shared-memory frames, with and without the shared lock
+"""
+import multiprocessing
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from audio.analysis_worker import FEATURES, SharedAnalyzer, SharedSpectrum
+from tests.conftest import wait_for
+
+BINS = 16
+BANDS = 4
+
+
+def _features(value: float) -> SimpleNamespace:
+    """Extractor stand-in whose outputs all equal value"""
+    return SimpleNamespace(levels=np.full(BANDS, value), **dict.fromkeys(FEATURES, value))
+
+
+@pytest.fixture(params=['ordered', 'locked'])
+def spectrum(request):
+    """Writer's block and a reader attached to it by name"""
+    lock = multiprocessing.Lock() if request.param == 'locked' else None
+    writer = SharedSpectrum(BINS, BANDS, lock=lock)
+    reader = SharedSpectrum(BINS, BANDS, name=writer.name, lock=lock)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_nothing_to_read_before_first_frame(spectrum):
+    _, reader = spectrum
+    
+    assert reader.acquire() is None
+    assert reader.read_features(np.empty(BANDS)) is None
+
+
+def test_reader_sees_published_frame(spectrum):
+    writer, reader = spectrum
+    writer.publish(1024, np.arange(BINS, dtype=float), _features(0.5))
+    
+    slot, seq = reader.acquire()
+    assert seq % 2 == 0
+    np.testing.assert_array_equal(slot['magnitude'], np.arange(BINS))
+    
+    levels = np.empty(BANDS)
+    position, features = reader.read_features(levels)
+    assert position == 1024
+    assert features == dict.fromkeys(FEATURES, 0.5)
+    np.testing.assert_array_equal(levels, 0.5)
+
+
+def test_acquired_slot_survives_one_more_frame(spectrum):
+    writer, reader = spectrum
+    writer.publish(1, np.full(BINS, 1.0))
+    slot, seq = reader.acquire()
+    
+    # The next frame goes to the other slot
+    writer.publish(2, np.full(BINS, 2.0))
+    assert reader.intact(slot, seq)
+    np.testing.assert_array_equal(slot['magnitude'], 1.0)
+    assert reader.acquire()[0]['counters'][1] == 2
+    
+    # The one after reuses it
+    writer.publish(3, np.full(BINS, 3.0))
+    assert not reader.intact(slot, seq)
+
+
+def test_concurrent_reads_never_mix_frames(spectrum):
+    writer, reader = spectrum
+    stop = threading.Event()
+    
+    def write():
+        frame = 0
+        while not stop.is_set():
+            frame += 1
+            writer.publish(frame, np.full(BINS, float(frame)), _features(float(frame)))
+    
+    writing = threading.Thread(target=write)
+    writing.start()
+    levels = np.empty(BANDS)
+    reads = 0
+    try:
+        while reads < 2000:
+            read = reader.read_features(levels)
+            if read is None:
+                continue
+            position, features = read
+            # Every value copied belongs to the frame the position names
+            assert set(features.values()) == {float(position)}
+            assert (levels == position).all()
+            reads += 1
+    finally:
+        stop.set()
+        writing.join()
+
+
+def test_worker_process_publishes_frames(wav_path):
+    analyzer = SharedAnalyzer(wav_path=wav_path, hop_size=1024, chunk_size=2048)
+    resolution = analyzer.sample_rate / 2048
+    
+    def peak_near_tone():
+        magnitude = analyzer.latest_spectrum()
+        if magnitude is None or not magnitude.any():
+            return False
+        return abs(analyzer.engine.frequencies[np.argmax(magnitude)] - 440) < 2 * resolution
+    
+    analyzer.start_stream()
+    try:
+        # The worker analyses the 440 Hz tone in its own process
+        assert wait_for(peak_near_tone, timeout=15.0)
+        assert analyzer.ready
+    finally:
+        analyzer.cleanup()
+    assert analyzer.process is None
@@ -0,0 +1,67 @@
+"""
+Audio Agent Tests
+Starting and stopping audio-reactive tasks on the thread pool and the event loop
+"""
+import pytest
+
+from agents import audio_agent
+from agents.task_manager import task_manager
+from govee_api.coalescer import CommandCoalescer
+from tests.conftest import wait_for
+
+
+@pytest.fixture
+def coalescer(monkeypatch, make_client):
+    """Send the agent's frames to the mock cloud instead of the shared coalescer"""
+    coalescer = CommandCoalescer(client=make_client())
+    monkeypatch.setattr(audio_agent, 'get_shared_coalescer', lambda: coalescer)
+    yield coalescer
+    task_manager.submit_task('audio_reactive', {'action': 'stop'}).result(timeout=5)
+
+
+def _counts():
+    return dict(task_manager.metrics()['agents'].get('audio_reactive', {}))
+
+
+def test_async_stop_task_completes(monkeypatch, cloud, coalescer, wav_path):
+    monkeypatch.setattr(task_manager, 'mode', 'async')
+    before = _counts()
+    start = task_manager.submit_task('audio_reactive', {
+        'action': 'start', 'device_ids': [cloud.devices[0]['device']],
+        'wav_path': wav_path, 'fps': 20
+    })
+    assert wait_for(lambda: start.running() and audio_agent.audio_analyzer is not None)
+    
+    stop = task_manager.submit_task('audio_reactive', {'action': 'stop'})
+    stop.result(timeout=5)
+    assert wait_for(start.done)
+    
+    # The stop task cancels the start task but not itself
+    assert stop.status == 'done'
+    assert start.token.cancelled
+    after = _counts()
+    assert after['completed'] - before.get('completed', 0) == 1
+    assert after['cancelled'] - before.get('cancelled', 0) == 1
+    assert audio_agent.audio_analyzer is None
+
+
+@pytest.mark.parametrize('mode', ['thread', 'async'])
+@pytest.mark.parametrize('ending', ['duration', 'cancel'])
+def test_finished_start_task_releases_analyzer(monkeypatch, cloud, coalescer, wav_path, mode, ending):
+    monkeypatch.setattr(task_manager, 'mode', mode)
+    start = task_manager.submit_task('audio_reactive', {
+        'action': 'start', 'device_ids': [cloud.devices[0]['device']],
+        'wav_path': wav_path, 'fps': 20, 'duration': 0.3 if ending == 'duration' else None
+    })
+    assert wait_for(lambda: start.running() and audio_agent.audio_analyzer is not None)
+    analyzer = audio_agent.audio_analyzer
+    cleaned = []
+    cleanup = analyzer.cleanup
+    monkeypatch.setattr(analyzer, 'cleanup', lambda: (cleaned.append(True), cleanup()))
+    
+    if ending == 'cancel':
+        start.cancel()
+    assert wait_for(start.done)
+    
+    assert audio_agent.audio_analyzer is None
+    assert cleaned == [True]
@@ -0,0 +1,48 @@
+"""
+Benchmark Suite Tests
+Regression checks against stored baselines, and the baseline comparison under pytest
+
+The full comparison is timing-dependent and takes minutes, so it only runs
+with GOVEE_BENCHMARKS=1, on the machine the baselines were recorded on.
+"""
+import os
+
+import pytest
+
+from benchmarks import suite
+
+BASELINES = {'results': {'sync/fps': 100.0, 'tasks/per_s': 1000.0}}
+
+
+def test_compare_counts_only_slowdowns_beyond_tolerance():
+    results = {'sync/fps': 75.0, 'tasks/per_s': 500.0, 'e2e/updates_per_s': 1.0}
+    
+    # 25% slower is within 30%; 50% slower is not; a result without a baseline is new
+    assert suite.compare(results, BASELINES, tolerance=0.3) == 1
+    assert suite.compare(results, BASELINES, tolerance=0.6) == 0
+    assert suite.compare({'sync/fps': 500.0}, BASELINES, tolerance=0.0) == 0
+
+
+def test_suite_runs_selected_cases(wav_path):
+    args = suite.parse_args(['--only', 'sync/rolling', '--only', 'tasks/thread',
+                             '--seconds', '0.05', '--repeat', '1'])
+    
+    results = suite.run(args, [wav_path])
+    
+    assert set(results) == {'sync/rolling/64x1000/fps', 'sync/rolling/64x1000/leds_per_s',
+                            'tasks/thread/tasks_per_s'}
+    assert all(value > 0 for value in results.values())
+    # Every name the suite reports is one the stored baselines can hold
+    assert set(results) <= set(suite.load_baselines().get('results', {}))
+
+
+@pytest.mark.skipif(os.environ.get('GOVEE_BENCHMARKS') != '1',
+                    reason='set GOVEE_BENCHMARKS=1 to compare with benchmarks/baselines.json')
+def test_results_within_baseline_tolerance(tmp_path):
+    args = suite.parse_args([])
+    wav_path = str(tmp_path / 'music.wav')
+    suite.write_music(wav_path)
+    
+    results = suite.run(args, [wav_path])
+    
+    assert suite.compare(results, suite.load_baselines(args.baselines), args.tolerance) == 0
@@ -0,0 +1,118 @@
+"""
+Command Coalescer Tests
+Per-device sends, latest-wins merging and redundancy checks against the mock cloud
+"""
+import time
+
+from govee_api.coalescer import CommandCoalescer
+from tests.conftest import wait_for
+
+
+def _color(value: int) -> dict:
+    return {'r': value, 'g': 0, 'b': 0}
+
+
+def test_offline_device_does_not_hold_up_others(cloud, make_client):
+    slow, fast = cloud.devices[0]['device'], cloud.devices[1]['device']
+    cloud.offline = {slow}
+    cloud.offline_delay = 1.5
+    coalescer = CommandCoalescer(client=make_client())
+    coalescer.start()
+    try:
+        coalescer.set_color(slow, 1, 0, 0)
+        assert wait_for(lambda: slow in coalescer.inflight)
+        
+        start = time.monotonic()
+        for value in range(1, 6):
+            coalescer.set_color(fast, value, 0, 0)
+            assert wait_for(lambda: cloud.states[fast]['color'] == _color(value), timeout=1.0)
+        # Five round trips while the offline device's send is still hanging
+        assert time.monotonic() - start < 1.0
+        assert slow in coalescer.inflight
+    finally:
+        coalescer.stop()
+    
+    # Colors are not retried: the offline device got exactly one request
+    assert coalescer.stats()['failed'] == 1
+
+
+def test_unsent_commands_are_queued_again(cloud, make_client, monkeypatch):
+    client = make_client()
+    coalescer = CommandCoalescer(client=client)
+    device_id = cloud.devices[0]['device']
+    send_colors = client.async_set_colors
+    calls = []
+    
+    async def failing_once(colors, retry=True):
+        calls.append(colors)
+        if len(calls) == 1:
+            raise RuntimeError('transport went away')
+        return await send_colors(colors, retry)
+    
+    monkeypatch.setattr(client, 'async_set_colors', failing_once)
+    coalescer.submit(device_id, {'name': 'turn', 'value': 'on'})
+    coalescer.set_color(device_id, 7, 0, 0)
+    
+    # Power went out before the failure; the color did not and is back in pending
+    assert coalescer.flush() == 2
+    assert len(calls) == 2
+    assert cloud.states[device_id]['powerState'] == 'on'
+    assert cloud.states[device_id]['color'] == _color(7)
+    assert not coalescer.pending and not coalescer.inflight
+
+
+def test_latest_command_per_attribute_wins(cloud, make_client):
+    coalescer = CommandCoalescer(client=make_client())
+    device_id = cloud.devices[0]['device']
+    
+    for value in (1, 2, 3):
+        coalescer.set_color(device_id, value, 0, 0)
+    coalescer.set_brightness(device_id, 40)
+    
+    assert coalescer.pending == {device_id: {
+        'color': {'name': 'color', 'value': _color(3)},
+        'brightness': {'name': 'brightness', 'value': 40}
+    }}
+    stats = coalescer.stats()
+    assert stats['submitted'] == 4
+    assert stats['dropped_stale'] == 2
+    # Brightness joined the device's pending color
+    assert stats['merged'] == 1
+    assert stats['pending'] == 2
+    
+    assert coalescer.flush() == 2
+    assert cloud.states[device_id]['color'] == _color(3)
+    assert cloud.states[device_id]['brightness'] == 40
+    assert coalescer.stats()['sent'] == 2
+
+
+def test_redundant_commands_are_dropped(cloud, make_client):
+    coalescer = CommandCoalescer(client=make_client())
+    device_id = cloud.devices[0]['device']
+    
+    coalescer.set_color(device_id, 5, 0, 0)
+    coalescer.flush()
+    coalescer.set_color(device_id, 5, 0, 0)
+    assert coalescer.stats()['dropped_redundant'] == 1
+    assert not coalescer.pending
+    assert coalescer.is_redundant(device_id, {'name': 'color', 'value': _color(5)})
+    
+    # A different value, or one known only from too long ago, still goes out
+    assert not coalescer.is_redundant(device_id, {'name': 'color', 'value': _color(6)})
+    coalescer._acked_at[device_id]['color'] -= 60
+    coalescer.submit(device_id, {'name': 'color', 'value': _color(5)}, max_age=30)
+    assert device_id in coalescer.pending
+    assert coalescer.stats()['dropped_redundant'] == 1
+
+
+def test_invalidate_forgets_acknowledged_state(cloud, make_client):
+    coalescer = CommandCoalescer(client=make_client())
+    device_id = cloud.devices[0]['device']
+    
+    coalescer.set_power(device_id, True)
+    coalescer.flush()
+    coalescer.invalidate(device_id)
+    coalescer.set_power(device_id, True)
+    
+    assert coalescer.stats()['dropped_redundant'] == 0
+    assert coalescer.flush() == 1
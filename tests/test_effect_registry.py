@@ -0,0 +1,73 @@
+"""
+Effect Registry Tests
+Device ownership between effects, and effects that have been claimed but not started yet
+"""
+import pytest
+
+from agents.effect_registry import EffectRegistry
+from audio.light_sync import LightSyncCoordinator
+
+
+@pytest.fixture
+def effects():
+    """Registry whose coordinators never send (nothing here renders)"""
+    return EffectRegistry(lambda strips, led_counts, segments:
+                          LightSyncCoordinator(strips, led_counts, None, segments))
+
+
+def claim(effects, strips):
+    effects.coordinator(strips, [10] * len(strips))
+    return effects.claim(strips)
+
+
+def test_claimed_effect_survives_sweep_before_it_starts(effects):
+    order = claim(effects, ['a', 'b'])
+    
+    # The coordinator is not running yet; that is not the effect having ended
+    effects.sweep()
+    assert effects.is_current(['a', 'b'], order)
+    assert effects.owners == {'a': 'a_b', 'b': 'a_b'}
+    
+    coordinator = effects.coordinators['a_b']
+    coordinator.is_running = True
+    effects.sweep()
+    assert effects.is_current(['a', 'b'], order)
+    
+    # Once it has run and stopped on its own, sweep does release it
+    coordinator.is_running = False
+    effects.sweep()
+    assert not effects.is_current(['a', 'b'], order)
+    assert effects.owners == {}
+
+
+def test_release_hands_devices_back_to_older_effect(effects):
+    older = claim(effects, ['a', 'b'])
+    newer = claim(effects, ['b', 'c'])
+    assert effects.owners == {'a': 'a_b', 'b': 'b_c', 'c': 'b_c'}
+    assert effects.coordinators['a_b'].detached == {1}
+    
+    effects.release(['b', 'c'], newer)
+    assert effects.owners == {'a': 'a_b', 'b': 'a_b'}
+    assert effects.coordinators['a_b'].detached == set()
+    assert effects.is_current(['a', 'b'], older)
+
+
+def test_stale_release_is_ignored(effects):
+    first = claim(effects, ['a'])
+    second = claim(effects, ['a'])
+    
+    effects.release(['a'], first)
+    assert effects.is_current(['a'], second)
+    assert effects.owners == {'a': 'a'}
+
+
+def test_detach_stops_effect_once_it_owns_nothing(effects):
+    order = claim(effects, ['a', 'b'])
+    
+    assert effects.detach({'a', 'x'}) == 1
+    assert effects.coordinators['a_b'].detached == {0}
+    assert effects.is_current(['a', 'b'], order)
+    
+    assert effects.detach({'b'}) == 1
+    assert not effects.is_current(['a', 'b'], order)
+    assert effects.owners == {}
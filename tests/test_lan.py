@@ -0,0 +1,114 @@
+"""
+LAN Transport Tests
+Discovery, command encodings, batched frames and cloud fallback against local stand-in devices
+"""
+import pytest
+
+from tests.conftest import wait_for
+
+
+def test_discover_registers_devices(lan, lan_devices):
+    for device in lan_devices:
+        found = lan.discover(timeout=0.2, address=device.address)
+        assert [d['device'] for d in found] == [device.device_id]
+    
+    for device in lan_devices:
+        assert lan.has_device(device.device_id)
+        assert lan.devices[device.device_id]['address'] == device.address
+    assert not lan.has_device('unknown')
+
+
+def test_unknown_device_triggers_rescan(lan_devices):
+    from govee_api.lan import LanTransport
+    
+    device = lan_devices[0]
+    transport = LanTransport(bind_host='127.0.0.1', listen_port=0,
+                             scan_address=device.address, rescan_interval=0.0)
+    try:
+        # The first lookup misses and starts a scan; the device answers it
+        assert not transport.has_device(device.device_id)
+        assert wait_for(lambda: transport.has_device(device.device_id))
+    finally:
+        transport.close()
+
+
+@pytest.mark.parametrize('command, field, expected', [
+    ({'name': 'turn', 'value': 'on'}, 'onOff', 1),
+    ({'name': 'turn', 'value': 'off'}, 'onOff', 0),
+    ({'name': 'brightness', 'value': 40}, 'brightness', 40),
+    ({'name': 'color', 'value': {'r': 10, 'g': 20, 'b': 30}}, 'color', {'r': 10, 'g': 20, 'b': 30}),
+])
+def test_command_encodings(lan, lan_devices, command, field, expected):
+    device = lan_devices[0]
+    lan.discover(timeout=0.2, address=device.address)
+    if field == 'onOff':
+        # Start from the opposite state so the change is visible
+        device.state['onOff'] = 1 - expected
+    
+    assert lan.send(device.device_id, command)
+    assert wait_for(lambda: device.state[field] == expected)
+
+
+def test_send_frame_batches_devices(lan, lan_devices):
+    for device in lan_devices:
+        lan.discover(timeout=0.2, address=device.address)
+    colors = {
+        device.device_id: {'name': 'color', 'value': {'r': i, 'g': 0, 'b': 255 - i}}
+        for i, device in enumerate(lan_devices)
+    }
+    frames_before = lan.frames_sent
+    
+    sent = lan.send_frame(colors)
+    
+    assert sorted(sent) == sorted(colors)
+    assert lan.frames_sent == frames_before + 1
+    for device in lan_devices:
+        assert wait_for(lambda: device.state['color'] == colors[device.device_id]['value'])
+
+
+def test_frames_count_only_when_sent(lan, lan_devices):
+    frames_before = lan.frames_sent
+    
+    assert lan.send_frame({'unknown': {'name': 'turn', 'value': 'on'}}) == []
+    assert not lan.send_segments('unknown', bytes(3))
+    assert lan.frames_sent == frames_before
+    
+    lan.discover(timeout=0.2, address=lan_devices[0].address)
+    assert lan.send_segments(lan_devices[0].device_id, bytes(3))
+    assert lan.frames_sent == frames_before + 1
+
+
+def test_unknown_device_falls_back_to_cloud(cloud, lan, lan_devices, make_client):
+    lan.discover(timeout=0.2, address=lan_devices[0].address)
+    client = make_client(lan=lan)
+    cloud_only = lan_devices[1].device_id
+    
+    assert client.control_device(cloud_only, {'name': 'color', 'value': {'r': 1, 'g': 2, 'b': 3}})
+    assert cloud.states[cloud_only]['color'] == {'r': 1, 'g': 2, 'b': 3}
+    assert not lan_devices[1].received
+
+
+def test_unreachable_device_falls_back_to_cloud(cloud, lan, make_client):
+    device_id = cloud.devices[0]['device']
+    # Port 0 makes every datagram fail to send
+    lan.add_device(device_id, '127.0.0.1', port=0)
+    client = make_client(lan=lan)
+    
+    assert client.control_device(device_id, {'name': 'turn', 'value': 'on'})
+    assert cloud.states[device_id]['powerState'] == 'on'
+    assert lan.send_errors == 1
+    
+    results = client.set_colors({device_id: (9, 8, 7)})
+    assert results[device_id]
+    assert cloud.states[device_id]['color'] == {'r': 9, 'g': 8, 'b': 7}
+
+
+def test_command_without_lan_encoding_goes_to_cloud(cloud, lan, lan_devices, make_client):
+    device = lan_devices[0]
+    lan.discover(timeout=0.2, address=device.address)
+    client = make_client(lan=lan)
+    commands_before = cloud.command_count
+    
+    assert client.control_device(device.device_id, {'name': 'segmentedBrightness', 'value': 50})
+    assert cloud.command_count == commands_before + 1
+    assert not device.received
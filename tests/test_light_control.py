@@ -0,0 +1,108 @@
+"""
+Light Control Tests
+Batch command parsing, parameter range checks and stored scenes
+"""
+import json
+import time
+
+import pytest
+
+from agents import light_control_agent
+from agents.light_control_agent import parse_commands
+from govee_api.registry import DeviceRegistry, describe_device
+from govee_api.scenes import SceneStore
+
+PLUG = 'AA:BB:CC:DD:EE:FF:99:00'
+
+
+@pytest.fixture
+def registry(cloud, make_client, monkeypatch, tmp_path):
+    """Registry of the mock strips plus a plug that only switches on and off"""
+    devices = cloud.devices + [{'device': PLUG, 'model': 'H5080', 'supportCmds': ['turn']}]
+    snapshot_path = tmp_path / 'devices.json'
+    snapshot_path.write_text(json.dumps({
+        'updated': time.time(), 'devices': [describe_device(d) for d in devices]
+    }))
+    registry = DeviceRegistry(client=make_client(), snapshot_path=str(snapshot_path))
+    monkeypatch.setattr(light_control_agent, 'get_shared_registry', lambda: registry)
+    return registry
+
+
+def test_valid_commands_keep_their_order(cloud, registry):
+    strip = cloud.devices[0]['device']
+    commands, errors = parse_commands([
+        {'device_id': strip, 'action': 'on'},
+        {'device_id': strip, 'action': 'color', 'params': {'r': 0, 'g': '128', 'b': 255}},
+        {'device_id': strip, 'action': 'brightness'},
+        {'device_id': PLUG, 'action': 'off'},
+    ])
+    
+    assert errors == []
+    assert commands == [
+        (strip, {'name': 'turn', 'value': 'on'}),
+        (strip, {'name': 'color', 'value': {'r': 0, 'g': 128, 'b': 255}}),
+        (strip, {'name': 'brightness', 'value': 50}),
+        (PLUG, {'name': 'turn', 'value': 'off'}),
+    ]
+
+
+@pytest.mark.parametrize('action, params, message', [
+    ('color', {'r': 256}, "'r' must be between 0 and 255, got 256"),
+    ('color', {'g': -1}, "'g' must be between 0 and 255, got -1"),
+    ('color', {'b': 'blue'}, "'b' must be an integer, got 'blue'"),
+    ('brightness', {'brightness': 101}, "'brightness' must be between 0 and 100, got 101"),
+    ('brightness', {'brightness': None}, "'brightness' must be an integer, got None"),
+    ('color', [255, 0, 0], "'params' must be an object, got list"),
+])
+def test_out_of_range_params_are_rejected(cloud, registry, action, params, message):
+    commands, errors = parse_commands([
+        {'device_id': cloud.devices[0]['device'], 'action': action, 'params': params}
+    ])
+    
+    assert commands == []
+    assert errors == [f"commands[0]: {message}"]
+
+
+def test_every_bad_item_is_reported(cloud, registry):
+    strip = cloud.devices[0]['device']
+    commands, errors = parse_commands([
+        'not an object',
+        {'action': 'on'},
+        {'device_id': strip, 'action': 'strobe'},
+        {'device_id': PLUG, 'action': 'color', 'params': {'r': 1}},
+        {'device_id': strip, 'action': 'on'},
+    ])
+    
+    assert commands == [(strip, {'name': 'turn', 'value': 'on'})]
+    assert errors == [
+        "commands[0]: missing device_id",
+        "commands[1]: missing device_id",
+        f"commands[2]: unsupported action 'strobe' for '{strip}'",
+        f"commands[3]: unsupported action 'color' for '{PLUG}'",
+    ]
+
+
+def test_scenes_refuse_toggle(cloud, registry):
+    commands, errors = parse_commands([{'device_id': PLUG, 'action': 'toggle'}],
+                                      allow_toggle=False)
+    
+    assert commands == []
+    assert errors == ["commands[0]: 'toggle' cannot be stored in a scene"]
+
+
+def test_scene_is_stored_compiled_and_reloaded(cloud, registry, tmp_path):
+    strip = cloud.devices[0]['device']
+    commands, _ = parse_commands([
+        {'device_id': strip, 'action': 'color', 'params': {'r': 10, 'g': 20, 'b': 30}},
+        {'device_id': PLUG, 'action': 'on'},
+    ], allow_toggle=False)
+    path = str(tmp_path / 'scenes.json')
+    
+    SceneStore(registry=registry, path=path).save('evening', commands)
+    
+    store = SceneStore(registry=registry, path=path)
+    assert store.names() == ['evening']
+    compiled = store.compiled('evening')
+    assert [(device_id, command) for device_id, command, _ in compiled] == commands
+    assert all(payload is not None for _, _, payload in compiled)
+    assert store.compiled('unknown') is None
@@ -0,0 +1,98 @@
+"""
+Device Registry Tests
+TTL refresh, retry backoff while the API returns nothing, and snapshot warm starts
+"""
+import time
+
+import pytest
+
+from govee_api import registry as registry_module
+from govee_api.registry import DeviceRegistry
+from tests.conftest import wait_for
+
+
+@pytest.fixture
+def listing(cloud, make_client, monkeypatch):
+    """Client whose device list calls are counted and can be switched to an outage"""
+    client = make_client()
+    get_devices = client.get_devices
+    calls = []
+    outage = []
+    
+    def counted():
+        calls.append(time.monotonic())
+        return [] if outage else get_devices()
+    
+    monkeypatch.setattr(client, 'get_devices', counted)
+    client.calls = calls
+    client.outage = outage
+    return client
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / 'devices.json')
+
+
+def test_cold_registry_loads_and_indexes_devices(cloud, listing, snapshot_path):
+    registry = DeviceRegistry(client=listing, snapshot_path=snapshot_path)
+    
+    devices = registry.get_all()
+    assert sorted(d['id'] for d in devices) == sorted(d['device'] for d in cloud.devices)
+    assert len(listing.calls) == 1
+    device_id = cloud.devices[0]['device']
+    assert registry.supports(device_id, 'color')
+    assert not registry.supports(device_id, 'segment')
+    assert registry.find('color_temperature') == sorted(d['id'] for d in devices)
+    
+    # Fresh within the TTL: served from memory
+    registry.get_all()
+    assert len(listing.calls) == 1
+
+
+def test_stale_cache_refreshes_in_background(listing, snapshot_path):
+    registry = DeviceRegistry(client=listing, ttl=60.0, snapshot_path=snapshot_path)
+    registry.get_all()
+    registry.updated -= 120
+    registry.attempted -= 120
+    
+    # The stale list is returned at once while the refresh runs
+    assert registry.get_all()
+    assert wait_for(lambda: len(listing.calls) == 2 and not registry.is_stale())
+
+
+def test_empty_responses_are_retried_after_backoff(listing, snapshot_path, monkeypatch):
+    listing.outage.append(True)
+    registry = DeviceRegistry(client=listing, snapshot_path=snapshot_path)
+    
+    assert registry.get_all() == []
+    # Within RETRY_INTERVAL of the failed attempt nothing is sent
+    assert registry.get_all() == []
+    assert len(listing.calls) == 1
+    
+    listing.outage.clear()
+    registry.attempted -= registry_module.RETRY_INTERVAL + 1
+    registry.get_all()
+    assert wait_for(lambda: registry.devices)
+    assert len(listing.calls) == 2
+
+
+def test_failed_refresh_keeps_old_list(listing, snapshot_path):
+    registry = DeviceRegistry(client=listing, snapshot_path=snapshot_path)
+    devices = registry.get_all()
+    updated = registry.updated
+    
+    listing.outage.append(True)
+    assert not registry.refresh()
+    assert registry.get_all() == devices
+    assert registry.updated == updated
+
+
+def test_snapshot_warm_starts_without_the_api(listing, snapshot_path):
+    cold = DeviceRegistry(client=listing, snapshot_path=snapshot_path)
+    devices = cold.get_all()
+    
+    warm = DeviceRegistry(client=listing, snapshot_path=snapshot_path)
+    assert warm.get_all() == devices
+    assert warm.etag == cold.etag
+    assert len(listing.calls) == 1
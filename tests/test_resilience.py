@@ -0,0 +1,145 @@
+"""
+Send Resilience Tests
+Retries, 429 handling, circuit breakers and hedged sends against a fault-injecting mock server
+"""
+import random
+import time
+
+from govee_api.resilience import CLOSED, HALF_OPEN, OPEN, BreakerBoard, CircuitBreaker, RetryPolicy
+from tests.conftest import wait_for
+
+COLOR = {'name': 'color', 'value': {'r': 1, 'g': 2, 'b': 3}}
+
+
+def test_retries_stop_at_policy_limit(cloud, make_client):
+    client = make_client(retry=RetryPolicy(attempts=3, base_delay=0.001))
+    cloud.error_rate = 1.0
+    
+    assert not client.control_device(cloud.devices[0]['device'], COLOR)
+    assert cloud.faults['error'] == 3
+
+
+def test_retries_recover_from_errors(cloud, make_client):
+    client = make_client(retry=RetryPolicy(attempts=5, base_delay=0.001))
+    device_id = cloud.devices[0]['device']
+    cloud.error_rate = 0.5
+    # The mock draws its faults from the random module
+    random.seed(1)
+    
+    delivered = sum(client.control_device(device_id, COLOR) for _ in range(20))
+    # With four retries a command is lost only if all five attempts fail
+    assert delivered >= 18
+    assert cloud.faults['error'] > 0
+
+
+def test_non_idempotent_commands_are_not_retried(cloud, make_client):
+    client = make_client(retry=RetryPolicy(attempts=3, base_delay=0.001))
+    cloud.error_rate = 1.0
+    
+    assert not client.control_device(cloud.devices[0]['device'],
+                                     {'name': 'segmentedBrightness', 'value': 50})
+    assert cloud.faults['error'] == 1
+
+
+def test_rate_limited_command_defers_bucket_and_retries(cloud, make_client):
+    client = make_client(retry=RetryPolicy(attempts=3, base_delay=0.001))
+    device_id = cloud.devices[0]['device']
+    cloud.retry_after = 0.3
+    # Request 1 goes through, request 2 gets a 429 with Retry-After
+    cloud.rate_limit_every = 2
+    assert client.control_device(device_id, COLOR)
+    
+    start = time.monotonic()
+    assert client.control_device(device_id, COLOR)
+    elapsed = time.monotonic() - start
+    
+    assert cloud.faults['rate_limited'] == 1
+    # The retry waited out Retry-After in the device's bucket, not in a backoff sleep
+    assert elapsed >= 0.25
+    # A 429 says nothing about the device, so its breaker is untouched
+    assert client.breakers.get(device_id).failures == 0
+
+
+def test_breaker_opens_after_failures_and_lets_one_trial_through(cloud, make_client):
+    client = make_client(retry=RetryPolicy(attempts=1),
+                         breakers=BreakerBoard(failure_threshold=3, reset_timeout=0.3))
+    device_id = cloud.devices[0]['device']
+    cloud.error_rate = 1.0
+    
+    for _ in range(3):
+        assert not client.control_device(device_id, COLOR)
+    assert client.breakers.get(device_id).state == OPEN
+    assert not client.is_reachable(device_id)
+    
+    # Refused without a request while open
+    assert not client.control_device(device_id, COLOR)
+    assert cloud.faults['error'] == 3
+    
+    time.sleep(0.35)
+    cloud.error_rate = 0.0
+    assert client.control_device(device_id, COLOR)
+    assert client.breakers.get(device_id).state == CLOSED
+    assert client.is_reachable(device_id)
+
+
+def test_half_open_breaker_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    
+    # A failed trial opens it again for another full timeout
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.trips == 2
+
+
+def test_hedged_sends_never_double_apply(cloud, lan, lan_devices, make_client):
+    for device in lan_devices:
+        lan.discover(timeout=0.2, address=device.address)
+    client = make_client(lan=lan, hedge=True)
+    device_ids = [device.device_id for device in lan_devices]
+    cloud.error_rate = 0.3
+    
+    frames = 20
+    for i in range(frames):
+        client.set_colors({device_id: (i, 0, 0) for device_id in device_ids})
+    assert wait_for(lambda: not client._hedges)
+    
+    # At most one cloud copy per device per frame, and failed copies are not retried
+    assert cloud.requests <= frames * len(device_ids)
+    assert cloud.command_count + cloud.faults['error'] == cloud.requests
+    for device in lan_devices:
+        assert wait_for(lambda: device.state['color'] == {'r': frames - 1, 'g': 0, 'b': 0})
+        assert len([m for _, m in device.received if m['cmd'] == 'colorwc']) == frames
+
+
+def test_retry_after_for_one_device_does_not_stall_the_coalescer(cloud, make_client):
+    from govee_api.coalescer import CommandCoalescer
+    
+    limited, other = cloud.devices[0]['device'], cloud.devices[1]['device']
+    coalescer = CommandCoalescer(client=make_client(retry=RetryPolicy(attempts=3, base_delay=0.001)))
+    coalescer.start()
+    try:
+        cloud.retry_after = 1.0
+        cloud.rate_limit_every = 1
+        coalescer.submit(limited, {'name': 'turn', 'value': 'on'})
+        assert wait_for(lambda: cloud.faults['rate_limited'] == 1)
+        cloud.rate_limit_every = 0
+        
+        # The power command's retry waits out Retry-After in its own send
+        start = time.monotonic()
+        for value in range(1, 4):
+            coalescer.set_color(other, value, 0, 0)
+            assert wait_for(lambda: cloud.states[other]['color'] == {'r': value, 'g': 0, 'b': 0})
+        assert time.monotonic() - start < 0.8
+        assert wait_for(lambda: cloud.states[limited]['powerState'] == 'on')
+    finally:
+        coalescer.stop()
@@ -0,0 +1,123 @@
+"""
+Device Shadow Tests
+Desired and reported state, freshness, reconciliation and reloading from SQLite
+"""
+import threading
+import time
+
+import pytest
+
+from govee_api.coalescer import FRESH_SECONDS, CommandCoalescer
+from govee_api.registry import DeviceRegistry
+from govee_api.shadow import DeviceShadow
+
+RED = {'name': 'color', 'value': {'r': 255, 'g': 0, 'b': 0}}
+
+
+@pytest.fixture
+def registry(make_client, tmp_path):
+    return DeviceRegistry(client=make_client(), snapshot_path=str(tmp_path / 'devices.json'))
+
+
+def test_desired_state_until_acknowledged():
+    shadow = DeviceShadow()
+    
+    shadow.desire('strip', RED)
+    assert shadow.get('strip')['desired'] == {'color': [255, 0, 0]}
+    assert shadow.state('strip') == {'power': None, 'brightness': None, 'color': [255, 0, 0]}
+    
+    shadow.acknowledge('strip', RED)
+    assert shadow.get('strip')['desired'] == {}
+    assert shadow.get('strip')['reported'] == {'color': [255, 0, 0]}
+    assert shadow.command('strip', 'color') == RED
+    
+    # Leaving RGB mode makes the color unknown again
+    shadow.acknowledge('strip', {'name': 'colorTem', 'value': 4000})
+    assert shadow.command('strip', 'color') is None
+
+
+def test_failed_command_is_no_longer_desired():
+    shadow = DeviceShadow()
+    shadow.desire('strip', {'name': 'brightness', 'value': 30})
+    version = shadow.version
+    
+    shadow.discard('strip', {'name': 'brightness', 'value': 30})
+    assert shadow.get('strip')['desired'] == {}
+    assert shadow.version > version
+
+
+def test_reported_state_survives_restart(tmp_path):
+    path = str(tmp_path / 'shadow.db')
+    shadow = DeviceShadow(path=path)
+    shadow.acknowledge('strip', RED)
+    shadow.report('plug', {'power': 'on'})
+    shadow.forget('plug')
+    
+    assert shadow.save() == 2
+    assert shadow.save() == 0
+    updated = shadow.get('strip')['updated']
+    
+    reloaded = DeviceShadow(path=path)
+    assert reloaded.get('strip') == {'reported': {'color': [255, 0, 0]}, 'desired': {},
+                                     'updated': updated}
+    # Forgotten devices come back unknown and due for reconciliation
+    assert reloaded.get('plug') == {'reported': {}, 'desired': {}, 'updated': None}
+
+
+def test_reconcile_polls_only_devices_not_recently_updated(cloud, registry):
+    fresh, *stale = [device['device'] for device in cloud.devices]
+    cloud.states[stale[0]].update(powerState='on', brightness=70)
+    shadow = DeviceShadow(registry=registry, interval=60.0)
+    shadow.report(fresh, {'power': 'on'})
+    
+    assert shadow.reconcile() == 2
+    assert shadow.get(stale[0])['reported']['power'] == 'on'
+    assert shadow.get(stale[0])['reported']['brightness'] == 70
+    assert shadow.get(stale[1])['reported']['power'] == 'off'
+    assert shadow.get(fresh)['reported'] == {'power': 'on'}
+    
+    assert shadow.reconcile() == 0
+
+
+def test_coalescer_trusts_only_fresh_shadow_state(cloud, make_client):
+    device_id = cloud.devices[0]['device']
+    shadow = DeviceShadow()
+    coalescer = CommandCoalescer(client=make_client(), shadow=shadow)
+    shadow.report(device_id, {'color': [255, 0, 0]})
+    
+    coalescer.submit(device_id, RED, max_age=FRESH_SECONDS)
+    assert coalescer.stats()['dropped_redundant'] == 1
+    
+    # Reported long ago: the device may have changed since, so send it
+    shadow.updated[device_id] -= 2 * FRESH_SECONDS
+    coalescer.submit(device_id, RED, max_age=FRESH_SECONDS)
+    assert coalescer.stats()['pending'] == 1
+    assert shadow.get(device_id)['desired'] == {'color': [255, 0, 0]}
+    
+    assert coalescer.flush() == 1
+    assert shadow.get(device_id)['desired'] == {}
+    assert cloud.states[device_id]['color'] == RED['value']
+
+
+def test_readers_do_not_wait_for_device_listing(registry, monkeypatch):
+    listing = threading.Event()
+    listed = threading.Event()
+    
+    def slow_get_all():
+        listing.set()
+        listed.wait(5)
+        return []
+    
+    monkeypatch.setattr(registry, 'get_all', slow_get_all)
+    shadow = DeviceShadow(registry=registry)
+    reconciling = threading.Thread(target=shadow.reconcile)
+    reconciling.start()
+    try:
+        assert listing.wait(2)
+        start = time.monotonic()
+        shadow.report('strip', {'power': 'on'})
+        assert shadow.state('strip')['power'] == 'on'
+        assert time.monotonic() - start < 0.5
+    finally:
+        listed.set()
+        reconciling.join()
@@ -0,0 +1,121 @@
+"""
+Light Show Tests
+Show files written, read back and seeked, compared against the frames that were rendered
+"""
+import numpy as np
+import pytest
+
+from audio.framebuffer import FrameBuffer, rolling_effect
+from audio.show import ShowFile, ShowWriter, compile_audio, compile_effect, show_effect
+
+LED_COUNTS = [30, 50, 20]
+FPS = 30.0
+KEYFRAMES = 7
+
+
+def sparkle_effect(frame: np.ndarray, step: int):
+    """Recolor scattered pixels each step (more runs than apply()'s loop handles)"""
+    rng = np.random.default_rng(step)
+    frame[rng.choice(len(frame), 25, replace=False)] = rng.integers(0, 256, (25, 3))
+
+
+def _rendered(effect, frames: int) -> list:
+    framebuffer = FrameBuffer(LED_COUNTS)
+    rendered = []
+    for step in range(frames):
+        framebuffer.render(effect, step)
+        rendered.append(framebuffer.frame.copy())
+    return rendered
+
+
+@pytest.fixture(params=['rolling', 'sparkle'])
+def effect(request):
+    if request.param == 'rolling':
+        return lambda: rolling_effect(sum(LED_COUNTS), (255, 128, 0), trail_length=5)
+    return lambda: sparkle_effect
+
+
+@pytest.fixture
+def show(tmp_path, effect):
+    """A compiled 40-frame show and the frames it was rendered from"""
+    path = str(tmp_path / 'effect.show')
+    stats = compile_effect(path, LED_COUNTS, effect(), FPS, 40 / FPS, keyframe_interval=KEYFRAMES)
+    show = ShowFile(path)
+    yield show, _rendered(effect(), 40), stats
+    show.close()
+
+
+def test_playback_matches_rendered_frames(show):
+    show, rendered, stats = show
+    
+    assert show.frames == stats['frames'] == 40
+    assert show.led_counts == LED_COUNTS
+    assert show.fps == FPS
+    assert stats['bytes'] < stats['bytes_raw']
+    
+    framebuffer = FrameBuffer(LED_COUNTS)
+    draw = show_effect(show, loop=False)
+    for step, expected in enumerate(rendered):
+        framebuffer.render(draw, step)
+        np.testing.assert_array_equal(framebuffer.frame, expected, err_msg=f'frame {step}')
+
+
+def test_seeking_decodes_the_same_frames(show):
+    show, rendered, _ = show
+    frame = np.zeros((show.size, 3), dtype=np.uint8)
+    draw = show_effect(show, loop=True)
+    
+    # Forward within a keyframe span, across keyframes, backwards, and wrapping round
+    for step in (0, 3, 4, 19, 8, 8, 39, 1, 40 + 22, 40 + 2):
+        draw(frame, step)
+        np.testing.assert_array_equal(frame, rendered[step % 40], err_msg=f'step {step}')
+
+
+def test_show_that_does_not_loop_holds_last_frame(show):
+    show, rendered, _ = show
+    frame = np.zeros((show.size, 3), dtype=np.uint8)
+    draw = show_effect(show, loop=False)
+    
+    draw(frame, 100)
+    np.testing.assert_array_equal(frame, rendered[-1])
+
+
+def test_closed_show_is_left_alone(show):
+    show, _, _ = show
+    frame = np.zeros((show.size, 3), dtype=np.uint8)
+    
+    show.close()
+    assert not show.play(0, 5, frame)
+    assert not frame.any()
+
+
+def test_incomplete_file_is_rejected(tmp_path):
+    path = str(tmp_path / 'partial.show')
+    writer = ShowWriter(path, LED_COUNTS, FPS)
+    writer.discard()
+    assert not (tmp_path / 'partial.show.tmp').exists()
+    
+    (tmp_path / 'partial.show').write_bytes(b'GVSHOW')
+    with pytest.raises(ValueError, match='not a show file'):
+        ShowFile(path)
+
+
+def test_audio_show_colors_whole_strips(tmp_path, wav_path):
+    path = str(tmp_path / 'audio.show')
+    stats = compile_audio(path, wav_path, LED_COUNTS, FPS, mode='bands', seconds=0.5,
+                          keyframe_interval=KEYFRAMES)
+    show = ShowFile(path)
+    try:
+        assert stats['frames'] == show.frames == 15
+        framebuffer = FrameBuffer(LED_COUNTS)
+        draw = show_effect(show, loop=False)
+        lit = 0
+        for step in range(show.frames):
+            framebuffer.render(draw, step)
+            for strip in range(len(LED_COUNTS)):
+                pixels = framebuffer.strip_pixels(strip)
+                assert (pixels == pixels[0]).all()
+            lit += bool(framebuffer.frame.any())
+        assert lit
+    finally:
+        show.close()
@@ -0,0 +1,254 @@
+"""
+Task Manager Tests
+Lanes, priorities, deadlines, cancellation, pre-emption and the futures returned for tasks
+"""
+import threading
+
+import pytest
+
+from agents.task_manager import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_NORMAL,
+                                 TaskExpired, TaskManager)
+from govee_api.transport import get_loop_thread
+from tests.conftest import wait_for
+
+
+@pytest.fixture
+def manager():
+    """Task manager with one worker per lane, so queued tasks stay queued"""
+    manager = TaskManager(workers=1, long_running_workers=1, mode='thread')
+    manager.start()
+    yield manager
+    manager.stop()
+
+
+@pytest.fixture
+def blocker(manager):
+    """Occupy the short lane's only worker until set() is called"""
+    release = threading.Event()
+    manager.register_agent('block', lambda data: release.wait(5))
+    manager.submit_task('block', {})
+    yield release
+    release.set()
+
+
+def test_future_returns_result_and_raises_errors(manager):
+    def echo(data):
+        if data.get('fail'):
+            raise ValueError('bad value')
+        return data['value']
+    
+    manager.register_agent('echo', echo)
+    
+    handle = manager.submit_task('echo', {'value': 42})
+    assert handle.result(timeout=2) == 42
+    assert handle.status == 'done'
+    
+    failing = manager.submit_task('echo', {'fail': True})
+    with pytest.raises(ValueError, match='bad value'):
+        failing.result(timeout=2)
+    assert failing.status == 'failed'
+    assert manager.metrics()['agents']['echo']['failed'] == 1
+
+
+def test_queued_task_can_be_cancelled(manager, blocker):
+    ran = []
+    manager.register_agent('record', lambda data: ran.append(data['n']))
+    
+    handle = manager.submit_task('record', {'n': 1})
+    assert handle.cancel()
+    blocker.set()
+    manager.submit_task('record', {'n': 2}).result(timeout=2)
+    
+    assert ran == [2]
+    assert handle.status == 'cancelled'
+
+
+def test_higher_priority_tasks_run_first(manager, blocker):
+    order = []
+    manager.register_agent('record', lambda data: order.append(data['name']))
+    
+    handles = [
+        manager.submit_task('record', {'name': 'background'}, priority=PRIORITY_BACKGROUND),
+        manager.submit_task('record', {'name': 'normal-1'}, priority=PRIORITY_NORMAL),
+        manager.submit_task('record', {'name': 'interactive'}, priority=PRIORITY_INTERACTIVE),
+        manager.submit_task('record', {'name': 'normal-2'}, priority=PRIORITY_NORMAL),
+    ]
+    blocker.set()
+    for handle in handles:
+        handle.result(timeout=2)
+    
+    # Same priority keeps submission order
+    assert order == ['interactive', 'normal-1', 'normal-2', 'background']
+
+
+def test_task_past_its_ttl_expires_unrun(manager, blocker):
+    ran = []
+    manager.register_agent('record', lambda data: ran.append(True))
+    
+    handle = manager.submit_task('record', {}, ttl=0.05)
+    threading.Event().wait(0.1)
+    blocker.set()
+    
+    with pytest.raises(TaskExpired):
+        handle.result(timeout=2)
+    assert handle.status == 'expired'
+    assert not ran
+    assert manager.metrics()['agents']['record']['expired'] == 1
+
+
+def test_preemption_takes_single_devices_from_running_task(manager):
+    def effect(data, token):
+        while not token.wait(0.01):
+            pass
+    
+    manager.register_agent('effect', effect, long_running=True)
+    manager.register_agent('command', lambda data: True)
+    running = manager.submit_task('effect', {'device_ids': ['a', 'b']}, priority=PRIORITY_BACKGROUND)
+    assert wait_for(running.running)
+    
+    manager.submit_task('command', {'device_id': 'a'}, priority=PRIORITY_INTERACTIVE,
+                        preempt=True).result(timeout=2)
+    # The effect keeps running for the device it still has
+    assert running.token.released == {'a'}
+    assert running.status == 'running'
+    
+    manager.submit_task('command', {'device_id': 'b'}, priority=PRIORITY_INTERACTIVE,
+                        preempt=True).result(timeout=2)
+    assert wait_for(running.done)
+    assert running.status == 'preempted'
+    assert manager.metrics()['agents']['effect']['preempted'] == 1
+
+
+def test_preemption_cancels_queued_task_on_same_device(manager, blocker):
+    manager.register_agent('command', lambda data: data['value'])
+    
+    stale = manager.submit_task('command', {'device_id': 'a', 'value': 'old'},
+                                priority=PRIORITY_NORMAL)
+    other = manager.submit_task('command', {'device_id': 'b', 'value': 'other'},
+                                priority=PRIORITY_NORMAL)
+    fresh = manager.submit_task('command', {'device_id': 'a', 'value': 'new'},
+                                priority=PRIORITY_INTERACTIVE, preempt=True)
+    blocker.set()
+    
+    assert fresh.result(timeout=2) == 'new'
+    assert other.result(timeout=2) == 'other'
+    assert stale.status == 'preempted'
+
+
+def test_preemption_reaches_queued_async_tasks(manager):
+    ran = []
+    
+    async def command(data):
+        ran.append(data['device_id'])
+    
+    manager.register_agent('async_command', command)
+    manager.register_agent('command', lambda data: True)
+    
+    # Hold the event loop so the coroutine task stays scheduled but unstarted
+    loop_free = threading.Event()
+    get_loop_thread().loop.call_soon_threadsafe(loop_free.wait, 5)
+    try:
+        queued = manager.submit_task('async_command', {'device_id': 'a'})
+        manager.submit_task('command', {'device_id': 'a'}, priority=PRIORITY_INTERACTIVE,
+                            preempt=True).result(timeout=2)
+        assert queued.status == 'preempted'
+    finally:
+        loop_free.set()
+    
+    assert wait_for(lambda: manager.metrics()['agents']['async_command']['preempted'] == 1)
+    assert not ran
+
+
+def test_preemption_calls_device_releasers(manager):
+    taken = []
+    manager.register_device_releaser(taken.append)
+    manager.register_agent('command', lambda data: True)
+    
+    manager.submit_task('command', {'device_id': 'a'}, preempt=True).result(timeout=2)
+    manager.submit_task('command', {'device_id': 'b'}).result(timeout=2)
+    
+    assert taken == [{'a'}]
+
+
+def _until_cancelled(data, token):
+    while not token.wait(0.01):
+        pass
+    return 'stopped'
+
+
+def test_long_running_tasks_do_not_hold_up_commands(manager):
+    manager.register_agent('stream', _until_cancelled, long_running=True)
+    manager.register_agent('command', lambda data: 'ok')
+    
+    streaming = manager.submit_task('stream', {})
+    waiting = manager.submit_task('stream', {})
+    assert wait_for(streaming.running)
+    
+    # The short lane's worker is free while the long lane's is taken
+    assert manager.submit_task('command', {}).result(timeout=2) == 'ok'
+    assert manager.metrics()['lanes']['long']['queued'] == 1
+    assert not waiting.running()
+    
+    streaming.cancel()
+    assert streaming.result(timeout=2) == 'stopped'
+    assert wait_for(waiting.running)
+    waiting.cancel()
+    assert waiting.result(timeout=2) == 'stopped'
+
+
+def test_concurrency_limit_parks_extra_tasks(manager):
+    release = threading.Event()
+    manager.register_agent('limited', lambda data: release.wait(5), max_concurrency=1)
+    
+    first = manager.submit_task('limited', {}, long_running=True)
+    assert wait_for(first.running)
+    second = manager.submit_task('limited', {})
+    assert wait_for(lambda: manager.metrics()['agents']['limited']['deferred'] == 1)
+    
+    release.set()
+    assert second.result(timeout=2) is True
+    assert manager.metrics()['agents']['limited']['completed'] == 2
+
+
+def test_cancel_agent_tasks_skips_the_caller(manager, blocker):
+    manager.register_agent('stream', _until_cancelled, long_running=True)
+    running = manager.submit_task('stream', {})
+    assert wait_for(running.running)
+    queued = manager.submit_task('stream', {})
+    
+    # A task that cancels its own agent's tasks (like audio 'stop') survives it
+    manager.register_agent('stream_stop', lambda data: manager.cancel_agent_tasks('stream_stop'))
+    stopper = manager.submit_task('stream_stop', {})
+    
+    assert manager.cancel_agent_tasks('stream') == 2
+    assert running.result(timeout=2) == 'stopped'
+    assert running.token.cancelled
+    assert queued.status == 'cancelled'
+    
+    blocker.set()
+    assert stopper.result(timeout=2) == 0
+    assert wait_for(lambda: manager.metrics()['agents']['stream']['cancelled'] == 2)
+    assert manager.metrics()['agents']['stream']['completed'] == 0
+
+
+def test_async_mode_runs_coroutine_variant_on_the_loop(manager, monkeypatch):
+    loop_thread = get_loop_thread().thread
+    
+    async def stream(data, token):
+        assert threading.current_thread() is loop_thread
+        while not await token.wait_async(0.01):
+            pass
+        return 'stopped on loop'
+    
+    manager.register_agent('stream', _until_cancelled, long_running=True, async_function=stream)
+    monkeypatch.setattr(manager, 'mode', 'async')
+    
+    handle = manager.submit_task('stream', {})
+    assert handle.lane == 'async'
+    assert wait_for(lambda: manager.metrics()['lanes']['async']['running'] == 1)
+    # The long lane's thread stays free
+    assert manager.metrics()['lanes']['long']['queued'] == 0
+    
+    handle.cancel()
+    assert handle.result(timeout=2) == 'stopped on loop'
+    assert manager.metrics()['agents']['stream']['cancelled'] == 1